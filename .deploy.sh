@@ -1,5 +1,5 @@
 #!/bin/bash
-pipenv run scrapy list | xargs -I {} pipenv run scrapy crawl {} -s LOG_ENABLED=False &
+pipenv run scrapy crawlall -s LOG_ENABLED=False &
 
 # Output to the screen every 9 minutes to prevent a travis timeout
 # https://stackoverflow.com/a/40800348
@@ -8,3 +8,6 @@ while [[ `ps -p $PID | tail -n +2` ]]; do
   echo 'Deploying'
   sleep 540
 done
+
+# Upload feed output staged locally during the run, if any
+pipenv run scrapy uploadfeeds -s LOG_ENABLED=False
@@ -0,0 +1,136 @@
+import gzip
+import json
+import os
+
+from scrapy import Spider
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+FEED_EXTENSIONS = (".json", ".jsonl", ".jl", ".gz")
+
+
+def iter_feed_lines(path):
+    """
+    Yields the lines of a jsonlines feed file, or of the most recent feed for
+    each spider when given a directory of dated feed output (e.g.
+    2024/03/01/0600/wicks_boe.json). Gzipped feeds are decompressed.
+    """
+    if os.path.isdir(path):
+        latest = {}
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                if not filename.endswith(FEED_EXTENSIONS):
+                    continue
+                name = filename.split(".", 1)[0]
+                feed_path = os.path.join(dirpath, filename)
+                if name not in latest or feed_path > latest[name]:
+                    latest[name] = feed_path
+        paths = sorted(latest.values())
+    else:
+        paths = [path]
+    for feed_path in paths:
+        opener = gzip.open if feed_path.endswith(".gz") else open
+        with opener(feed_path, "rt") as f:
+            yield from f
+
+
+def get_item_urls(item):
+    """
+    Returns the source and link URLs of a feed item, either a Meeting or a
+    meeting converted by the OpenCivicDataPipeline
+    """
+    urls = [item.get("source")]
+    urls.extend(source.get("url") for source in item.get("sources", []))
+    urls.extend(link.get("href") or link.get("url") for link in item.get("links", []))
+    return [url for url in urls if url]
+
+
+def get_feed_urls(lines):
+    """Returns the unique URLs of the items in jsonlines feed output, in order"""
+    urls = {}
+    for line in lines:
+        if line.strip():
+            for url in get_item_urls(json.loads(line)):
+                urls[url] = None
+    return list(urls)
+
+
+class ArchiveFeedSpider(Spider):
+    """
+    Doesn't request anything itself. CityScrapersWaybackMiddleware queues its
+    archive_urls when it opens and submits them once it's idle.
+    """
+
+    name = "archivefeeds"
+    custom_settings = {
+        "SPIDER_MIDDLEWARES": {
+            "city_scrapers.middleware.CityScrapersWaybackMiddleware": 500,
+        },
+        "ITEM_PIPELINES": {},
+        "EXTENSIONS": {"scrapy.extensions.closespider.CloseSpider": None},
+        "FEEDS": {},
+        "FEED_URI": None,
+    }
+
+    def __init__(self, archive_urls=None, **kwargs):
+        super().__init__(**kwargs)
+        self.archive_urls = archive_urls or []
+
+    def start_requests(self):
+        return []
+
+
+class Command(ScrapyCommand):
+    """
+    Submits the URLs from the latest feed output to the Wayback Machine, so
+    pages can be archived without crawling every agency site a second time.
+    """
+
+    requires_project = True
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Archive source and link URLs from the latest feed output"
+
+    def add_options(self, parser):
+        ScrapyCommand.add_options(self, parser)
+        parser.add_argument(
+            "--path",
+            dest="path",
+            default=None,
+            help="jsonlines feed file, or directory of feed output, to read "
+            "instead of latest.json in Azure storage",
+        )
+
+    def run(self, args, opts):
+        if opts.path:
+            if not os.path.exists(opts.path):
+                raise UsageError(f"Feed output not found: {opts.path}")
+            urls = get_feed_urls(iter_feed_lines(opts.path))
+        else:
+            urls = get_feed_urls(self.read_azure_latest().splitlines())
+        print(f"Archiving {len(urls)} URLs from the latest feed output")
+        self.crawler_process.crawl(ArchiveFeedSpider, archive_urls=urls)
+        self.crawler_process.start()
+
+    def read_azure_latest(self):
+        """Downloads latest.json, the combined output of the last crawl"""
+        account_name = self.settings.get("AZURE_ACCOUNT_NAME")
+        account_key = self.settings.get("AZURE_ACCOUNT_KEY")
+        container = self.settings.get("AZURE_CONTAINER")
+        if not (account_name and account_key and container):
+            raise UsageError(
+                "Either --path or the AZURE_ACCOUNT_NAME, AZURE_ACCOUNT_KEY and "
+                "AZURE_CONTAINER settings are required"
+            )
+        from azure.storage.blob import ContainerClient
+
+        container_client = ContainerClient(
+            f"{account_name}.blob.core.windows.net",
+            container,
+            credential=account_key,
+        )
+        blob = container_client.get_blob_client("latest.json")
+        return blob.download_blob().content_as_text()
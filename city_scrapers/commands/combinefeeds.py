@@ -0,0 +1,284 @@
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from functools import partial
+from urllib.parse import quote
+
+from city_scrapers_core.commands.combinefeeds import Command as CoreCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.project import data_path
+
+from city_scrapers.commands.archivefeeds import FEED_EXTENSIONS, iter_feed_lines
+
+
+def iter_sorted_feed(path, start_key):
+    """Yields (start, line) pairs from a feed file that's sorted by start"""
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line:
+                yield json.loads(line)[start_key], line
+
+
+def write_sorted_feed(lines, start_key, path):
+    """Writes one spider's feed lines to a file, sorted by start"""
+    meetings = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            meetings.append((json.loads(line)[start_key], line))
+    meetings.sort()
+    with open(path, "w") as f:
+        for _, line in meetings:
+            f.write(line + "\n")
+
+
+def write_combined_feeds(paths, start_key, latest_file, upcoming_file):
+    """
+    Merges feed files that are each sorted by start into the combined latest
+    and upcoming feeds, holding only one meeting per feed in memory. Returns
+    the number of meetings written to each.
+    """
+    yesterday_iso = (datetime.now() - timedelta(days=1)).isoformat()[:19]
+    counts = {"latest": 0, "upcoming": 0}
+    feeds = [iter_sorted_feed(path, start_key) for path in paths]
+    for start, line in heapq.merge(*feeds):
+        # Feeds are newline-separated without a trailing newline, as in core
+        latest_file.write(("\n" if counts["latest"] else "") + line)
+        counts["latest"] += 1
+        if start[:19] > yesterday_iso:
+            upcoming_file.write(("\n" if counts["upcoming"] else "") + line)
+            counts["upcoming"] += 1
+    return counts
+
+
+class SortedFeedCache:
+    """
+    Local copies of each spider's latest feed, sorted by start, along with the
+    version (a hash of the contents) of the feed they were made from. Spiders
+    whose feed is unchanged since the last combine are merged from the cached
+    copy without being downloaded or sorted again.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, "index.json")
+        try:
+            with open(self.index_path) as f:
+                self.versions = json.load(f)
+        except (OSError, ValueError):
+            self.versions = {}
+
+    def path(self, spider_name):
+        return os.path.join(self.cache_dir, f"{spider_name}.jsonl")
+
+    def is_current(self, spider_name, version):
+        return self.versions.get(spider_name) == version and os.path.exists(
+            self.path(spider_name)
+        )
+
+    def update(self, spider_name, version, lines, start_key):
+        write_sorted_feed(lines, start_key, self.path(spider_name))
+        self.versions[spider_name] = version
+
+    def save(self):
+        with open(self.index_path, "w") as f:
+            json.dump(self.versions, f)
+
+
+def get_file_hash(path):
+    """Returns a hash of a file's contents, read in chunks"""
+    file_hash = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(partial(f.read, 1 << 16), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_blob_version(blob):
+    """
+    Returns the Content-MD5 of a blob, so the same output uploaded under a new
+    dated prefix isn't treated as a change. Falls back to the name and ETag for
+    blobs uploaded without one.
+    """
+    content_md5 = blob.content_settings.content_md5
+    if content_md5:
+        return [bytes(content_md5).hex()]
+    return [blob.name, blob.etag]
+
+
+def read_feed_lines(data, name):
+    """Decodes a downloaded feed, decompressing gzipped feeds"""
+    if name.endswith(".gz"):
+        data = gzip.decompress(data)
+    return data.decode("utf-8").split("\n")
+
+
+class Command(CoreCommand):
+    """
+    Combines the latest feed of each spider into latest.json and upcoming.json
+    by merging per-spider feeds sorted by start time, so memory use doesn't
+    grow with the number of agencies. Feeds that haven't changed since the last
+    combine are reused from a local cache in .scrapy/city_scrapers/combine.
+
+    Azure storage and local directories (with --path) are handled here, other
+    storage backends fall back to the city_scrapers_core command.
+    """
+
+    def add_options(self, parser):
+        super().add_options(parser)
+        parser.add_argument(
+            "--path",
+            dest="path",
+            default=None,
+            help="directory of feed output to combine, writing latest.json and "
+            "upcoming.json to the same directory",
+        )
+
+    def run(self, args, opts):
+        if opts.path:
+            if not os.path.isdir(opts.path):
+                raise UsageError(f"Feed output directory not found: {opts.path}")
+            self.combine_local(opts.path)
+        elif "azure" in self.settings.get("FEED_STORAGES", {}):
+            self.combine_azure()
+        else:
+            super().run(args, opts)
+
+    @property
+    def cache(self):
+        if not hasattr(self, "_cache"):
+            self._cache = SortedFeedCache(
+                self.settings.get("CITY_SCRAPERS_COMBINE_CACHE_DIR")
+                or os.path.join(data_path("city_scrapers"), "combine")
+            )
+        return self._cache
+
+    def update_cache(self, spider_feeds):
+        """
+        Refreshes the cached sorted feed for each spider whose feed changed.
+        Takes (spider name, version, function returning the feed's lines)
+        tuples and returns the names of the spiders that changed.
+        """
+        changed = []
+        for spider_name, version, read_lines in spider_feeds:
+            version = [self.start_key, *version]
+            if not self.cache.is_current(spider_name, version):
+                self.cache.update(spider_name, version, read_lines(), self.start_key)
+                changed.append(spider_name)
+        self.cache.save()
+        print(f"{len(changed)} of {len(spider_feeds)} spider feeds changed")
+        return changed
+
+    def write_combined(self, spider_names, latest_path, upcoming_path):
+        with open(latest_path, "w") as latest_file, open(
+            upcoming_path, "w"
+        ) as upcoming_file:
+            return write_combined_feeds(
+                [self.cache.path(name) for name in spider_names],
+                self.start_key,
+                latest_file,
+                upcoming_file,
+            )
+
+    def combine_local(self, feed_dir):
+        spider_paths = {}
+        for dirpath, _, filenames in os.walk(feed_dir):
+            for filename in filenames:
+                if filename.endswith(FEED_EXTENSIONS):
+                    spider_paths.setdefault(filename.split(".", 1)[0], []).append(
+                        os.path.join(dirpath, filename)
+                    )
+        spider_feeds = []
+        for spider_name in self.crawler_process.spider_loader.list():
+            if spider_name not in spider_paths:
+                continue
+            path = sorted(spider_paths[spider_name])[-1]
+            spider_feeds.append(
+                (spider_name, [get_file_hash(path)], partial(iter_feed_lines, path))
+            )
+        self.update_cache(spider_feeds)
+        self.write_combined(
+            [spider_name for spider_name, _, _ in spider_feeds],
+            os.path.join(feed_dir, "latest.json"),
+            os.path.join(feed_dir, "upcoming.json"),
+        )
+
+    def combine_azure(self):
+        from azure.storage.blob import ContainerClient, ContentSettings
+
+        feed_uri = self.settings.get("FEED_URI")
+        feed_prefix = self.settings.get("CITY_SCRAPERS_DIFF_FEED_PREFIX", "%Y/%m/%d")
+        account_name, account_key = feed_uri[8::].split("@")[0].split(":")
+        container = feed_uri.split("@")[1].split("/")[0]
+        container_client = ContainerClient(
+            f"{account_name}.blob.core.windows.net",
+            container,
+            credential=account_key,
+        )
+
+        max_days_previous = 3
+        days_previous = 0
+        prefix_blobs = []
+        while days_previous <= max_days_previous:
+            prefix_blobs = list(
+                container_client.list_blobs(
+                    name_starts_with=(
+                        datetime.now() - timedelta(days=days_previous)
+                    ).strftime(feed_prefix)
+                )
+            )
+            if len(prefix_blobs) > 0:
+                break
+            days_previous += 1
+
+        blobs = {blob.name: blob for blob in prefix_blobs}
+        spider_feeds = []
+        for blob_name in self.get_spider_paths(list(blobs)):
+            spider_name = blob_name.split("/")[-1].split(".", 1)[0]
+
+            def read_lines(blob_name=blob_name):
+                data = container_client.get_blob_client(blob_name).download_blob()
+                return read_feed_lines(data.readall(), blob_name)
+
+            spider_feeds.append(
+                (spider_name, get_blob_version(blobs[blob_name]), read_lines)
+            )
+        changed = set(self.update_cache(spider_feeds))
+
+        for blob_name in self.get_spider_paths(list(blobs)):
+            if blob_name.split("/")[-1].split(".", 1)[0] not in changed:
+                continue
+            # Copy latest results for each spider
+            spider_blob_name = blob_name.split("/")[-1]
+            spider_blob = container_client.get_blob_client(spider_blob_name)
+            spider_blob.start_copy_from_url(
+                f"https://{account_name}.blob.core.windows.net"
+                f"/{quote(container)}/{blob_name}"
+            )
+
+        output_dir = tempfile.mkdtemp()
+        try:
+            latest_path = os.path.join(output_dir, "latest.json")
+            upcoming_path = os.path.join(output_dir, "upcoming.json")
+            self.write_combined(
+                [spider_name for spider_name, _, _ in spider_feeds],
+                latest_path,
+                upcoming_path,
+            )
+            for path in [latest_path, upcoming_path]:
+                with open(path, "rb") as f:
+                    container_client.upload_blob(
+                        os.path.basename(path),
+                        f,
+                        content_settings=ContentSettings(cache_control="no-cache"),
+                        overwrite=True,
+                    )
+        finally:
+            shutil.rmtree(output_dir)
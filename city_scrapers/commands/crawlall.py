@@ -0,0 +1,154 @@
+import logging
+import time
+from functools import partial
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+from city_scrapers.state import SharedState
+
+
+class SpiderErrorCounter(logging.Handler):
+    """
+    Counts ERROR records logged against a single crawler's spider. Attached to
+    the root logger so errors are counted even when LOG_ENABLED is False.
+    """
+
+    def __init__(self, crawler):
+        super().__init__(level=logging.ERROR)
+        self.crawler = crawler
+        self.count = 0
+
+    def emit(self, record):
+        spider = self.crawler.spider
+        if spider is not None and getattr(record, "spider", None) is spider:
+            self.count += 1
+
+
+class Command(ScrapyCommand):
+    """
+    Runs every spider in the project inside a single CrawlerProcess so
+    imports, the reactor and connection pools are shared across spiders,
+    instead of starting one interpreter per spider. Every crawler gets the
+    same SharedState, so spiders can share downloaded listings.
+    """
+
+    requires_project = True
+
+    def syntax(self):
+        return "[options] [spider ...]"
+
+    def short_desc(self):
+        return "Run all spiders (or the given ones) concurrently in one process"
+
+    def add_options(self, parser):
+        ScrapyCommand.add_options(self, parser)
+        parser.add_argument(
+            "-c",
+            "--concurrency",
+            dest="concurrency",
+            type=int,
+            default=None,
+            help="maximum number of spiders running at once "
+            "(default: CITY_SCRAPERS_CRAWLALL_CONCURRENCY)",
+        )
+
+    def run(self, args, opts):
+        spider_names = self.crawler_process.spider_loader.list()
+        if args:
+            unknown = [name for name in args if name not in spider_names]
+            if unknown:
+                raise UsageError(f"Unknown spider(s): {', '.join(unknown)}")
+            spider_names = args
+        concurrency = opts.concurrency or self.settings.getint(
+            "CITY_SCRAPERS_CRAWLALL_CONCURRENCY", 8
+        )
+        if concurrency < 1:
+            raise UsageError("Concurrency must be at least 1")
+
+        self.pending = sorted(spider_names)
+        self.results = {}
+        self.shared_state = SharedState()
+        self.run_start = time.monotonic()
+        for _ in range(min(concurrency, len(self.pending))):
+            self._crawl_next()
+        self.crawler_process.start()
+
+        self.print_summary(time.monotonic() - self.run_start)
+        if any(result["failed"] for result in self.results.values()):
+            self.exitcode = 1
+
+    def _crawl_next(self):
+        """
+        Start the next pending spider. Called again from each crawl's completion
+        callback, so the number of running spiders never exceeds the concurrency
+        cap and the process never sees an empty set of active crawls until
+        every spider has finished.
+        """
+        if not self.pending:
+            return
+        name = self.pending.pop(0)
+        crawler = self.crawler_process.create_crawler(name)
+        crawler.shared_state = self.shared_state
+        self.results[name] = {
+            "errors": 0,
+            "items": 0,
+            "elapsed": 0.0,
+            "finish_reason": None,
+            "failed": False,
+        }
+        error_counter = SpiderErrorCounter(crawler)
+        logging.root.addHandler(error_counter)
+        done = partial(self._crawl_done, name, crawler, error_counter, time.monotonic())
+
+        crawl = self.crawler_process.crawl(crawler)
+        if isinstance(crawl, Deferred):
+            crawl.addBoth(done)
+        else:
+            # AsyncCrawlerProcess returns an asyncio task instead of a Deferred
+            crawl.add_done_callback(
+                lambda task: done(
+                    Failure(task.exception())
+                    if not task.cancelled() and task.exception()
+                    else None
+                )
+            )
+
+    def _crawl_done(self, name, crawler, error_counter, started, outcome):
+        logging.root.removeHandler(error_counter)
+        result = self.results[name]
+        result["elapsed"] = time.monotonic() - started
+        result["errors"] = error_counter.count
+        stats = crawler.stats.get_stats() if crawler.stats else {}
+        result["items"] = stats.get("item_scraped_count", 0)
+        result["finish_reason"] = stats.get("finish_reason")
+        if isinstance(outcome, Failure):
+            result["errors"] += 1
+            result["finish_reason"] = outcome.getErrorMessage() or repr(outcome.value)
+        result["failed"] = result["errors"] > 0 or result["finish_reason"] != "finished"
+        self._crawl_next()
+
+    def print_summary(self, total_elapsed):
+        """Print one line per spider, slowest first, followed by run totals"""
+        width = max([len(name) for name in self.results] + [6])
+        print(
+            f"{'spider':<{width}}  {'seconds':>8}  {'items':>6}  {'errors':>6}  status"
+        )
+        for name, result in sorted(
+            self.results.items(), key=lambda r: r[1]["elapsed"], reverse=True
+        ):
+            status = "FAILED" if result["failed"] else "ok"
+            if result["finish_reason"] not in (None, "finished"):
+                status = f"{status} ({result['finish_reason']})"
+            print(
+                f"{name:<{width}}  {result['elapsed']:>8.1f}  {result['items']:>6}  "
+                f"{result['errors']:>6}  {status}"
+            )
+        failed = sum(1 for result in self.results.values() if result["failed"])
+        print(
+            f"{len(self.results)} spiders, {failed} failed, "
+            f"{sum(r['items'] for r in self.results.values())} items "
+            f"in {total_elapsed:.1f}s"
+        )
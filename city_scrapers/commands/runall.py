@@ -0,0 +1,9 @@
+from city_scrapers_core.commands.runall import Command as CoreCommand
+
+
+class Command(CoreCommand):
+    """
+    Exposes the city_scrapers_core "runall" command. Scrapy only reads
+    commands from a single COMMANDS_MODULE, so core commands are
+    subclassed here to keep them available next to project commands.
+    """
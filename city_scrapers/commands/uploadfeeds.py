@@ -0,0 +1,83 @@
+import os
+import shutil
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+
+from city_scrapers.extensions import get_staging_dir
+
+
+def iter_staged_files(staging_dir):
+    """Yields the full and relative path of each staged feed file"""
+    for dirpath, _, filenames in os.walk(staging_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            yield path, os.path.relpath(path, staging_dir).replace(os.sep, "/")
+
+
+class Command(ScrapyCommand):
+    """
+    Uploads the feed output staged by StagedFeedStorage during a run, then
+    removes the staged files. Uploads to the Azure container in FEED_URI, or
+    copies to a local directory with --target.
+    """
+
+    requires_project = True
+
+    def syntax(self):
+        return "[options]"
+
+    def short_desc(self):
+        return "Upload feed output staged on local disk during a run"
+
+    def add_options(self, parser):
+        ScrapyCommand.add_options(self, parser)
+        parser.add_argument(
+            "--target",
+            dest="target",
+            default=None,
+            help="directory to copy staged feeds to instead of uploading them",
+        )
+
+    def run(self, args, opts):
+        staging_dir = get_staging_dir(self.settings)
+        staged = list(iter_staged_files(staging_dir))
+        if not staged:
+            print("No staged feed output to upload")
+            return
+        if opts.target:
+            upload = self.copy_file(opts.target)
+        else:
+            upload = self.azure_upload_file()
+        for path, name in staged:
+            upload(path, name)
+            os.remove(path)
+        print(f"Uploaded {len(staged)} staged feeds")
+
+    def copy_file(self, target):
+        def upload(path, name):
+            target_path = os.path.join(target, name)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            shutil.copyfile(path, target_path)
+
+        return upload
+
+    def azure_upload_file(self):
+        feed_uri = self.settings.get("FEED_URI") or ""
+        if not feed_uri.startswith("azure://"):
+            raise UsageError("Either --target or an azure:// FEED_URI is required")
+        from azure.storage.blob import ContainerClient
+
+        account_name, account_key = feed_uri[8::].split("@")[0].split(":")
+        container = feed_uri.split("@")[1].split("/")[0]
+        container_client = ContainerClient(
+            f"{account_name}.blob.core.windows.net",
+            container,
+            credential=account_key,
+        )
+
+        def upload(path, name):
+            with open(path, "rb") as f:
+                container_client.upload_blob(name, f, overwrite=True)
+
+        return upload
@@ -0,0 +1,69 @@
+import re
+from calendar import month_abbr, month_name
+from datetime import datetime
+from functools import lru_cache
+
+from dateutil.parser import parse
+
+MONTHS = {
+    **{name.lower(): number for number, name in enumerate(month_name) if name},
+    **{name.lower(): number for number, name in enumerate(month_abbr) if name},
+}
+
+# 11/1/2024
+NUMERIC_DATE_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+# November 12, 2024, optionally followed by a time like 10:00 AM
+MONTH_NAME_DATE_RE = re.compile(
+    r"([A-Za-z]+)\.?\s+(\d{1,2}),?\s+(\d{4})"
+    r"(?:\s+(\d{1,2}):(\d{2})\s*([AaPp])\.?[Mm]\.?)?"
+)
+# 2024-01-22, 2024-01-22T18:00:00 or 2024-03-19 11:52:00, without a UTC offset
+ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?)?")
+
+
+def _hour(hour, meridiem):
+    """Converts a 12-hour clock hour to 24-hour"""
+    hour = int(hour) % 12
+    return hour + 12 if meridiem.lower() == "p" else hour
+
+
+@lru_cache(maxsize=4096)
+def _parse_known_format(text):
+    """
+    Parses the date formats seen in the sites we scrape with precompiled
+    regexes, returning None for anything else. Results don't depend on the
+    current date, so they're cached for strings repeated within a run.
+    """
+    match = NUMERIC_DATE_RE.fullmatch(text)
+    if match:
+        month, day, year = match.groups()
+        return datetime(int(year), int(month), int(day))
+    match = MONTH_NAME_DATE_RE.fullmatch(text)
+    if match:
+        name, day, year, hour, minute, meridiem = match.groups()
+        month = MONTHS.get(name.lower())
+        if month is None:
+            return None
+        if hour is None:
+            return datetime(int(year), month, int(day))
+        return datetime(int(year), month, int(day), _hour(hour, meridiem), int(minute))
+    if ISO_DATE_RE.fullmatch(text):
+        return datetime.fromisoformat(text)
+    return None
+
+
+def parse_date(text, fuzzy=False):
+    """
+    Parses a date string like dateutil.parser.parse, trying the formats we see
+    most (11/1/2024, November 12, 2024 10:00 AM and ISO 8601) first. Other
+    strings, and ones that match a format but aren't a valid date, are parsed
+    by dateutil, which raises ValueError if it can't parse them either.
+    """
+    text = text.strip()
+    try:
+        parsed = _parse_known_format(text)
+    except ValueError:
+        parsed = None
+    if parsed is not None:
+        return parsed
+    return parse(text, fuzzy=fuzzy)
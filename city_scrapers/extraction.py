@@ -0,0 +1,69 @@
+from lxml import etree
+from parsel.csstranslator import css2xpath
+
+
+class Field:
+    """
+    Declares one value to extract from a page, as a CSS selector (including
+    parsel's ::text and ::attr() pseudo-elements) or an XPath expression
+    relative to the extractor's root element.
+
+    By default the first match is returned with whitespace stripped, or
+    `default` if nothing matches. With `many=True` every match is returned as
+    a list. With `fields`, each match is extracted into a dict of its own
+    fields, so groups like links can keep their href and title together.
+    """
+
+    def __init__(self, css=None, xpath=None, many=False, default="", fields=None):
+        if (css is None) == (xpath is None):
+            raise ValueError("Field requires exactly one of css or xpath")
+        self.xpath = etree.XPath(css2xpath(css) if css is not None else xpath)
+        self.many = many or fields is not None
+        self.default = default
+        self.fields = fields
+
+    def extract(self, element):
+        results = self.xpath(element)
+        if self.fields is not None:
+            return [extract_fields(self.fields, result) for result in results]
+        values = [_clean_value(result) for result in results]
+        if self.many:
+            return values
+        return values[0] if values else self.default
+
+
+def _clean_value(result):
+    if isinstance(result, str):
+        return str(result).strip()
+    return result
+
+
+def extract_fields(fields, element):
+    """Extracts a dict of Field values relative to an lxml element"""
+    return {name: field.extract(element) for name, field in fields.items()}
+
+
+class FieldExtractor:
+    """
+    Extracts a plain dict of values from a response using a declarative spec of
+    Fields. The spec is compiled into lxml XPath objects when the extractor is
+    created, so declaring it as a class attribute compiles it once per class.
+
+    The root expression is evaluated once against the whole document, and every
+    field is then evaluated against that element's subtree instead of the full
+    page. If the root isn't found, fields are evaluated against the document.
+    """
+
+    def __init__(self, fields, root_css=None, root_xpath=None):
+        self.fields = fields
+        self.root = None
+        if root_css is not None or root_xpath is not None:
+            self.root = Field(css=root_css, xpath=root_xpath, default=None)
+
+    def extract(self, response):
+        element = response.selector.root
+        if self.root is not None:
+            root = self.root.extract(element)
+            if root is not None:
+                element = root
+        return extract_fields(self.fields, element)
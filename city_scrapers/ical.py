@@ -0,0 +1,197 @@
+import copy
+import io
+from datetime import date, datetime, timedelta
+
+from dateutil.rrule import rrulestr
+from icalendar import Event, vRecur
+
+# Events are prefiltered on the raw DTSTART value before they're parsed. It can
+# be in UTC, so events a day either side of the window are parsed and checked
+# again on their local start.
+PREFILTER_SLACK = timedelta(days=1)
+# Raw properties read from each event to decide whether it can be prefiltered
+PREFILTER_PROPERTIES = frozenset([b"DTSTART", b"RRULE", b"RECURRENCE-ID"])
+
+
+def iter_unfolded_lines(body):
+    """Yields the lines of an iCalendar body with folded lines joined"""
+    line = None
+    for raw in io.BytesIO(body):
+        raw = raw.rstrip(b"\r\n")
+        if line is not None and raw[:1] in (b" ", b"\t"):
+            line += raw[1:]
+            continue
+        if line:
+            yield line
+        line = raw
+    if line:
+        yield line
+
+
+def iter_event_lines(body):
+    """Yields the lines of each VEVENT in an iCalendar body as a list"""
+    event_lines = None
+    for line in iter_unfolded_lines(body):
+        if event_lines is None:
+            if line.upper() == b"BEGIN:VEVENT":
+                event_lines = [line]
+            continue
+        event_lines.append(line)
+        if line.upper() == b"END:VEVENT":
+            yield event_lines
+            event_lines = None
+
+
+def get_properties(event_lines, names):
+    """
+    Returns the raw value of the first property with each of the given
+    uppercase names, reading the event's lines once
+    """
+    values = {}
+    for line in event_lines:
+        key, _, value = line.partition(b":")
+        key = key.partition(b";")[0].upper()
+        if key in names and key not in values:
+            values[key] = value
+    return values
+
+
+def is_outside_window(event_lines, start_date, end_date):
+    """
+    Returns True if an event's raw DTSTART is outside [start_date, end_date)
+    with PREFILTER_SLACK either side. Events with an RRULE or RECURRENCE-ID
+    are never left out, so an occurrence moved out of the window is still
+    left out of its recurring event.
+    """
+    properties = get_properties(event_lines, PREFILTER_PROPERTIES)
+    if b"RRULE" in properties or b"RECURRENCE-ID" in properties:
+        return False
+    raw_start = properties.get(b"DTSTART")
+    if not raw_start:
+        return False
+    try:
+        raw_date = date(int(raw_start[:4]), int(raw_start[4:6]), int(raw_start[6:8]))
+    except ValueError:
+        return False
+    return not (start_date - PREFILTER_SLACK <= raw_date < end_date + PREFILTER_SLACK)
+
+
+def get_naive_start(event):
+    """Returns the DTSTART of an event as a naive datetime, or None"""
+    prop = event.get("dtstart")
+    if not prop:
+        return None
+    value = prop.dt
+    if not isinstance(value, datetime) and isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return value.replace(tzinfo=None)
+
+
+def get_naive_until(until, dtstart):
+    """Returns an RRULE UNTIL value as a naive datetime in DTSTART's timezone"""
+    if not isinstance(until, datetime):
+        return until
+    if until.tzinfo is not None and isinstance(dtstart, datetime) and dtstart.tzinfo:
+        until = until.astimezone(dtstart.tzinfo)
+    return until.replace(tzinfo=None)
+
+
+def iter_occurrences(event, start_date, end_date):
+    """
+    Yields a copy of a recurring event for each occurrence of its RRULE that
+    starts within the window, with DTSTART and DTEND moved to the occurrence.
+    Occurrences are expanded on the event's local time, so they keep the same
+    wall clock time across daylight saving time changes.
+    """
+    dtstart = event["dtstart"].dt
+    is_date = not isinstance(dtstart, datetime)
+    naive_start = get_naive_start(event)
+    duration = None
+    if event.get("dtend"):
+        duration = event["dtend"].dt - dtstart
+    elif event.get("duration"):
+        duration = event["duration"].dt
+    exdates = set()
+    exdate_props = event.get("exdate") or []
+    if not isinstance(exdate_props, list):
+        exdate_props = [exdate_props]
+    for prop in exdate_props:
+        for value in prop.dts:
+            exdates.add(
+                value.dt.replace(tzinfo=None)
+                if isinstance(value.dt, datetime)
+                else datetime.combine(value.dt, datetime.min.time())
+            )
+
+    # The rule is expanded on the naive local start, so a UTC UNTIL (required
+    # by RFC 5545 with a TZID start) is converted to the same local time
+    recur = vRecur(event["rrule"])
+    if recur.get("UNTIL"):
+        recur["UNTIL"] = [get_naive_until(until, dtstart) for until in recur["UNTIL"]]
+    rule = rrulestr(recur.to_ical().decode(), dtstart=naive_start)
+    for occurrence in rule.between(
+        datetime.combine(start_date - PREFILTER_SLACK, datetime.min.time()),
+        datetime.combine(end_date + PREFILTER_SLACK, datetime.min.time()),
+        inc=True,
+    ):
+        if occurrence in exdates:
+            continue
+        if is_date:
+            value = occurrence.date()
+        elif getattr(dtstart.tzinfo, "localize", None):
+            value = dtstart.tzinfo.localize(occurrence)
+        else:
+            value = occurrence.replace(tzinfo=dtstart.tzinfo)
+        copied = copy.copy(event)
+        for name in ["DTSTART", "DTEND", "RRULE", "EXDATE", "DURATION"]:
+            copied.pop(name, None)
+        copied.add("dtstart", value)
+        if duration is not None:
+            copied.add("dtend", value + duration)
+        yield copied
+
+
+def iter_vevents(body, start_date=None, end_date=None):
+    """
+    Yields the VEVENT components of an iCalendar body one at a time, without
+    building the whole calendar. With a start and end date, only events
+    starting within [start_date, end_date) are yielded: other events are
+    skipped before they're parsed, and recurring events are expanded into
+    their occurrences within the window.
+
+    Recurring events are yielded after the rest of the feed, so occurrences
+    replaced by a RECURRENCE-ID event later in the feed can be left out. Only
+    the recurring events are held in memory until then.
+    """
+    windowed = start_date is not None and end_date is not None
+    recurring = []
+    overridden = set()
+    for event_lines in iter_event_lines(body):
+        if windowed and is_outside_window(event_lines, start_date, end_date):
+            continue
+        event = Event.from_ical(b"\r\n".join(event_lines))
+        if event.get("recurrence-id"):
+            recurrence_id = event["recurrence-id"].dt
+            if isinstance(recurrence_id, datetime):
+                recurrence_id = recurrence_id.replace(tzinfo=None)
+            overridden.add((str(event.get("uid")), recurrence_id))
+        if windowed and event.get("rrule") and event.get("dtstart"):
+            recurring.append(event)
+            continue
+        start = get_naive_start(event)
+        if windowed and start and not start_date <= start.date() < end_date:
+            continue
+        yield event
+
+    for event in recurring:
+        uid = str(event.get("uid"))
+        for occurrence in iter_occurrences(event, start_date, end_date):
+            start = get_naive_start(occurrence)
+            if not start_date <= start.date() < end_date:
+                continue
+            recurrence_id = occurrence["dtstart"].dt
+            if isinstance(recurrence_id, datetime):
+                recurrence_id = recurrence_id.replace(tzinfo=None)
+            if (uid, recurrence_id) in overridden:
+                continue
+            yield occurrence
@@ -1,24 +1,1099 @@
-import random
+import json
+import time
+from bisect import bisect_left
+from urllib.parse import urlparse
 
 from city_scrapers_core.items import Meeting
+from scrapy import signals
+from scrapy.downloadermiddlewares.robotstxt import RobotsTxtMiddleware
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+from scrapy.http import Headers, HtmlResponse, Request
+from scrapy.http.request import NO_CALLBACK
+from scrapy.responsetypes import responsetypes
+from scrapy.selector import Selector
+from scrapy.utils.httpobj import urlparse_cached
 from scrapy_wayback_middleware import WaybackMiddleware
+from scrapy_wayback_middleware.middleware import SLOT_KEY
+from twisted.internet import defer, error, reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.task import deferLater
+
+from city_scrapers.pipelines import get_meeting_key, merge_links
+from city_scrapers.state import (
+    ArchiveIndex,
+    CircuitStore,
+    HostStatsCache,
+    RobotsStore,
+    ValidatorStore,
+    get_shared_state,
+    get_state_path,
+)
 
 
 class CityScrapersWaybackMiddleware(WaybackMiddleware):
+    """
+    Queues the URLs of scraped pages and meeting links for the Wayback Machine
+    and submits them once the spider is done crawling, instead of yielding save
+    requests alongside each item.
+
+    URLs are deduplicated across every spider in the process, and URLs archived
+    within the last CITY_SCRAPERS_WAYBACK_ARCHIVED_DAYS are skipped based on a
+    local index of successful submissions. When the spider goes idle, queued
+    URLs are submitted in batches of CITY_SCRAPERS_WAYBACK_BATCH_SIZE, at most
+    one batch every CITY_SCRAPERS_WAYBACK_BATCH_INTERVAL seconds.
+    """
+
+    # URLs queued by any spider in the process, so each is only submitted once
+    queued = set()
+
+    def __init__(self, crawler, is_post=False):
+        super().__init__(crawler, is_post=is_post)
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.archived_days = settings.getfloat("CITY_SCRAPERS_WAYBACK_ARCHIVED_DAYS", 7)
+        self.batch_size = settings.getint("CITY_SCRAPERS_WAYBACK_BATCH_SIZE", 10)
+        self.batch_interval = settings.getfloat(
+            "CITY_SCRAPERS_WAYBACK_BATCH_INTERVAL", 30
+        )
+        self.endpoint = settings.get("CITY_SCRAPERS_WAYBACK_ENDPOINT") or (
+            "https://pragma.archivelab.org"
+            if is_post
+            else "https://web.archive.org/save/"
+        )
+        self.index = ArchiveIndex(
+            get_state_path(settings, "CITY_SCRAPERS_WAYBACK_INDEX_PATH", "archived.db")
+        )
+        self.pending = []
+        self.requeued = set()
+        self.last_batch = None
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    def spider_opened(self, spider):
+        """Queues URLs a spider provides up front, like the archivefeeds
+        command's URLs from the latest feed output"""
+        for url in getattr(spider, "archive_urls", []):
+            self.enqueue(url)
+
     def get_item_urls(self, item):
-        MAX_LINKS = 3
         if isinstance(item, Meeting):
             links = []
             if "legistar" in item["source"] and "Calendar.aspx" not in item["source"]:
                 links = [item["source"]]
-            links.extend(
-                random.sample(
-                    [link.get("href") for link in item.get("links", [])], MAX_LINKS
-                )
-            )
+            links.extend(link.get("href") for link in item.get("links", []))
             return links
         if isinstance(item, dict):
-            return random.sample(
-                [doc.get("url") for doc in item.get("documents", [])], MAX_LINKS
+            return [doc.get("url") for doc in item.get("documents", [])]
+        return []
+
+    def enqueue(self, url):
+        """Queues a URL unless it was already queued in this process or was
+        archived recently"""
+        if not url or urlparse(url).scheme not in ("http", "https"):
+            return
+        if "web.archive.org" in url or url in self.queued:
+            return
+        self.queued.add(url)
+        since = time.time() - self.archived_days * 86400
+        if self.index.archived_since(url, since):
+            self.stats.inc_value("wayback/skipped_recent")
+            return
+        self.pending.append(url)
+        self.stats.inc_value("wayback/queued")
+
+    def process_spider_output(self, response, result, spider):
+        if "wayback_url" in response.meta:
+            yield from result
+            return
+        if response.request.method == "GET":
+            self.enqueue(response.url)
+        for item in result:
+            for url in self.get_item_urls(item):
+                self.enqueue(url)
+            yield item
+
+    def wayback_request(self, url):
+        meta = {
+            "wayback_url": url,
+            "handle_httpstatus_list": [200, 429],
+            "dont_obey_robotstxt": True,
+            "dont_redirect": True,
+            "dont_retry": True,
+            "download_slot": SLOT_KEY,
+        }
+        if self.is_post:
+            return Request(
+                self.endpoint,
+                method="POST",
+                headers={"Content-Type": "application/json"},
+                body=json.dumps({"url": url}),
+                callback=self.handle_wayback,
+                meta=meta,
+                dont_filter=True,
             )
+        return Request(
+            f"{self.endpoint}{url}",
+            callback=self.handle_wayback,
+            meta=meta,
+            dont_filter=True,
+        )
+
+    def spider_idle(self, spider):
+        """Submits the next batch of queued URLs, keeping the spider open until
+        every batch has been submitted"""
+        if not self.pending:
+            return
+        now = time.monotonic()
+        if self.last_batch is None or now - self.last_batch >= self.batch_interval:
+            self.last_batch = now
+            batch = self.pending[: self.batch_size]
+            del self.pending[: self.batch_size]
+            for url in batch:
+                self.crawler.engine.crawl(self.wayback_request(url))
+            self.stats.inc_value("wayback/batches")
+        raise DontCloseSpider
+
+    def handle_wayback(self, response):
+        url = response.meta["wayback_url"]
+        if response.status == 200:
+            self.index.add(url)
+            self.stats.inc_value("wayback/archived")
+        elif response.status == 429 and url not in self.requeued:
+            # Rate limited, so try once more in a later batch
+            self.requeued.add(url)
+            self.pending.append(url)
+            self.stats.inc_value("wayback/rate_limited")
         return []
+
+    def spider_closed(self, spider):
+        self.index.close()
+
+
+class SharedResponseMiddleware:
+    """
+    Downloads requests flagged with meta["shared_response"] once per process.
+
+    When several spiders in the same process (e.g. under the crawlall command)
+    request the same URL, the first request goes out as usual and the others
+    wait for its response instead of downloading the page again. If the first
+    request fails, the waiting requests fall back to downloading on their own.
+    Waiting requests are tracked on the process's SharedState, and nothing is
+    kept once they've been served.
+    """
+
+    def __init__(self, shared_state):
+        self.waiters = shared_state.response_waiters
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(get_shared_state(crawler))
+
+    def process_request(self, request, spider):
+        if not request.meta.get("shared_response") or request.method != "GET":
+            return None
+        if request.meta.get("shared_response_owner"):
+            # Retries of the request that is downloading for everyone
+            return None
+        waiters = self.waiters.get(request.url)
+        if waiters is None:
+            self.waiters[request.url] = []
+            request.meta["shared_response_owner"] = True
+            return None
+        waiter = Deferred()
+        waiters.append(waiter)
+        spider.crawler.stats.inc_value("shared_response/reused")
+        return waiter
+
+    def process_response(self, request, response, spider):
+        if request.meta.get("shared_response_owner"):
+            for waiter in self.waiters.pop(request.url, None) or []:
+                waiter.callback(response.replace())
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if request.meta.get("shared_response_owner"):
+            for waiter in self.waiters.pop(request.url, None) or []:
+                # Returning None lets each waiting request download on its own
+                waiter.callback(None)
+        return None
+
+
+class ConditionalGetMiddleware:
+    """
+    Sends If-None-Match/If-Modified-Since headers for GET requests whose URL
+    was downloaded on an earlier run with an ETag or Last-Modified header.
+    A 304 Not Modified response is replaced by the stored response, so spiders
+    parse it as usual while only headers were transferred.
+    """
+
+    # Headers describing the encoded transfer, which don't apply to the
+    # decoded body that's stored
+    skip_headers = {"content-encoding", "content-length", "transfer-encoding"}
+
+    def __init__(self, crawler, path):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.store = ValidatorStore(path)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_CONDITIONAL_GET_ENABLED"):
+            raise NotConfigured
+        path = get_state_path(
+            crawler.settings, "CITY_SCRAPERS_CONDITIONAL_GET_PATH", "validators.db"
+        )
+        middleware = cls(crawler, path)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_closed(self, spider):
+        self.store.close()
+
+    def process_request(self, request, spider):
+        if request.method != "GET" or request.meta.get("dont_conditional_get"):
+            return None
+        stored = self.store.get_validators(request.url)
+        if stored is None:
+            return None
+        if stored["etag"]:
+            request.headers.setdefault("If-None-Match", stored["etag"])
+        if stored["last_modified"]:
+            request.headers.setdefault("If-Modified-Since", stored["last_modified"])
+        self.stats.inc_value("conditional_get/requests")
+        return None
+
+    def process_response(self, request, response, spider):
+        if request.method != "GET" or request.meta.get("dont_conditional_get"):
+            return response
+        if response.status == 304:
+            stored = self.store.get(request.url)
+            if stored is None:
+                return response
+            self.stats.inc_value("conditional_get/not_modified")
+            # The stored body is decoded, so this can be more than the bytes
+            # saved in transfer when responses are compressed
+            self.stats.inc_value(
+                "conditional_get/body_bytes_reused", len(stored["body"])
+            )
+            headers = Headers(stored["headers"])
+            respcls = responsetypes.from_args(
+                headers=headers, url=request.url, body=stored["body"]
+            )
+            return respcls(
+                url=request.url,
+                status=stored["status"],
+                headers=headers,
+                body=stored["body"],
+                request=request,
+                flags=response.flags + ["not_modified"],
+            )
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status == 200 and (etag or last_modified):
+            self.store.set(
+                request.url,
+                etag.decode("latin-1") if etag else None,
+                last_modified.decode("latin-1") if last_modified else None,
+                response.status,
+                {
+                    key.decode("latin-1"): [v.decode("latin-1") for v in values]
+                    for key, values in response.headers.items()
+                    if key.decode("latin-1").lower() not in self.skip_headers
+                },
+                response.body,
+            )
+            self.stats.inc_value("conditional_get/stored")
+        return response
+
+
+class CachedRobotsTxtMiddleware(RobotsTxtMiddleware):
+    """
+    RobotsTxtMiddleware that shares each host's robots.txt between every
+    crawler in the process and keeps it in .scrapy/city_scrapers/robots.db (or
+    CITY_SCRAPERS_ROBOTSTXT_CACHE_PATH) for later runs. Copies fetched within
+    CITY_SCRAPERS_ROBOTSTXT_CACHE_TTL seconds are used without a request, and
+    older ones are revalidated with If-None-Match/If-Modified-Since. Crawlers
+    needing a robots.txt that's already being fetched wait for that response,
+    and the stored copy is used if fetching it fails. Enabled by
+    CITY_SCRAPERS_ROBOTSTXT_CACHE_ENABLED, otherwise it's the same as
+    RobotsTxtMiddleware.
+    """
+
+    # Shared by every crawler in the process, keyed by netloc
+    entries = {}
+
+    # Middlewares waiting for a robots.txt another one is fetching, by netloc
+    fetching = {}
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.store = None
+        self.ttl = crawler.settings.getfloat("CITY_SCRAPERS_ROBOTSTXT_CACHE_TTL", 86400)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler)
+        if crawler.settings.getbool("CITY_SCRAPERS_ROBOTSTXT_CACHE_ENABLED"):
+            middleware.store = RobotsStore(
+                get_state_path(
+                    crawler.settings, "CITY_SCRAPERS_ROBOTSTXT_CACHE_PATH", "robots.db"
+                )
+            )
+            crawler.signals.connect(
+                middleware.spider_closed, signal=signals.spider_closed
+            )
+        return middleware
+
+    def spider_closed(self, spider):
+        self.store.close()
+
+    def get_entry(self, netloc):
+        """Returns the cached robots.txt for a netloc, or None"""
+        if netloc not in self.entries:
+            entry = self.store.get(netloc)
+            if entry is None:
+                return None
+            self.entries[netloc] = entry
+        return self.entries[netloc]
+
+    def robot_parser(self, request, spider):
+        url = urlparse_cached(request)
+        netloc = url.netloc
+        if self.store is None or netloc in self._parsers:
+            return super().robot_parser(request, spider)
+        entry = self.get_entry(netloc)
+        if entry is not None and time.time() - entry["fetched_at"] < self.ttl:
+            self.crawler.stats.inc_value("robotstxt/cached")
+            self._parsers[netloc] = self._parserimpl.from_crawler(
+                self.crawler, entry["body"]
+            )
+        elif netloc in self.fetching:
+            self._parsers[netloc] = Deferred()
+            self.fetching[netloc].append(self)
+        else:
+            self._parsers[netloc] = Deferred()
+            self.fetching[netloc] = []
+            headers = {}
+            if entry and entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry and entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+            robotsreq = Request(
+                f"{url.scheme}://{netloc}/robots.txt",
+                headers=headers,
+                priority=self.DOWNLOAD_PRIORITY,
+                meta={"dont_obey_robotstxt": True, "dont_conditional_get": True},
+                callback=NO_CALLBACK,
+            )
+            dfd = self.crawler.engine.download(robotsreq)
+            dfd.addCallback(self._cache_robots, netloc, entry, spider)
+            dfd.addErrback(self._logerror, robotsreq, spider)
+            dfd.addErrback(self._robots_fetch_error, netloc, entry)
+            self.crawler.stats.inc_value("robotstxt/request_count")
+        return super().robot_parser(request, spider)
+
+    def _cache_robots(self, response, netloc, entry, spider):
+        if entry is not None and (response.status == 304 or response.status >= 500):
+            if response.status == 304:
+                self.crawler.stats.inc_value("robotstxt/not_modified")
+            response = response.replace(body=entry["body"])
+        # Server errors aren't cached, so the next crawler tries again
+        if response.status < 500:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            etag = etag.decode("latin-1") if etag else None
+            last_modified = last_modified.decode("latin-1") if last_modified else None
+            if response.status == 304 and entry is not None:
+                etag = etag or entry["etag"]
+                last_modified = last_modified or entry["last_modified"]
+            entry = {
+                "body": response.body,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time(),
+            }
+            self.entries[netloc] = entry
+            self.store.set(netloc, **entry)
+        self._parse_robots(response, netloc, spider)
+        for middleware in self.fetching.pop(netloc, []):
+            middleware._set_parser(netloc, response.body)
+
+    def _robots_fetch_error(self, failure, netloc, entry):
+        if failure.type is not IgnoreRequest:
+            key = f"robotstxt/exception_count/{failure.type}"
+            self.crawler.stats.inc_value(key)
+        body = None
+        if entry is not None:
+            self.crawler.stats.inc_value("robotstxt/stale")
+            body = entry["body"]
+        self._set_parser(netloc, body)
+        for middleware in self.fetching.pop(netloc, []):
+            middleware._set_parser(netloc, body)
+
+    def _set_parser(self, netloc, body):
+        """Parses a robots.txt body for a netloc a request is waiting for"""
+        parser = None
+        if body is not None:
+            parser = self._parserimpl.from_crawler(self.crawler, body)
+        waiting = self._parsers[netloc]
+        self._parsers[netloc] = parser
+        waiting.callback(parser)
+
+
+class HostBucket:
+    """
+    Token bucket for one host group. Requests reserve a token and wait until
+    it's available, so requests from every crawler are spaced out at `rate`
+    per second after an initial burst. The rate is halved on 429/503
+    responses and cut by a quarter when a response is much slower than usual,
+    and recovers gradually with each healthy response (AIMD).
+    """
+
+    def __init__(self, rate, burst, min_rate, latency_factor, clock=time.monotonic):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.latency_factor = latency_factor
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.latency = None
+
+    def reserve(self):
+        """Takes a token and returns the seconds to wait before using it"""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def back_off(self, factor, pause=0.0):
+        self.rate = max(self.min_rate, self.rate * factor)
+        if pause:
+            self.paused_until = max(self.paused_until, self.clock() + pause)
+
+    def record(self, status, latency, retry_after=0.0):
+        """
+        Updates the rate from a response. Returns True if the host was backed
+        off.
+        """
+        if status in (429, 503):
+            self.back_off(0.5, retry_after)
+            return True
+        if latency is not None:
+            slow = (
+                self.latency is not None
+                and latency > self.latency * self.latency_factor
+            )
+            # Exponentially weighted average of recent latency
+            self.latency = (
+                latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            )
+            if slow:
+                self.back_off(0.75)
+                return True
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+        return False
+
+
+class HostThrottleMiddleware:
+    """
+    Limits requests to each host across every crawler in the process with a
+    shared HostBucket, so spiders hitting the same site (like the Wichita city
+    and BoardDocs spiders under crawlall) stay within one budget while each
+    keeps its own AutoThrottle state. Hosts can be grouped with the
+    CITY_SCRAPERS_HOST_THROTTLE_GROUPS setting, a dict of host to group name.
+    Enabled by CITY_SCRAPERS_HOST_THROTTLE_ENABLED.
+    """
+
+    # Shared by every crawler in the process, keyed by host group
+    buckets = {}
+
+    # Longest Retry-After pause honoured, in seconds
+    max_pause = 120.0
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.rate = settings.getfloat("CITY_SCRAPERS_HOST_THROTTLE_RATE", 4.0)
+        self.burst = settings.getfloat("CITY_SCRAPERS_HOST_THROTTLE_BURST", 4.0)
+        self.min_rate = settings.getfloat("CITY_SCRAPERS_HOST_THROTTLE_MIN_RATE", 0.2)
+        self.latency_factor = settings.getfloat(
+            "CITY_SCRAPERS_HOST_THROTTLE_LATENCY_FACTOR", 3.0
+        )
+        self.groups = settings.getdict("CITY_SCRAPERS_HOST_THROTTLE_GROUPS")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_HOST_THROTTLE_ENABLED"):
+            raise NotConfigured
+        return cls(crawler)
+
+    def get_bucket(self, request):
+        host = urlparse(request.url).hostname or ""
+        group = self.groups.get(host, host)
+        if group not in self.buckets:
+            self.buckets[group] = HostBucket(
+                self.rate, self.burst, self.min_rate, self.latency_factor
+            )
+        return self.buckets[group]
+
+    def process_request(self, request, spider):
+        wait = self.get_bucket(request).reserve()
+        if wait <= 0:
+            return None
+        self.stats.inc_value("host_throttle/delayed")
+        self.stats.inc_value("host_throttle/delay_seconds", wait)
+        return deferLater(reactor, wait, lambda: None)
+
+    def process_response(self, request, response, spider):
+        retry_after = 0.0
+        header = response.headers.get("Retry-After")
+        if header:
+            try:
+                retry_after = min(self.max_pause, float(header))
+            except ValueError:
+                pass
+        if self.get_bucket(request).record(
+            response.status, request.meta.get("download_latency"), retry_after
+        ):
+            self.stats.inc_value("host_throttle/backoffs")
+        return response
+
+
+class CircuitOpenError(IgnoreRequest):
+    """Raised for requests to a host while its circuit is open"""
+
+
+class HostCircuit:
+    """
+    Circuit breaker for one host. After `threshold` consecutive failures the
+    circuit opens and requests are refused until `cooldown` seconds have
+    passed. Then a single probe request is let through each cooldown: a
+    response closes the circuit, and another failure keeps it open.
+    """
+
+    def __init__(self, threshold, cooldown, retry_at=None, clock=time.time):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        # Set while the circuit is open
+        self.retry_at = retry_at
+
+    @property
+    def is_open(self):
+        return self.retry_at is not None
+
+    def allow(self):
+        """
+        Returns "closed" if a request can be sent, "probe" if it can be sent as
+        the probe of an open circuit, or None if it should be refused.
+        """
+        if self.retry_at is None:
+            return "closed"
+        now = self.clock()
+        if now < self.retry_at:
+            return None
+        # Wait another cooldown before the next probe, in case this one never
+        # gets a response
+        self.retry_at = now + self.cooldown
+        return "probe"
+
+    def record_success(self):
+        """Resets the failure count. Returns True if the circuit was closed."""
+        closed = self.retry_at is not None
+        self.failures = 0
+        self.retry_at = None
+        return closed
+
+    def record_failure(self, probe=False):
+        """Counts a failure. Returns True if the circuit was opened."""
+        if self.retry_at is not None:
+            # Failures of requests sent before the circuit opened don't count
+            if probe:
+                self.retry_at = self.clock() + self.cooldown
+            return False
+        self.failures += 1
+        if self.failures < self.threshold:
+            return False
+        self.retry_at = self.clock() + self.cooldown
+        return True
+
+
+class CircuitBreakerMiddleware:
+    """
+    Shares a HostCircuit per host between every crawler in the process, so once
+    a site has failed CITY_SCRAPERS_CIRCUIT_BREAKER_THRESHOLD times in a row
+    (download errors and 5xx responses, counting each retry) the remaining
+    requests to it from every spider fail immediately with CircuitOpenError
+    instead of waiting through their own timeouts and retries. One probe
+    request is let through every CITY_SCRAPERS_CIRCUIT_BREAKER_COOLDOWN seconds
+    while the circuit is open. When CITY_SCRAPERS_CIRCUIT_BREAKER_PATH is set,
+    open circuits are also shared with other processes through a CircuitStore
+    at that path. Enabled by CITY_SCRAPERS_CIRCUIT_BREAKER_ENABLED.
+    """
+
+    # Shared by every crawler in the process, keyed by host
+    circuits = {}
+
+    failure_codes = {500, 502, 503, 504, 408, 522, 524}
+
+    def __init__(self, crawler, store=None):
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.store = store
+        self.threshold = settings.getint("CITY_SCRAPERS_CIRCUIT_BREAKER_THRESHOLD", 5)
+        self.cooldown = settings.getfloat(
+            "CITY_SCRAPERS_CIRCUIT_BREAKER_COOLDOWN", 300.0
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_CIRCUIT_BREAKER_ENABLED"):
+            raise NotConfigured
+        if not crawler.settings.get("CITY_SCRAPERS_CIRCUIT_BREAKER_PATH"):
+            return cls(crawler)
+        store = CircuitStore(
+            get_state_path(
+                crawler.settings, "CITY_SCRAPERS_CIRCUIT_BREAKER_PATH", "circuits.db"
+            )
+        )
+        middleware = cls(crawler, store)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_closed(self, spider):
+        self.store.close()
+
+    def get_circuit(self, request):
+        host = urlparse(request.url).hostname or ""
+        if host not in self.circuits:
+            retry_at = self.store.get(host) if self.store else None
+            self.circuits[host] = HostCircuit(self.threshold, self.cooldown, retry_at)
+        return host, self.circuits[host]
+
+    def save(self, host, circuit):
+        if self.store:
+            self.store.set(host, circuit.retry_at)
+
+    def process_request(self, request, spider):
+        host, circuit = self.get_circuit(request)
+        state = circuit.allow()
+        if state is None:
+            self.stats.inc_value("circuit_breaker/rejected")
+            raise CircuitOpenError(f"Circuit open for {host}")
+        if state == "probe":
+            self.stats.inc_value("circuit_breaker/probes")
+            request.meta["circuit_probe"] = True
+            self.save(host, circuit)
+        return None
+
+    def process_response(self, request, response, spider):
+        if response.status in self.failure_codes:
+            self.record_failure(request, spider)
+            return response
+        host, circuit = self.get_circuit(request)
+        if circuit.record_success():
+            spider.logger.info(f"Circuit closed for {host}")
+            self.stats.inc_value("circuit_breaker/closed")
+            self.save(host, circuit)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if not isinstance(exception, IgnoreRequest):
+            self.record_failure(request, spider)
+        return None
+
+    def record_failure(self, request, spider):
+        host, circuit = self.get_circuit(request)
+        probe = request.meta.pop("circuit_probe", False)
+        opened = circuit.record_failure(probe)
+        if opened:
+            spider.logger.warning(
+                f"Circuit opened for {host} after {circuit.failures} failures"
+            )
+            self.stats.inc_value("circuit_breaker/opened")
+        if opened or (probe and circuit.is_open):
+            self.save(host, circuit)
+
+
+# Upper bounds of the latency histogram buckets in seconds, with a final bucket
+# for anything slower
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0, 180.0]
+
+
+class LatencyHistogram:
+    """Counts of response times in each of the LATENCY_BUCKETS"""
+
+    def __init__(self, counts=None):
+        if counts and len(counts) == len(LATENCY_BUCKETS) + 1:
+            self.counts = list(counts)
+        else:
+            self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def add(self, latency):
+        self.counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def merge(self, other, max_total):
+        """
+        Adds the counts of another histogram, then scales the counts down to
+        max_total so older responses gradually count for less.
+        """
+        self.counts = [count + added for count, added in zip(self.counts, other.counts)]
+        total = self.total
+        if total > max_total:
+            self.counts = [round(count * max_total / total, 3) for count in self.counts]
+
+    def percentile(self, percentile):
+        """
+        Returns the upper bound of the bucket containing a percentile, or None
+        if it's in the final bucket.
+        """
+        target = self.total * percentile / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+
+class AdaptiveTimeoutMiddleware:
+    """
+    Sets the download timeout of each request from the p99 response time of
+    its host on earlier runs, multiplied by CITY_SCRAPERS_ADAPTIVE_TIMEOUT_FACTOR
+    and kept between CITY_SCRAPERS_ADAPTIVE_TIMEOUT_MIN and
+    CITY_SCRAPERS_ADAPTIVE_TIMEOUT_MAX (DOWNLOAD_TIMEOUT by default). Hosts
+    with fewer than CITY_SCRAPERS_ADAPTIVE_TIMEOUT_MIN_SAMPLES responses
+    recorded keep DOWNLOAD_TIMEOUT, as do spiders with their own
+    download_timeout and requests with a download_timeout in their meta.
+
+    Response times are recorded in a LatencyHistogram per host and merged into
+    .scrapy/city_scrapers/latency.json (or CITY_SCRAPERS_ADAPTIVE_TIMEOUT_PATH)
+    when the spider closes. Timeouts are recorded as responses taking the full
+    timeout, so a host that gets slower raises its own timeout on the next run.
+    Enabled by CITY_SCRAPERS_ADAPTIVE_TIMEOUT_ENABLED.
+    """
+
+    # Responses kept per host in the stored histograms
+    max_samples = 2000
+
+    # Histograms not updated within this many seconds are ignored
+    max_age = 30 * 86400
+
+    def __init__(self, crawler, cache):
+        settings = crawler.settings
+        self.stats = crawler.stats
+        self.cache = cache
+        self.default_timeout = settings.getfloat("DOWNLOAD_TIMEOUT")
+        self.max_timeout = settings.getfloat(
+            "CITY_SCRAPERS_ADAPTIVE_TIMEOUT_MAX", self.default_timeout
+        )
+        self.min_timeout = settings.getfloat("CITY_SCRAPERS_ADAPTIVE_TIMEOUT_MIN", 10.0)
+        self.factor = settings.getfloat("CITY_SCRAPERS_ADAPTIVE_TIMEOUT_FACTOR", 3.0)
+        self.min_samples = settings.getint(
+            "CITY_SCRAPERS_ADAPTIVE_TIMEOUT_MIN_SAMPLES", 20
+        )
+        # Response times recorded by this crawler
+        self.histograms = {}
+        self.timeouts = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_ADAPTIVE_TIMEOUT_ENABLED"):
+            raise NotConfigured
+        path = get_state_path(
+            crawler.settings, "CITY_SCRAPERS_ADAPTIVE_TIMEOUT_PATH", "latency.json"
+        )
+        middleware = cls(crawler, HostStatsCache(path))
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def get_timeout(self, host):
+        """Returns the timeout for a host, or None to keep the default"""
+        if host not in self.timeouts:
+            entry = self.cache.get(host, self.max_age)
+            histogram = LatencyHistogram(entry and entry["latency_histogram"])
+            timeout = None
+            if histogram.total >= self.min_samples:
+                p99 = histogram.percentile(99)
+                timeout = self.max_timeout
+                if p99 is not None:
+                    timeout = min(
+                        self.max_timeout, max(self.min_timeout, p99 * self.factor)
+                    )
+            self.timeouts[host] = timeout
+        return self.timeouts[host]
+
+    def get_histogram(self, request):
+        host = urlparse(request.url).hostname or ""
+        return self.histograms.setdefault(host, LatencyHistogram())
+
+    def process_request(self, request, spider):
+        if getattr(spider, "download_timeout", None):
+            return None
+        # Retries keep the adaptive timeout of the first attempt
+        if request.meta.get("download_timeout", self.default_timeout) != (
+            self.default_timeout
+        ):
+            return None
+        timeout = self.get_timeout(urlparse(request.url).hostname or "")
+        if timeout is not None:
+            request.meta["download_timeout"] = timeout
+            self.stats.inc_value("adaptive_timeout/applied")
+        return None
+
+    def process_response(self, request, response, spider):
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            self.get_histogram(request).add(latency)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, (defer.TimeoutError, error.TimeoutError)):
+            self.stats.inc_value("adaptive_timeout/timeouts")
+            self.get_histogram(request).add(
+                request.meta.get("download_timeout", self.default_timeout)
+            )
+        return None
+
+    def spider_closed(self, spider):
+        values = {}
+        for host, histogram in self.histograms.items():
+            entry = self.cache.hosts.get(host) or {}
+            stored = LatencyHistogram(entry.get("latency_histogram"))
+            stored.merge(histogram, self.max_samples)
+            p99 = stored.percentile(99)
+            values[host] = {"latency_histogram": stored.counts, "latency_p99": p99}
+        if values:
+            self.cache.update(values)
+
+
+def strip_tags(body, tags):
+    """
+    Removes each element with one of the given tag names, along with its
+    contents, from an HTML body. Uses plain substring searches rather than a
+    regular expression since the bodies this is used for are large.
+    """
+    lower = body.lower()
+    spans = []
+    for tag in tags:
+        open_tag = b"<" + tag.encode()
+        close_tag = b"</" + tag.encode() + b">"
+        pos = 0
+        while True:
+            start = lower.find(open_tag, pos)
+            if start < 0:
+                break
+            pos = start + len(open_tag)
+            # Skip tags that only share a prefix, like <scripts>
+            if lower[pos : pos + 1] not in (b" ", b"\t", b"\r", b"\n", b"/", b">"):
+                continue
+            end = lower.find(close_tag, pos)
+            if end < 0:
+                break
+            pos = end + len(close_tag)
+            spans.append((start, pos))
+    parts = []
+    last = 0
+    for start, end in sorted(spans):
+        if start < last:
+            # Nested inside an element that's already removed
+            continue
+        parts.append(body[last:start])
+        last = end
+    parts.append(body[last:])
+    return b"".join(parts)
+
+
+class ResponsePruningMiddleware:
+    """
+    Removes inline elements like <script> and <style> from HTML responses
+    before spiders build a selector for them. Spiders opt in by setting a
+    `prune_response_tags` attribute with the tag names to remove. This is for
+    pages like the WAMPO Wix site, where most of the body is inline scripts
+    and JSON that would otherwise be parsed on every response.
+
+    Bytes before and after pruning and the time spent pruning and parsing the
+    pruned body are recorded in the crawl stats. If
+    CITY_SCRAPERS_PRUNE_MEASURE_UNPRUNED is set, the unpruned body is also
+    parsed so the two parse times can be compared.
+    """
+
+    def __init__(self, stats, measure_unpruned=False):
+        self.stats = stats
+        self.measure_unpruned = measure_unpruned
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            crawler.stats,
+            crawler.settings.getbool("CITY_SCRAPERS_PRUNE_MEASURE_UNPRUNED"),
+        )
+
+    def process_response(self, request, response, spider):
+        tags = getattr(spider, "prune_response_tags", None)
+        if not tags or not isinstance(response, HtmlResponse):
+            return response
+        if self.measure_unpruned:
+            started = time.perf_counter()
+            Selector(response)
+            self.stats.inc_value(
+                "response_pruning/unpruned_parse_seconds",
+                time.perf_counter() - started,
+            )
+        started = time.perf_counter()
+        body = strip_tags(response.body, tags)
+        prune_seconds = time.perf_counter() - started
+        pruned = response.replace(body=body)
+        # Build the selector now so its parse time is measured. It's cached on
+        # the response, so the spider's callback reuses it.
+        started = time.perf_counter()
+        pruned.selector
+        parse_seconds = time.perf_counter() - started
+
+        self.stats.inc_value("response_pruning/responses")
+        self.stats.inc_value("response_pruning/bytes_before", len(response.body))
+        self.stats.inc_value("response_pruning/bytes_after", len(body))
+        self.stats.inc_value("response_pruning/prune_seconds", prune_seconds)
+        self.stats.inc_value("response_pruning/parse_seconds", parse_seconds)
+        spider.logger.debug(
+            f"Pruned {response.url} from {len(response.body)} to {len(body)} bytes "
+            f"in {prune_seconds:.4f}s, parsed in {parse_seconds:.4f}s"
+        )
+        return pruned
+
+
+class CallbackTimingMiddleware:
+    """
+    Records the wall time and CPU time spent in each spider callback, along
+    with the response bytes and the items and requests it produced, as
+    callback_timing/<callback>/* crawl stats. Time is only counted while the
+    callback's output is being generated, so time spent downloading or in
+    other components isn't included. Enabled by the
+    CITY_SCRAPERS_CALLBACK_TIMING_ENABLED setting, and CallbackTimingExtension
+    writes the results to a JSON report when the spider closes.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("CITY_SCRAPERS_CALLBACK_TIMING_ENABLED"):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def _callback_name(self, response):
+        callback = response.request.callback if response.request else None
+        return getattr(callback, "__name__", None) or "parse"
+
+    def _record(self, name, response, wall, cpu, items, requests):
+        prefix = f"callback_timing/{name}"
+        self.stats.inc_value(f"{prefix}/responses")
+        self.stats.inc_value(f"{prefix}/response_bytes", len(response.body))
+        self.stats.inc_value(f"{prefix}/wall_seconds", wall)
+        self.stats.inc_value(f"{prefix}/cpu_seconds", cpu)
+        self.stats.inc_value(f"{prefix}/items", items)
+        self.stats.inc_value(f"{prefix}/requests", requests)
+
+    def process_spider_output(self, response, result, spider):
+        wall = cpu = 0.0
+        items = requests = 0
+        result = iter(result)
+        try:
+            while True:
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    output = next(result)
+                finally:
+                    wall += time.perf_counter() - wall_start
+                    cpu += time.thread_time() - cpu_start
+                if isinstance(output, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield output
+        except StopIteration:
+            pass
+        finally:
+            self._record(
+                self._callback_name(response), response, wall, cpu, items, requests
+            )
+
+    async def process_spider_output_async(self, response, result, spider):
+        wall = cpu = 0.0
+        items = requests = 0
+        result = result.__aiter__()
+        try:
+            while True:
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    output = await result.__anext__()
+                finally:
+                    wall += time.perf_counter() - wall_start
+                    cpu += time.thread_time() - cpu_start
+                if isinstance(output, Request):
+                    requests += 1
+                else:
+                    items += 1
+                yield output
+        except StopAsyncIteration:
+            pass
+        finally:
+            self._record(
+                self._callback_name(response), response, wall, cpu, items, requests
+            )
+
+
+class DuplicateMeetingMiddleware:
+    """
+    Merges meetings with the same ID and content in the output of a callback,
+    like a meeting listed under several tabs of a WAMPO page, into the first
+    one with the links of all of them. Meetings are held until the callback
+    finishes, while requests are passed on right away. The number merged is
+    recorded as the duplicates/merged stat.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def _add(self, meetings, meeting, spider):
+        key = get_meeting_key(meeting)
+        if key in meetings:
+            merge_links(meetings[key], meeting["links"])
+            self.stats.inc_value("duplicates/merged", spider=spider)
+        else:
+            meetings[key] = meeting
+
+    def process_spider_output(self, response, result, spider):
+        meetings = {}
+        for output in result:
+            if isinstance(output, Meeting):
+                self._add(meetings, output, spider)
+            else:
+                yield output
+        yield from meetings.values()
+
+    async def process_spider_output_async(self, response, result, spider):
+        meetings = {}
+        async for output in result:
+            if isinstance(output, Meeting):
+                self._add(meetings, output, spider)
+            else:
+                yield output
+        for meeting in meetings.values():
+            yield meeting
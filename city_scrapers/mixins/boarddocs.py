@@ -1,6 +1,7 @@
+import json
 import random
 import re
-from datetime import datetime
+from datetime import date, datetime
 
 from city_scrapers_core.constants import BOARD
 from city_scrapers_core.items import Meeting
@@ -8,6 +9,12 @@ from city_scrapers_core.spiders import CityScrapersSpider
 from dateutil.relativedelta import relativedelta
 from scrapy import Request
 
+from city_scrapers.mixins.crawl_state import CrawlStateMixin
+
+# A JSON string (skipping escaped quotes) or a brace outside of one
+TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}]', re.S)
+NUMBERDATE_RE = re.compile(rb'"numberdate"\s*:\s*"(\d{8})"')
+
 
 class BoardDocsMixinMeta(type):
     def __init__(cls, name, bases, dct):
@@ -23,10 +30,12 @@ class BoardDocsMixinMeta(type):
         super().__init__(name, bases, dct)
 
 
-class BoardDocsMixin(CityScrapersSpider, metaclass=BoardDocsMixinMeta):
+class BoardDocsMixin(CrawlStateMixin, CityScrapersSpider, metaclass=BoardDocsMixinMeta):
     """
     A mixin for spiders scraping the BoardDocs platform
-    for meeting information.
+    for meeting information. Meetings already in the crawl state
+    store are re-emitted instead of requesting their details again
+    (see CrawlStateMixin).
     """
 
     custom_settings = {"ROBOTSTXT_OBEY": False}
@@ -60,11 +69,13 @@ class BoardDocsMixin(CityScrapersSpider, metaclass=BoardDocsMixinMeta):
 
     def parse(self, response):
         """Parse the JSON list of meetings"""
-        meetings = response.json()
-        filtered_meetings = self._get_clean_meetings(meetings)
-        for item in filtered_meetings:
+        for item in self._iter_recent_meetings(response.body):
             meeting_id = item["unique"]
             start_date = item["start_date"]
+            cached_meeting = self._get_cached_meeting(meeting_id, start_date)
+            if cached_meeting:
+                yield cached_meeting
+                continue
             detail_url = f"https://go.boarddocs.com/{self.boarddocs_state}/{self.boarddocs_slug}/Board.nsf/BD-GetMeeting?open&0.{self.gen_random_int()}"  # noqa
             details_body = (
                 f"current_committee_id={self.boarddocs_committee_id}&id={meeting_id}"
@@ -78,13 +89,80 @@ class BoardDocsMixin(CityScrapersSpider, metaclass=BoardDocsMixinMeta):
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
             )
 
+    def _get_cutoff_numberdate(self):
+        """Returns the date two months ago in the YYYYMMDD format of
+        numberdate, which sorts the same way as the dates themselves."""
+        two_months_ago = datetime.today() - relativedelta(months=2)
+        return two_months_ago.strftime("%Y%m%d")
+
+    def _parse_numberdate(self, numberdate):
+        return date(int(numberdate[:4]), int(numberdate[4:6]), int(numberdate[6:8]))
+
+    def _iter_recent_meetings(self, body):
+        """
+        Yields meetings newer than 2 months straight from the raw bytes of the
+        meetings list, with a start_date key added to each. Each numberdate
+        is compared as a string before anything is decoded, so older meetings
+        are skipped without building the full list. Element bounds are only
+        scanned for (skipping braces inside strings) up to a recent meeting,
+        and only that element is decoded.
+        """
+        if not body.lstrip().startswith(b"["):
+            yield from self._get_clean_meetings(json.loads(body))
+            return
+        cutoff = self._get_cutoff_numberdate()
+        cutoff_bytes = cutoff.encode()
+        # Bounds of the last element scanned
+        start = end = 0
+        # Empty items have no numberdate, so they're never matched
+        for match in NUMBERDATE_RE.finditer(body):
+            if match.group(1) <= cutoff_bytes or match.start() < end:
+                continue
+            while end <= match.start():
+                start = body.find(b"{", end)
+                if start == -1:
+                    return
+                end = self._find_meeting_end(body, start)
+            item = json.loads(body[start:end])
+            # A key can end in "numberdate" after an escaped quote, so the
+            # match isn't trusted until the element is decoded
+            if item.get("numberdate", "") > cutoff:
+                item["start_date"] = self._parse_numberdate(item["numberdate"])
+                yield item
+
+    def _find_meeting_end(self, body, start):
+        """
+        Returns the index just past the brace closing the object at start,
+        ignoring braces inside strings. Meetings are flat objects, so the
+        next closing brace is usually it: when there are no escapes or other
+        opening braces before it, it's outside a string if an even number of
+        quotes come first. Otherwise strings and braces are scanned in turn.
+        """
+        end = body.find(b"}", start)
+        if (
+            end != -1
+            and body.find(b"\\", start, end) == -1
+            and body.find(b"{", start + 1, end) == -1
+            and body.count(b'"', start, end) % 2 == 0
+        ):
+            return end + 1
+        depth = 0
+        for match in TOKEN_RE.finditer(body, start):
+            token = match.group()
+            if token == b"{":
+                depth += 1
+            elif token == b"}":
+                depth -= 1
+                if not depth:
+                    return match.end()
+        raise ValueError("Unterminated object in BoardDocs meetings list")
+
     def _get_clean_meetings(self, data):
         """
         Cleans the data by removing any items with a date older than 2 months.
         Also adds a start_date key to each item with the parsed date.
         """
-        today = datetime.today()
-        two_months_ago = today - relativedelta(months=2)
+        cutoff = self._get_cutoff_numberdate()
 
         # Filter the data and add start_date
         filtered_data = []
@@ -92,9 +170,8 @@ class BoardDocsMixin(CityScrapersSpider, metaclass=BoardDocsMixinMeta):
             if not item:
                 # Some items are empty
                 continue
-            item_date = datetime.strptime(item["numberdate"], "%Y%m%d").date()
-            if item_date > two_months_ago.date():
-                item["start_date"] = item_date
+            if item["numberdate"] > cutoff:
+                item["start_date"] = self._parse_numberdate(item["numberdate"])
                 filtered_data.append(item)
         return filtered_data
 
@@ -126,6 +203,7 @@ class BoardDocsMixin(CityScrapersSpider, metaclass=BoardDocsMixinMeta):
         )
         meeting["status"] = self._get_status(meeting)
         meeting["id"] = self._get_id(meeting)
+        self._save_meeting_state(meeting_id, response, meeting)
         yield meeting
 
     def _parse_title(self, response):
@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta
+
+from city_scrapers_core.constants import CANCELLED
+
+from city_scrapers.state import deserialize_meeting
+
+
+class CrawlStateMixin:
+    """
+    Helpers for spiders that fetch one detail page per meeting. When
+    CrawlStateExtension is enabled, meetings that started more than
+    CITY_SCRAPERS_STATE_MUTABLE_DAYS ago and were already fetched on an earlier
+    run are re-emitted from the local state store instead of being requested
+    again. Without the extension every detail page is requested as before.
+    """
+
+    crawl_state = None
+
+    def _get_cached_meeting(self, key, start):
+        """
+        Returns the stored Meeting for a source identifier if the meeting is
+        outside the mutable window, otherwise None.
+        """
+        if self.crawl_state is None or not key or not start:
+            return None
+        if not isinstance(start, datetime) and isinstance(start, date):
+            start = datetime.combine(start, datetime.min.time())
+        mutable_days = self.settings.getint("CITY_SCRAPERS_STATE_MUTABLE_DAYS", 14)
+        if start >= datetime.now() - timedelta(days=mutable_days):
+            return None
+        row = self.crawl_state.get(self.name, key)
+        if row is None:
+            return None
+        self.crawler.stats.inc_value("crawl_state/skipped")
+        meeting = deserialize_meeting(row["item"])
+        # The status was computed when the meeting was fetched, so it's updated
+        # for meetings that have passed since. Cancellations are kept, since
+        # they can come from text that isn't stored with the meeting.
+        if meeting["status"] != CANCELLED:
+            meeting["status"] = self._get_status(meeting)
+        meeting["id"] = self._get_id(meeting)
+        return meeting
+
+    def _save_meeting_state(self, key, response, meeting):
+        """Records the fetched detail page and the meeting parsed from it"""
+        if self.crawl_state is None or not key:
+            return
+        changed = self.crawl_state.set(self.name, key, response.body, meeting)
+        self.crawler.stats.inc_value(
+            "crawl_state/changed" if changed else "crawl_state/unchanged"
+        )
@@ -5,7 +5,8 @@ from unicodedata import normalize
 from city_scrapers_core.constants import COMMITTEE
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.parser import parse
+
+from city_scrapers.dates import parse_date
 
 
 class WampoMixinTabsMeta(type):
@@ -51,6 +52,7 @@ class WampoMixinTabs(CityScrapersSpider, metaclass=WampoMixinTabsMeta):
     }
     timezone = "America/Chicago"
     start_time = None
+    prune_response_tags = ("script", "style")
 
     def parse(self, response):
         """
@@ -90,7 +92,7 @@ class WampoMixinTabs(CityScrapersSpider, metaclass=WampoMixinTabsMeta):
                 clean_text,
             ):
                 try:
-                    start_date = parse(clean_text)
+                    start_date = parse_date(clean_text)
                     start_datetime = datetime.combine(start_date, self.start_time)
                     return start_datetime
                 except ValueError:
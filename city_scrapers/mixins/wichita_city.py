@@ -1,21 +1,31 @@
 import re
-from datetime import datetime
-from urllib.parse import urljoin, urlparse
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qs, urljoin, urlparse
 
+import pytz
 import scrapy
 from city_scrapers_core.constants import BOARD, CITY_COUNCIL, COMMITTEE, NOT_CLASSIFIED
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.parser import parse
 from dateutil.relativedelta import relativedelta
 
+from city_scrapers.dates import parse_date
+from city_scrapers.extraction import Field, FieldExtractor
+from city_scrapers.ical import iter_vevents
+from city_scrapers.mixins.crawl_state import CrawlStateMixin
+from city_scrapers.state import get_shared_state
+
 
 class WichitaCityMixinMeta(type):
     """
     Metaclass that enforces the implementation of required static
     variables in child classes that inherit from WichitaCityMixin.
+    It also keeps a registry of every declared cid so the calendars
+    can be fetched together in shared calendar mode.
     """
 
+    cids = set()
+
     def __init__(cls, name, bases, dct):
         required_static_vars = ["agency", "name", "cid"]
         missing_vars = [var for var in required_static_vars if var not in dct]
@@ -26,21 +36,40 @@ class WichitaCityMixinMeta(type):
                 f"{name} must define the following static variable(s): {missing_vars_str}."  # noqa
             )
 
+        if dct["cid"]:
+            WichitaCityMixinMeta.cids.add(str(dct["cid"]))
         super().__init__(name, bases, dct)
 
 
-class WichitaCityMixin(CityScrapersSpider, metaclass=WichitaCityMixinMeta):
+class WichitaCityMixin(
+    CrawlStateMixin, CityScrapersSpider, metaclass=WichitaCityMixinMeta
+):
     """
     This class is designed to scrape data from the City of Wichita government website.
     Boards and committees are identified by a unique 'cid' value in the URL.
 
     To use this mixin, create a new spider class that inherits from both this mixin.
     'agency', 'name', and 'cid' must be defined as static vars in the spider class.
+
+    When the CITY_SCRAPERS_WICHITA_SHARED_CALENDAR setting is enabled, spiders
+    request one calendar listing covering a batch of cids (see cid_batch_size)
+    instead of one listing each. Paired with SharedResponseMiddleware, spiders
+    running in the same process download and parse each listing only once.
+
+    When the CITY_SCRAPERS_WICHITA_ICAL setting is enabled, meetings are built
+    from the cid's CivicPlus iCalendar feed instead of one detail page per
+    meeting. Detail pages are only requested for meetings within
+    ical_detail_days of today, to pick up agenda links the feed doesn't carry.
+
+    Detail pages of past meetings already in the crawl state store are not
+    requested again, and the stored meeting is re-emitted (see CrawlStateMixin).
     """
 
     name = None
     agency = None
     cid = None
+    cid_batch_size = 16
+    ical_detail_days = 30
     timezone = "America/Chicago"
     base_url = "https://www.wichita.gov"
     links = [
@@ -50,82 +79,260 @@ class WichitaCityMixin(CityScrapersSpider, metaclass=WichitaCityMixinMeta):
         }
     ]
 
+    # Fields of an event detail page, pulled from the module content subtree
+    detail_extractor = FieldExtractor(
+        root_css="#ctl00_ctl00_MainContent_ModuleContent_ctl00_contentUpdatePanel",
+        fields={
+            "title": Field(css="h2[id$='_eventTitle']::text"),
+            "date": Field(css="div[id$='_dateDiv']::text"),
+            "time": Field(css="div[id$='_time'] .specificDetailItem::text"),
+            "location_name": Field(
+                css=".specificDetailItem div[itemprop='name']::text"
+            ),
+            "location_street": Field(
+                css=".specificDetailItem span[itemprop='streetAddress']::text"
+            ),
+            "location_locality": Field(
+                css=".specificDetailItem span[itemprop='addressLocality']::text"
+            ),
+            "location_region": Field(
+                css=".specificDetailItem span[itemprop='addressRegion']::text"
+            ),
+            "location_postal_code": Field(
+                css=".specificDetailItem span[itemprop='postalCode']::text"
+            ),
+            "description_text": Field(
+                css="div[itemprop='description'] ::text", many=True
+            ),
+            "description_links": Field(
+                css="div[itemprop='description'] a",
+                fields={"text": Field(css="::text"), "href": Field(css="::attr(href)")},
+            ),
+            "agenda_download": Field(css="a.agendaDownload::attr(href)"),
+            "links": Field(
+                css="div[id$='_links'] a[itemprop='url']",
+                fields={
+                    "href": Field(css="::attr(href)"),
+                    "title": Field(css="::text"),
+                },
+            ),
+        },
+    )
+
     def start_requests(self):
         """Generate request using an URL derived from base url,
         cid (agency identifier) and a range based on the date
         one month prior and six months ahead of the current date."""
+        if self.settings.getbool("CITY_SCRAPERS_WICHITA_ICAL"):
+            yield scrapy.Request(self._ical_url(), self._parse_ical)
+        elif self.settings.getbool("CITY_SCRAPERS_WICHITA_SHARED_CALENDAR"):
+            yield scrapy.Request(
+                self._calendar_url(",".join(self._get_cid_batch())),
+                self.parse,
+                meta={"shared_response": True, "shared_calendar": True},
+            )
+        else:
+            yield scrapy.Request(self._calendar_url(self.cid), self.parse)
+
+    def _get_date_range(self):
+        """Returns the first day of the month one month prior and six
+        months ahead of the current date."""
         now = datetime.now()
         start_date = (now - relativedelta(months=1)).replace(day=1)
-        start_date_str = start_date.strftime("%m/%d/%Y")
         end_date = (now + relativedelta(months=6)).replace(day=1)
-        end_date_str = end_date.strftime("%m/%d/%Y")
+        return start_date.date(), end_date.date()
 
-        # Generate URL
-        calendar_url = f"{self.base_url}/calendar.aspx?Keywords=&startDate={start_date_str}&enddate={end_date_str}&CID={self.cid}&showPastEvents=true"  # noqa
-        yield scrapy.Request(calendar_url, self.parse)
+    def _calendar_url(self, cid):
+        """Builds the calendar listing URL for one cid or a comma-separated
+        list of cids"""
+        start_date, end_date = self._get_date_range()
+        start_date_str = start_date.strftime("%m/%d/%Y")
+        end_date_str = end_date.strftime("%m/%d/%Y")
+        return f"{self.base_url}/calendar.aspx?Keywords=&startDate={start_date_str}&enddate={end_date_str}&CID={cid}&showPastEvents=true"  # noqa
+
+    def _get_cid_batch(self):
+        """Returns the batch of registered cids that includes this spider's
+        cid. Every spider computes the same batches, so spiders in the same
+        batch request the same URL."""
+        cids = sorted(WichitaCityMixinMeta.cids | {str(self.cid)}, key=int)
+        for i in range(0, len(cids), self.cid_batch_size):
+            batch = cids[i : i + self.cid_batch_size]
+            if str(self.cid) in batch:
+                return batch
 
     def parse(self, response):
         """
         Parse the retrieved HTML, loop over the meeting, and parse the
         detail page for each one.
         """
-        selector = f"#CID{self.cid} > ol > li"
-        for item in response.css(selector):
-            event_query_string = item.css("h3 a::attr(href)").get()
-            yield response.follow(event_query_string, self._parse_detail)
+        if response.meta.get("shared_calendar"):
+            event_links = self._get_shared_event_links(response)
+        else:
+            selector = f"#CID{self.cid} > ol > li"
+            event_links = self._parse_event_links(response.css(selector))
+        for event_query_string, start_str in event_links:
+            event_id = self._parse_event_id(event_query_string)
+            start = datetime.fromisoformat(start_str) if start_str else None
+            cached_meeting = self._get_cached_meeting(event_id, start)
+            if cached_meeting:
+                yield cached_meeting
+                continue
+            yield response.follow(
+                event_query_string, self._parse_detail, meta={"event_id": event_id}
+            )
+
+    def _get_shared_event_links(self, response):
+        """Parses a shared calendar listing once per process, grouping event
+        links by cid on the process's SharedState, and returns the links for
+        this spider's cid. Each cid's links are removed once they're taken,
+        and the listing's entry once every cid has been taken."""
+        calendar_links = get_shared_state(self.crawler).calendar_links
+        cached = calendar_links.get(response.url)
+        if cached is None:
+            cached = {}
+            for calendar in response.css("div[id^='CID']"):
+                cid = calendar.attrib["id"][3:]
+                cached[cid] = self._parse_event_links(calendar.xpath("./ol/li"))
+            calendar_links[response.url] = cached
+        event_links = cached.pop(str(self.cid), [])
+        if not cached:
+            del calendar_links[response.url]
+        return event_links
+
+    def _parse_event_links(self, items):
+        """Extracts the detail page link and ISO start datetime from each
+        calendar listing item."""
+        return [
+            (
+                item.css("h3 a::attr(href)").get(),
+                item.css("span[itemprop='startDate']::text").get(),
+            )
+            for item in items
+        ]
+
+    def _parse_event_id(self, event_query_string):
+        """Extracts the EID query parameter identifying an event."""
+        query = parse_qs(urlparse(event_query_string or "").query)
+        return next(iter(query.get("EID", [])), None)
+
+    def _ical_url(self):
+        """Builds the CivicPlus iCalendar feed URL for this spider's cid"""
+        return f"{self.base_url}/common/modules/iCalendar/iCalendar.aspx?feed=calendar&catID={self.cid}"  # noqa
+
+    def _parse_ical(self, response):
+        """
+        Parse every meeting in the cid's iCalendar feed within the date range.
+        Meetings close to today are completed with links from their detail
+        page, the rest are yielded straight from the feed.
+        """
+        start_date, end_date = self._get_date_range()
+        today = datetime.now().date()
+        detail_window = timedelta(days=self.ical_detail_days)
+        for component in iter_vevents(response.body, start_date, end_date):
+            start = self._parse_ical_datetime(component.get("dtstart"))
+            if not start or not start_date <= start.date() < end_date:
+                continue
+            title = str(component.get("summary", "")).strip()
+            detail_url = str(component.get("url", ""))
+            meeting = Meeting(
+                title=title,
+                description=self._parse_ical_description(component),
+                classification=self._parse_classification(title),
+                start=start,
+                end=self._parse_ical_datetime(component.get("dtend")),
+                all_day=False,
+                time_notes="",
+                location=self._parse_ical_location(component),
+                links=self.links.copy(),
+                source=detail_url or response.url,
+            )
+            meeting["status"] = self._get_status(meeting)
+            meeting["id"] = self._get_id(meeting)
+
+            if detail_url and abs(start.date() - today) <= detail_window:
+                yield response.follow(
+                    detail_url,
+                    self._parse_ical_detail,
+                    cb_kwargs={"meeting": meeting},
+                )
+            else:
+                yield meeting
+
+    def _parse_ical_detail(self, response, meeting):
+        """Adds the links only available on the detail page to a meeting
+        parsed from the iCalendar feed."""
+        meeting["links"] = self._parse_links(self.detail_extractor.extract(response))
+        yield meeting
+
+    def _parse_ical_datetime(self, prop):
+        """Converts an iCalendar date or datetime property to a naive
+        datetime object in the spider's timezone."""
+        if not prop:
+            return None
+        value = prop.dt
+        if not isinstance(value, datetime) and isinstance(value, date):
+            return datetime.combine(value, datetime.min.time())
+        if value.tzinfo is not None:
+            value = value.astimezone(pytz.timezone(self.timezone))
+        return value.replace(tzinfo=None)
+
+    def _parse_ical_description(self, component):
+        """Collapses whitespace and removes hidden/non-printable characters,
+        matching the cleanup of detail page descriptions."""
+        description = " ".join(str(component.get("description", "")).split())
+        return re.sub(r"[^\x20-\x7E]+", "", description)
+
+    def _parse_ical_location(self, component):
+        """The feed's location is the place name on the first line
+        followed by the address lines."""
+        lines = [
+            line.strip()
+            for line in str(component.get("location", "")).splitlines()
+            if line.strip()
+        ]
+        return {
+            "name": lines[0] if lines else "",
+            "address": ", ".join(lines[1:]),
+        }
 
     def _parse_detail(self, item):
-        title = self._parse_title(item)
+        record = self.detail_extractor.extract(item)
+        title = record["title"]
         meeting = Meeting(
             title=title,
-            description=self._parse_description(item),
+            description=self._parse_description(record),
             classification=self._parse_classification(title),
-            start=self._parse_start(item),
-            end=self._parse_end(item),
+            start=self._parse_start(record),
+            end=self._parse_end(record),
             all_day=False,
             time_notes="",
-            location=self._parse_location(item),
-            links=self._parse_links(item),
+            location=self._parse_location(record),
+            links=self._parse_links(record),
             source=item.url,
         )
 
         meeting["status"] = self._get_status(meeting)
         meeting["id"] = self._get_id(meeting)
+        self._save_meeting_state(item.meta.get("event_id"), item, meeting)
 
         yield meeting
 
-    def _parse_title(self, item):
-        """Extracts the event title."""
-        return (
-            item.css(
-                "h2#ctl00_ctl00_MainContent_ModuleContent_ctl00_ctl04_eventTitle::text"
-            )
-            .get()
-            .strip()
-        )
-
-    def _parse_description(self, item):
-        """Extracts and cleans the HTML to return only text,
+    def _parse_description(self, record):
+        """Cleans the description text to return only text,
         including the original URLs in the text, while removing any
         hidden or non-printable characters."""
-        description_sel = item.css("div[itemprop='description']")
         description_texts = []
 
-        # Extract text nodes
-        for text_node in description_sel.css("::text").getall():
-            cleaned_text = re.sub(
-                r"\s+", " ", text_node
-            ).strip()  # Replace multiple whitespaces with a single space
-            # Check if text is not empty after cleaning
+        # Replace multiple whitespaces with a single space, skipping empty text
+        for text_node in record["description_text"]:
+            cleaned_text = re.sub(r"\s+", " ", text_node).strip()
             if cleaned_text:
                 description_texts.append(cleaned_text)
 
-        # Extract and format links
-        for a_tag in description_sel.css("a"):
-            text = a_tag.css("::text").get(default="").strip()
-            href = a_tag.css("::attr(href)").get(default="").strip()
-            if text and href:
-                description_texts.append(f"{text}({href})")
+        # Format links
+        for link in record["description_links"]:
+            if link["text"] and link["href"]:
+                description_texts.append(f"{link['text']}({link['href']})")
 
         # Join all parts and strip leading/trailing whitespace
         description = " ".join(description_texts).strip()
@@ -147,82 +354,39 @@ class WichitaCityMixin(CityScrapersSpider, metaclass=WichitaCityMixinMeta):
         else:
             return NOT_CLASSIFIED
 
-    def _parse_start(self, response):
-        """Extracts the start datetime as a naive datetime object.
-        Some events have a dash in the time, indicating start and end times
-        """
-        date_str = (
-            response.css(
-                "div#ctl00_ctl00_MainContent_ModuleContent_ctl00_ctl04_dateDiv::text"
-            )
-            .get()
-            .strip()
-        )
-        time_sel = response.css(
-            "div#ctl00_ctl00_MainContent_ModuleContent_ctl00_ctl04_time .specificDetailItem::text"  # noqa
-        ).get()
-        has_dash = " - " in time_sel
-        if has_dash:
-            time_str = time_sel.strip().split(" - ")[0]
-        else:
-            time_str = time_sel.strip()
-        datetime_str = f"{date_str} {time_str}"
-        return parse(datetime_str)
+    def _parse_times(self, record):
+        """Splits the time text into start and end times. Some events have a
+        dash (surrounded by thin spaces) in the time, indicating start and end
+        times."""
+        return re.split(r"\s+-\s+", record["time"])
+
+    def _parse_start(self, record):
+        """Extracts the start datetime as a naive datetime object."""
+        time_str = self._parse_times(record)[0]
+        return parse_date(f"{record['date']} {time_str}")
 
-    def _parse_end(self, response):
+    def _parse_end(self, record):
         """Extracts the end datetime as a naive datetime object."""
-        date_str = (
-            response.css(
-                "div#ctl00_ctl00_MainContent_ModuleContent_ctl00_ctl04_dateDiv::text"
-            )
-            .get()
-            .strip()
-        )
-        time_sel = response.css(
-            "div#ctl00_ctl00_MainContent_ModuleContent_ctl00_ctl04_time .specificDetailItem::text"  # noqa
-        ).get()
-        has_dash = " - " in time_sel
-        if has_dash:
-            time_str = time_sel.strip().split(" - ")[1]
-            datetime_str = f"{date_str} {time_str}"
-            return parse(datetime_str)
+        times = self._parse_times(record)
+        if len(times) > 1:
+            return parse_date(f"{record['date']} {times[1]}")
         return None
 
-    def _parse_location(self, item):
-        """Extracts the event address and formats it"""
-        name = (
-            item.css(".specificDetailItem div[itemprop='name']::text")
-            .get(default="")
-            .strip()
+    def _parse_location(self, record):
+        """Formats the event address"""
+        region_and_postal = (
+            f"{record['location_region']} {record['location_postal_code']}"  # noqa
         )
-        street = (
-            item.css(".specificDetailItem span[itemprop='streetAddress']::text")
-            .get(default="")
-            .strip()
-        )
-        locality = (
-            item.css(".specificDetailItem span[itemprop='addressLocality']::text")
-            .get(default="")
-            .strip()
-        )
-        postal_code = (
-            item.css(".specificDetailItem span[itemprop='postalCode']::text")
-            .get(default="")
-            .strip()
-        )
-        region = (
-            item.css(".specificDetailItem span[itemprop='addressRegion']::text")
-            .get(default="")
-            .strip()
-        )
-        # Format the address
-        regionAndPostal = f"{region} {postal_code}"
-        address_components = [street, locality, regionAndPostal]
+        address_components = [
+            record["location_street"],
+            record["location_locality"],
+            region_and_postal.strip(),
+        ]
         formatted_address = ", ".join(
             component for component in address_components if component
         )
         return {
-            "name": name,
+            "name": record["location_name"],
             "address": formatted_address,
         }
 
@@ -236,7 +400,7 @@ class WichitaCityMixin(CityScrapersSpider, metaclass=WichitaCityMixinMeta):
         else:
             return url
 
-    def _parse_links(self, response):
+    def _parse_links(self, record):
         """Checks whether a "download agenda" link is present and
         any links are present in the "links" section. In most cases
         the "download agenda" button is not present."""
@@ -244,18 +408,13 @@ class WichitaCityMixin(CityScrapersSpider, metaclass=WichitaCityMixinMeta):
         new_links = self.links.copy()  # Copy the default links
 
         # Check "download agenda" button
-        agenda_button = response.css("a.agendaDownload::attr(href)").get()
-        if agenda_button:
-            href = self.ensure_absolute_url(agenda_button)
+        if record["agenda_download"]:
+            href = self.ensure_absolute_url(record["agenda_download"])
             new_links.append({"href": href, "title": "Download agenda"})
 
         # Check for other links
-        other_links = response.css(
-            "#ctl00_ctl00_MainContent_ModuleContent_ctl00_ctl04_links a[itemprop='url']"
-        )
-        for link in other_links:
-            href = self.ensure_absolute_url(link.css("::attr(href)").get())
-            title = link.css("::text").get()
-            new_links.append({"href": href, "title": title})
+        for link in record["links"]:
+            href = self.ensure_absolute_url(link["href"])
+            new_links.append({"href": href, "title": link["title"]})
 
         return new_links
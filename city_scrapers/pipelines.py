@@ -0,0 +1,184 @@
+import hashlib
+import json
+from datetime import datetime
+
+from city_scrapers_core.constants import CANCELLED
+from city_scrapers_core.decorators import ignore_processed
+from city_scrapers_core.items import Meeting
+from city_scrapers_core.pipelines import AzureDiffPipeline, DiffPipeline
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, DropItem
+from scrapy.http import Response
+
+from city_scrapers.state import MeetingStore, get_state_path
+
+
+def get_meeting_key(meeting):
+    """
+    Returns an 8 byte digest of a meeting's ID and content. Links and the source
+    URL are left out, so the same meeting listed on several pages or with
+    different links has the same key.
+    """
+    content = json.dumps(
+        {
+            key: value
+            for key, value in dict(meeting).items()
+            if key not in ("links", "source")
+        },
+        default=lambda value: value.isoformat(),
+        sort_keys=True,
+    )
+    return hashlib.blake2b(
+        f"{meeting['id']}\0{content}".encode(), digest_size=8
+    ).digest()
+
+
+def merge_links(meeting, links):
+    """Adds links to a meeting that it doesn't already have, by href"""
+    hrefs = {link["href"] for link in meeting["links"]}
+    for link in links:
+        if link["href"] not in hrefs:
+            meeting["links"].append(link)
+            hrefs.add(link["href"])
+
+
+def get_ocd_id(item):
+    """Returns the City Scrapers meeting ID of an Open Civic Data event"""
+    extras = item.get("extras") or item.get("extra") or {}
+    return extras.get("cityscrapers/id") or extras.get("cityscrapers.org/id") or ""
+
+
+class MeetingStoreDiffPipeline(DiffPipeline):
+    """
+    Diffs scraped meetings against a local MeetingStore instead of the previous
+    feed output. Open Civic Data IDs are looked up for each meeting as it's
+    scraped, and upcoming meetings that are in the store but weren't scraped
+    are output as cancelled once the spider is idle. The store is updated with
+    each item written to the feed.
+
+    The previous feed output is only downloaded to fill the store for spiders
+    that don't have any meetings in it yet.
+    """
+
+    def __init__(self, crawler, output_format, store):
+        self.store = store
+        self.run_id = datetime.now().isoformat()
+        super().__init__(crawler, output_format)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipelines = crawler.settings.get("ITEM_PIPELINES", {})
+        if "city_scrapers_core.pipelines.OpenCivicDataPipeline" not in pipelines:
+            raise ValueError(
+                "An output format pipeline must be enabled for diff middleware"
+            )
+        path = get_state_path(
+            crawler.settings, "CITY_SCRAPERS_DIFF_STORE_PATH", "meetings.db"
+        )
+        pipeline = cls(crawler, "ocd", MeetingStore(path))
+        spider = crawler.spider
+        if not pipeline.store.count(spider.name):
+            for item in pipeline.load_previous_results():
+                pipeline.store_item(item, spider, "")
+        spider._scraped_ids = set()
+        crawler.signals.connect(pipeline.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(pipeline.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def load_previous_results(self):
+        """Loads the previous feed output from Azure to fill an empty store"""
+        if not (self.crawler.settings.get("FEED_URI") or "").startswith("azure://"):
+            return []
+        return AzureDiffPipeline(
+            self.crawler, self.output_format
+        ).load_previous_results()
+
+    def store_item(self, item, spider, run_id):
+        self.store.set(
+            spider.name,
+            get_ocd_id(item),
+            item["_id"],
+            item["start_time"][:19],
+            item["status"],
+            item,
+            run_id,
+        )
+
+    def process_item(self, item, spider):
+        # Items from spider_idle are already in the Open Civic Data format
+        if not isinstance(item, Meeting) and "_id" in item:
+            return item
+        if item["id"] in spider._scraped_ids:
+            raise DropItem("Item has already been scraped")
+        spider._scraped_ids.add(item["id"])
+        stored = self.store.get(spider.name, item["id"])
+        if stored is None:
+            self.crawler.stats.inc_value("diff/new", spider=spider)
+            return item
+        if stored["status"] != item["status"]:
+            self.crawler.stats.inc_value("diff/status_changed", spider=spider)
+        else:
+            self.crawler.stats.inc_value("diff/unchanged", spider=spider)
+        # Bypass __setitem__ call on Meeting to add uid
+        if isinstance(item, Meeting):
+            item._values["_id"] = stored["uid"]
+        else:
+            item["_id"] = stored["uid"]
+        return item
+
+    def item_scraped(self, item, spider):
+        if isinstance(item, dict) and "_id" in item:
+            self.store_item(item, spider, self.run_id)
+
+    def spider_idle(self, spider):
+        """Outputs upcoming stored meetings that weren't scraped as cancelled"""
+        self.crawler.signals.disconnect(self.spider_idle, signal=signals.spider_idle)
+        scraper = self.crawler.engine.scraper
+        now_iso = datetime.now().isoformat()[:19]
+        for meeting_id, item in self.store.iter_upcoming(
+            spider.name, now_iso, self.run_id
+        ):
+            if meeting_id in spider._scraped_ids:
+                continue
+            spider._scraped_ids.add(meeting_id)
+            self.crawler.stats.inc_value("diff/disappeared", spider=spider)
+            scraper._process_spidermw_output(
+                {**item, "status": CANCELLED}, None, Response(""), spider
+            )
+        raise DontCloseSpider
+
+    def spider_closed(self, spider):
+        self.store.prune(spider.name, datetime.now().isoformat()[:19], self.run_id)
+        self.store.close()
+
+
+class DuplicateMeetingPipeline:
+    """
+    Drops meetings that the spider already scraped, by ID and content. Only the
+    8 byte key from get_meeting_key is kept for each meeting, and the keys are
+    cleared when the spider closes. Duplicates in the output of a single
+    callback have their links merged by DuplicateMeetingMiddleware before they
+    get here, but a duplicate from another callback is dropped with any links
+    the first meeting didn't have, since that one has already been exported.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.seen = set()
+
+    def close_spider(self, spider):
+        self.seen.clear()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    @ignore_processed
+    def process_item(self, item, spider):
+        key = get_meeting_key(item)
+        if key in self.seen:
+            self.stats.inc_value("duplicates/dropped", spider=spider)
+            raise DropItem(f"Duplicate meeting: {item['id']}")
+        self.seen.add(key)
+        return item
@@ -1,3 +1,5 @@
+import os
+
 from .base import *  # noqa
 
 USER_AGENT = (
@@ -11,8 +13,28 @@ ITEM_PIPELINES = {
 
 EXTENSIONS = {
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.CrawlStateExtension": 500,
+    "city_scrapers.extensions.CallbackTimingExtension": 510,
 }
 
 SPIDER_MIDDLEWARES = {
     "city_scrapers.middleware.CityScrapersWaybackMiddleware": 500,
+    "city_scrapers.middleware.CallbackTimingMiddleware": 950,
 }
+
+# Storage for the latest.json feed output read by the archivefeeds command
+AZURE_ACCOUNT_NAME = os.getenv("AZURE_ACCOUNT_NAME")
+AZURE_ACCOUNT_KEY = os.getenv("AZURE_ACCOUNT_KEY")
+AZURE_CONTAINER = os.getenv("AZURE_CONTAINER")
+
+# Skip URLs the Wayback Machine archived within this many days, and submit the
+# rest in batches once each spider is done crawling
+CITY_SCRAPERS_WAYBACK_ARCHIVED_DAYS = float(
+    os.getenv("CITY_SCRAPERS_WAYBACK_ARCHIVED_DAYS", 7)
+)
+CITY_SCRAPERS_WAYBACK_BATCH_SIZE = int(
+    os.getenv("CITY_SCRAPERS_WAYBACK_BATCH_SIZE", 10)
+)
+CITY_SCRAPERS_WAYBACK_BATCH_INTERVAL = float(
+    os.getenv("CITY_SCRAPERS_WAYBACK_BATCH_INTERVAL", 30)
+)
@@ -24,22 +24,127 @@ AUTOTHROTTLE_TARGET_CONCURRENCY = float(
 
 # Configure item pipelines
 ITEM_PIPELINES = {
+    "city_scrapers.pipelines.DuplicateMeetingPipeline": 100,
     "city_scrapers_core.pipelines.MeetingPipeline": 200,
 }
 
 # Enable or disable downloader middlewares
 # See http://scrapy.readthedocs.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
-    "scrapy.downloadermiddlewares.robotstxt.RobotsTxtMiddleware": 543,
+    "city_scrapers.middleware.ResponsePruningMiddleware": 540,
+    "scrapy.downloadermiddlewares.robotstxt.RobotsTxtMiddleware": None,
+    "city_scrapers.middleware.CachedRobotsTxtMiddleware": 543,
+    "city_scrapers.middleware.SharedResponseMiddleware": 545,
+    # Between MetaRefreshMiddleware (580) and HttpCompressionMiddleware (590),
+    # so bodies are stored decoded and a 304 is replaced by the stored response
+    # before MetaRefreshMiddleware sees it
+    "city_scrapers.middleware.ConditionalGetMiddleware": 583,
+    "city_scrapers.middleware.CircuitBreakerMiddleware": 585,
+    "city_scrapers.middleware.AdaptiveTimeoutMiddleware": 595,
+    # Closest to the downloader, after HttpCacheMiddleware (900), so requests
+    # are only delayed right before they're sent and never for cached
+    # responses, and 429/503 responses are seen before RetryMiddleware and
+    # RedirectMiddleware handle them
+    "city_scrapers.middleware.HostThrottleMiddleware": 950,
 }
 
-SPIDER_MIDDLEWARES = {}
+# Set each host's download timeout from the p99 of its response times on
+# earlier runs, with headroom, instead of DOWNLOAD_TIMEOUT for every host
+CITY_SCRAPERS_ADAPTIVE_TIMEOUT_ENABLED = (
+    os.getenv("CITY_SCRAPERS_ADAPTIVE_TIMEOUT_ENABLED", "false").lower() == "true"
+)
+
+# Share robots.txt between spiders and keep it for later runs, revalidating it
+# with a conditional GET once it's older than CITY_SCRAPERS_ROBOTSTXT_CACHE_TTL
+CITY_SCRAPERS_ROBOTSTXT_CACHE_ENABLED = (
+    os.getenv("CITY_SCRAPERS_ROBOTSTXT_CACHE_ENABLED", "false").lower() == "true"
+)
+
+# Fail requests to a host immediately for every spider in the process once it
+# has failed several times in a row, letting a probe request through after a
+# cool-down
+CITY_SCRAPERS_CIRCUIT_BREAKER_ENABLED = (
+    os.getenv("CITY_SCRAPERS_CIRCUIT_BREAKER_ENABLED", "false").lower() == "true"
+)
+
+# Share a token bucket per host between every spider in the process, backing
+# off on 429/503 responses and rising latency
+CITY_SCRAPERS_HOST_THROTTLE_ENABLED = (
+    os.getenv("CITY_SCRAPERS_HOST_THROTTLE_ENABLED", "false").lower() == "true"
+)
+CITY_SCRAPERS_HOST_THROTTLE_RATE = float(
+    os.getenv("CITY_SCRAPERS_HOST_THROTTLE_RATE", 4.0)
+)
 
-# Use commands from city_scrapers_core package
-COMMANDS_MODULE = "city_scrapers_core.commands"
+# Revalidate pages downloaded on earlier runs with ETag/Last-Modified headers
+# and reuse the stored copy when the server responds 304 Not Modified
+CITY_SCRAPERS_CONDITIONAL_GET_ENABLED = (
+    os.getenv("CITY_SCRAPERS_CONDITIONAL_GET_ENABLED", "false").lower() == "true"
+)
+
+# Also parse unpruned bodies for spiders with prune_response_tags, recording the
+# parse time in the stats for comparison with the pruned body
+CITY_SCRAPERS_PRUNE_MEASURE_UNPRUNED = (
+    os.getenv("CITY_SCRAPERS_PRUNE_MEASURE_UNPRUNED", "false").lower() == "true"
+)
+
+# Request Wichita city calendars in batches of cids shared between spiders
+# instead of one calendar listing per spider
+CITY_SCRAPERS_WICHITA_SHARED_CALENDAR = (
+    os.getenv("CITY_SCRAPERS_WICHITA_SHARED_CALENDAR", "false").lower() == "true"
+)
+
+# Build Wichita city meetings from each cid's iCalendar feed, only requesting
+# detail pages for meetings close to today
+CITY_SCRAPERS_WICHITA_ICAL = (
+    os.getenv("CITY_SCRAPERS_WICHITA_ICAL", "false").lower() == "true"
+)
+
+# Read Wichita Independent Neighborhoods events from the site's paginated events
+# API within the published date window instead of the full iCalendar export
+CITY_SCRAPERS_WIN_EVENTS_API = (
+    os.getenv("CITY_SCRAPERS_WIN_EVENTS_API", "false").lower() == "true"
+)
+
+SPIDER_MIDDLEWARES = {
+    "city_scrapers.middleware.DuplicateMeetingMiddleware": 900,
+    "city_scrapers.middleware.CallbackTimingMiddleware": 950,
+}
+
+# Record the wall time, CPU time, response bytes and output of each spider
+# callback in the stats, and write them to a JSON report when spiders close
+CITY_SCRAPERS_CALLBACK_TIMING_ENABLED = (
+    os.getenv("CITY_SCRAPERS_CALLBACK_TIMING_ENABLED", "false").lower() == "true"
+)
+
+# Project commands, which also re-export the city_scrapers_core commands
+COMMANDS_MODULE = "city_scrapers.commands"
+
+# Maximum number of spiders run at once by the crawlall command
+CITY_SCRAPERS_CRAWLALL_CONCURRENCY = int(
+    os.getenv("CITY_SCRAPERS_CRAWLALL_CONCURRENCY", 8)
+)
 
 EXTENSIONS = {
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.CrawlStateExtension": 500,
+    "city_scrapers.extensions.CallbackTimingExtension": 510,
+    "city_scrapers.extensions.ThrottleStateExtension": 520,
 }
 
+# Keep a local store of fetched detail pages, and skip detail pages of meetings
+# that started more than CITY_SCRAPERS_STATE_MUTABLE_DAYS ago
+CITY_SCRAPERS_STATE_ENABLED = (
+    os.getenv("CITY_SCRAPERS_STATE_ENABLED", "false").lower() == "true"
+)
+CITY_SCRAPERS_STATE_MUTABLE_DAYS = int(
+    os.getenv("CITY_SCRAPERS_STATE_MUTABLE_DAYS", 14)
+)
+
+# Start each host at the AutoThrottle delay learned on earlier runs instead of
+# AUTOTHROTTLE_START_DELAY
+CITY_SCRAPERS_THROTTLE_STATE_ENABLED = (
+    os.getenv("CITY_SCRAPERS_THROTTLE_STATE_ENABLED", "false").lower() == "true"
+)
+
 CLOSESPIDER_ERRORCOUNT = 5
@@ -4,8 +4,11 @@ from .base import *  # noqa
 
 USER_AGENT = "City Scrapers [production mode]. Learn more and say hello at https://citybureau.org/city-scrapers"  # noqa
 
+# Diff scraped meetings against a local store of previous output, which is only
+# filled from the previous feed in Azure for spiders that aren't in it yet
 ITEM_PIPELINES = {
-    "city_scrapers_core.pipelines.AzureDiffPipeline": 200,
+    "city_scrapers.pipelines.DuplicateMeetingPipeline": 100,
+    "city_scrapers.pipelines.MeetingStoreDiffPipeline": 200,
     "city_scrapers_core.pipelines.MeetingPipeline": 300,
     "city_scrapers_core.pipelines.OpenCivicDataPipeline": 400,
 }
@@ -16,8 +19,14 @@ EXTENSIONS = {
     "city_scrapers_core.extensions.AzureBlobStatusExtension": 100,
     "scrapy_sentry_errors.extensions.Errors": 10,
     "scrapy.extensions.closespider.CloseSpider": None,
+    "city_scrapers.extensions.CrawlStateExtension": 500,
+    "city_scrapers.extensions.CallbackTimingExtension": 510,
+    "city_scrapers.extensions.ThrottleStateExtension": 520,
 }
 
+# Callback timing only adds a few clock reads per callback output
+CITY_SCRAPERS_CALLBACK_TIMING_ENABLED = True
+
 FEED_EXPORTERS = {
     "json": "scrapy.exporters.JsonItemExporter",
     "jsonlines": "scrapy.exporters.JsonLinesItemExporter",
@@ -25,8 +34,18 @@ FEED_EXPORTERS = {
 
 FEED_FORMAT = "jsonlines"
 
+# Stage feed output on local disk during the run instead of uploading it as each
+# spider closes, and upload everything at once with the uploadfeeds command
+CITY_SCRAPERS_FEED_STAGING = (
+    os.getenv("CITY_SCRAPERS_FEED_STAGING", "false").lower() == "true"
+)
+
 FEED_STORAGES = {
-    "azure": "city_scrapers_core.extensions.AzureBlobFeedStorage",
+    "azure": (
+        "city_scrapers.extensions.StagedFeedStorage"
+        if CITY_SCRAPERS_FEED_STAGING
+        else "city_scrapers_core.extensions.AzureBlobFeedStorage"
+    ),
 }
 
 AZURE_ACCOUNT_NAME = os.getenv("AZURE_ACCOUNT_NAME")
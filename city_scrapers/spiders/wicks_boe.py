@@ -1,13 +1,15 @@
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-import requests
 from city_scrapers_core.constants import BOARD
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.parser import parser
+from dateutil.parser import parse
 from scrapy import Request
 
+from city_scrapers.dates import parse_date
+from city_scrapers.state import TokenCache
+
 
 class WicksBoeSpider(CityScrapersSpider):
     name = "wicks_boe"
@@ -25,14 +27,46 @@ class WicksBoeSpider(CityScrapersSpider):
         "address": "1437 N Rochester St, Wichita, KS 67203",
     }
 
+    token_url = "https://www.usd259.org/Generator/TokenGenerator.ashx/ProcessRequest"
+    # How long to reuse a token when the response doesn't include its expiry
+    token_ttl = timedelta(minutes=10)
+
+    token_cache = TokenCache()
+
     def start_requests(self):
+        """Request the events with a cached bearer token, or request a new
+        token first if there is no valid cached token."""
+        token = self.token_cache.get(self.token_url)
+        if token:
+            yield self._events_request(token)
+        else:
+            yield self._token_request()
 
-        # Make a GET request to retrieve the bearer token
-        r = requests.get(
-            url="https://www.usd259.org/Generator/TokenGenerator.ashx/ProcessRequest"
+    def _token_request(self, retried=False):
+        return Request(
+            self.token_url,
+            callback=self._parse_token,
+            cb_kwargs={"retried": retried},
+            dont_filter=True,
         )
-        token = r.json()["Token"]
 
+    def _parse_token(self, response, retried=False):
+        """Cache the bearer token until it expires and request the events."""
+        data = response.json()
+        token = data["Token"]
+        expiration = data.get("Expiration") or data.get("Expires")
+        try:
+            expires = parse(expiration)
+        except (TypeError, ValueError, OverflowError):
+            expires = datetime.now(timezone.utc) + self.token_ttl
+        else:
+            # Expirations without a UTC offset are taken to be in UTC
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=timezone.utc)
+        self.token_cache.set(self.token_url, token, expires)
+        yield self._events_request(token, retried=retried)
+
+    def _events_request(self, token, retried=False):
         # Calculate the date one month prior and format the date
         # Calculate the date six months ahead and format the date
         current_datetime = datetime.utcnow()
@@ -44,16 +78,31 @@ class WicksBoeSpider(CityScrapersSpider):
         # Construct the URL with query parameters
         # The url returns xml by default, therefore request the response to be in json format  # noqa
         url = f"https://awsapieast1-prod21.schoolwires.com/REST/api/v4/CalendarEvents/GetEvents/13328?StartDate={one_month_prior_formated}&EndDate={six_months_prior_formated}&ModuleInstanceFilter=&CategoryFilter=&IsDBStreamAndShowAll=true"  # noqa
-
         headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/json",
         }
-
         # Make the request to the url, and after the request is complete execute parse()
-        yield Request(url, headers=headers, callback=self.parse)
+        # A 401 is passed to parse() so the token can be refreshed
+        return Request(
+            url,
+            headers=headers,
+            callback=self.parse,
+            meta={"handle_httpstatus_list": [401], "token_retried": retried},
+            dont_filter=True,
+        )
 
     def parse(self, response):
+        if response.status == 401:
+            # The cached token expired or was revoked, so refresh it and
+            # retry once
+            self.token_cache.clear(self.token_url)
+            if response.meta.get("token_retried"):
+                self.logger.error("Events request unauthorized with a new token")
+                return
+            yield self._token_request(retried=True)
+            return
+
         # Only filter for 'BOE Meeting' items
         data = json.loads(response.text)
         for item in data:
@@ -62,8 +111,8 @@ class WicksBoeSpider(CityScrapersSpider):
                     title=item["Title"],
                     description="",
                     classification=BOARD,
-                    start=parser().parse(item["Start"]),
-                    end=parser().parse(item["End"]),
+                    start=parse_date(item["Start"]),
+                    end=parse_date(item["End"]),
                     all_day=item["AllDay"],
                     time_notes="",
                     location=self.location,
@@ -4,7 +4,8 @@ from unicodedata import normalize
 from city_scrapers_core.constants import BOARD
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from dateutil.parser import parse
+
+from city_scrapers.dates import parse_date
 
 
 class WicksWampoTPBSpider(CityScrapersSpider):
@@ -15,6 +16,7 @@ class WicksWampoTPBSpider(CityScrapersSpider):
     timezone = "America/Chicago"
     start_urls = ["https://www.wampo.org/transportation-policy-body"]
     meeting_time = time(15, 0)
+    prune_response_tags = ("script", "style")
     location = {
         "name": "Wichita Area Metropolitan Planning Organization",
         "address": "271 W 3rd St N, Wichita, KS 67202",
@@ -66,7 +68,7 @@ class WicksWampoTPBSpider(CityScrapersSpider):
         try:
             # parse date in format "01/01/2020"
             date_str_w_year = f"{date_str}/{parsed_year}"
-            parsed_date = parse(date_str_w_year, fuzzy=True)
+            parsed_date = parse_date(date_str_w_year, fuzzy=True)
             full_start = datetime.combine(parsed_date, self.meeting_time)
             return full_start
         except ValueError:
@@ -1,14 +1,36 @@
+import json
+from datetime import datetime, timedelta
+from html import unescape
+from urllib.parse import urlencode
+
+import scrapy
 from city_scrapers_core.constants import NOT_CLASSIFIED
 from city_scrapers_core.items import Meeting
 from city_scrapers_core.spiders import CityScrapersSpider
-from icalendar import Calendar
+from w3lib.html import remove_tags
+
+from city_scrapers.dates import parse_date
+from city_scrapers.ical import iter_vevents
 
 
 class WicksWinSpider(CityScrapersSpider):
+    """
+    Parses the site's iCalendar export by default. When the
+    CITY_SCRAPERS_WIN_EVENTS_API setting is enabled, meetings are read from
+    The Events Calendar REST API instead, requesting only events within the
+    date window and fetching every page after the first at once.
+    """
+
     name = "wicks_win"
     agency = "Wichita Independent Neighborhoods"
     timezone = "America/Chicago"
+    base_url = "https://winwichita.org"
     start_urls = ["https://winwichita.org/events/list/?ical=1"]
+    # Only events starting within this many days of today are parsed, and
+    # recurring events are expanded within the same window
+    past_days = 30
+    future_days = 365
+    events_api_per_page = 50
     custom_settings = {
         "DEFAULT_REQUEST_HEADERS": {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3",  # noqa
@@ -16,31 +38,93 @@ class WicksWinSpider(CityScrapersSpider):
         }
     }
 
+    def start_requests(self):
+        if self.settings.getbool("CITY_SCRAPERS_WIN_EVENTS_API"):
+            yield self._events_api_request(1)
+        else:
+            yield from super().start_requests()
+
     def parse(self, response):
         """
-        Parses the iCalendar feed and yields a Meeting object for each event.
+        Parses the iCalendar feed one event at a time and yields a Meeting
+        object for each event within the date window.
         """
-        cal = Calendar.from_ical(response.body)
-        for component in cal.walk():
-            if component.name == "VEVENT":
-                meeting = Meeting(
-                    title=component.get("summary"),
-                    description=component.get("description"),
-                    classification=NOT_CLASSIFIED,
-                    start=self._parse_start(component),
-                    end=self._parse_end(component),
-                    all_day=False,
-                    time_notes="",
-                    location=self._parse_location(component),
-                    links=[],
-                    source=(
-                        component.get("url") if component.get("url") else response.url
-                    ),
-                )
-                meeting["status"] = self._get_status(meeting)
-                meeting["id"] = self._get_id(meeting)
+        start_date, end_date = self._get_date_range()
+        for component in iter_vevents(response.body, start_date, end_date):
+            yield self._create_meeting(
+                title=component.get("summary"),
+                description=component.get("description"),
+                start=self._parse_start(component),
+                end=self._parse_end(component),
+                address=component.get("location"),
+                source=(component.get("url") if component.get("url") else response.url),
+            )
 
-                yield meeting
+    def _parse_events_api(self, response):
+        """
+        Parses one page of the events API. The first page also requests the
+        remaining pages, which are downloaded concurrently.
+        """
+        data = json.loads(response.text)
+        start_date, end_date = self._get_date_range()
+        for event in data.get("events", []):
+            start = parse_date(event["start_date"])
+            if not start_date <= start.date() < end_date:
+                continue
+            yield self._create_meeting(
+                title=unescape(event["title"]),
+                description=unescape(remove_tags(event["description"])).strip(),
+                start=start,
+                end=parse_date(event["end_date"]) if event.get("end_date") else None,
+                address=self._parse_api_address(event),
+                source=event.get("url") or response.url,
+            )
+        if response.meta["page"] == 1:
+            for page in range(2, data.get("total_pages", 1) + 1):
+                yield self._events_api_request(page)
+
+    def _get_date_range(self):
+        """Returns the first and last (exclusive) dates of events to parse"""
+        today = datetime.now().date()
+        # Spider arguments (e.g. -a past_days=60) are strings
+        return (
+            today - timedelta(days=int(self.past_days)),
+            today + timedelta(days=int(self.future_days)),
+        )
+
+    def _events_api_request(self, page):
+        start_date, end_date = self._get_date_range()
+        query = urlencode(
+            {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "per_page": self.events_api_per_page,
+                "page": page,
+            }
+        )
+        return scrapy.Request(
+            f"{self.base_url}/wp-json/tribe/events/v1/events?{query}",
+            self._parse_events_api,
+            headers={"Accept": "application/json"},
+            meta={"page": page},
+        )
+
+    def _create_meeting(self, title, description, start, end, address, source):
+        meeting = Meeting(
+            title=title,
+            description=description,
+            classification=NOT_CLASSIFIED,
+            start=start,
+            end=end,
+            all_day=False,
+            time_notes="",
+            location=self._parse_location(address),
+            links=[],
+            source=source,
+        )
+        meeting["status"] = self._get_status(meeting)
+        meeting["id"] = self._get_id(meeting)
+        return meeting
 
     def _parse_start(self, component):
         """Gets a start date from an iCalendar component and
@@ -54,9 +138,24 @@ class WicksWinSpider(CityScrapersSpider):
         end_date = component.get("dtend")
         return end_date.dt.replace(tzinfo=None) if end_date else None
 
-    def _parse_location(self, component):
+    def _parse_api_address(self, event):
+        """Joins the venue fields of an API event the same way the iCalendar
+        export formats its location."""
+        venue = event.get("venue")
+        if not venue:
+            return ""
+        parts = [
+            venue.get("venue"),
+            venue.get("address"),
+            venue.get("city"),
+            venue.get("stateprovince"),
+            venue.get("zip"),
+            venue.get("country"),
+        ]
+        return ", ".join(unescape(part) for part in parts if part)
+
+    def _parse_location(self, location):
         """Parse or generate location."""
-        location = component.get("location")
         if not location:
             return {
                 "name": "TBD",
@@ -0,0 +1,457 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from datetime import datetime, timezone
+
+from city_scrapers_core.items import Meeting
+from scrapy.utils.project import data_path
+
+
+def get_state_path(settings, setting_name, default_filename):
+    """
+    Returns the path of a local state file, either from the given setting or
+    inside the project's .scrapy/city_scrapers data directory.
+    """
+    path = settings.get(setting_name)
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return path
+    return os.path.join(data_path("city_scrapers", createdir=True), default_filename)
+
+
+def serialize_meeting(meeting):
+    """Serializes a Meeting to JSON, storing datetimes as ISO strings"""
+    return json.dumps(
+        dict(meeting),
+        default=lambda value: value.isoformat(),
+        sort_keys=True,
+    )
+
+
+def deserialize_meeting(data):
+    """Restores a Meeting serialized with serialize_meeting"""
+    values = json.loads(data)
+    for key in ["start", "end"]:
+        if values.get(key):
+            values[key] = datetime.fromisoformat(values[key])
+    return Meeting(**values)
+
+
+class SQLiteStore:
+    """
+    Base class of the local SQLite stores. Databases are opened in WAL mode
+    and each write is committed right away, since several spiders in one
+    process (or several processes) can share a file. Subclasses list the
+    statements creating their tables in `schema`.
+    """
+
+    schema = []
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        for statement in self.schema:
+            self.conn.execute(statement)
+        self.conn.commit()
+
+    def fetchone(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchone()
+
+    def write(self, sql, params=()):
+        """Runs a statement that changes the store and commits it"""
+        self.conn.execute(sql, params)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class CrawlStateStore(SQLiteStore):
+    """
+    SQLite store of the detail pages fetched for each spider, keyed by the
+    spider name and a meeting identifier from the source (e.g. an event ID).
+    Each row records when the page was last fetched, a hash of its content
+    and the Meeting that was parsed from it.
+    """
+
+    schema = ["""
+        CREATE TABLE IF NOT EXISTS meetings (
+            spider TEXT NOT NULL,
+            key TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            content_hash TEXT NOT NULL,
+            item TEXT NOT NULL,
+            PRIMARY KEY (spider, key)
+        )
+        """]
+
+    def get(self, spider_name, key):
+        """Returns the stored row for a meeting as a dict, or None"""
+        row = self.fetchone(
+            "SELECT fetched_at, content_hash, item FROM meetings "
+            "WHERE spider = ? AND key = ?",
+            (spider_name, str(key)),
+        )
+        if row is None:
+            return None
+        return {"fetched_at": row[0], "content_hash": row[1], "item": row[2]}
+
+    def set(self, spider_name, key, body, meeting):
+        """
+        Stores a fetched page's hash and parsed meeting. Returns True if the
+        content changed since the last time it was stored.
+        """
+        content_hash = hashlib.sha1(body).hexdigest()
+        previous = self.get(spider_name, key)
+        self.write(
+            "INSERT OR REPLACE INTO meetings "
+            "(spider, key, fetched_at, content_hash, item) VALUES (?, ?, ?, ?, ?)",
+            (
+                spider_name,
+                str(key),
+                time.time(),
+                content_hash,
+                serialize_meeting(meeting),
+            ),
+        )
+        return previous is None or previous["content_hash"] != content_hash
+
+
+class ValidatorStore(SQLiteStore):
+    """
+    SQLite store of HTTP validators (ETag and Last-Modified) for downloaded
+    URLs, along with the response headers and compressed body so a
+    304 Not Modified response can be answered from the stored copy.
+    """
+
+    schema = [
+        "CREATE TABLE IF NOT EXISTS validators ("
+        "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+        "status INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL, "
+        "stored_at REAL NOT NULL)"
+    ]
+
+    def get_validators(self, url):
+        """Returns the stored ETag and Last-Modified for a URL, or None"""
+        row = self.fetchone(
+            "SELECT etag, last_modified FROM validators WHERE url = ?", (url,)
+        )
+        if row is None:
+            return None
+        return {"etag": row[0], "last_modified": row[1]}
+
+    def get(self, url):
+        """Returns the stored validators, headers and body for a URL, or None"""
+        row = self.fetchone(
+            "SELECT etag, last_modified, status, headers, body FROM validators "
+            "WHERE url = ?",
+            (url,),
+        )
+        if row is None:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "status": row[2],
+            "headers": json.loads(row[3]),
+            "body": zlib.decompress(row[4]),
+        }
+
+    def set(self, url, etag, last_modified, status, headers, body):
+        self.write(
+            "INSERT OR REPLACE INTO validators "
+            "(url, etag, last_modified, status, headers, body, stored_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                etag,
+                last_modified,
+                status,
+                json.dumps(headers),
+                zlib.compress(body),
+                time.time(),
+            ),
+        )
+
+
+class ArchiveIndex(SQLiteStore):
+    """
+    SQLite index of URLs submitted to the Wayback Machine and when they were
+    last archived, so the same URLs aren't submitted again every night.
+    """
+
+    schema = [
+        "CREATE TABLE IF NOT EXISTS archived ("
+        "url TEXT PRIMARY KEY, archived_at REAL NOT NULL)"
+    ]
+
+    def archived_since(self, url, timestamp):
+        """Returns True if the URL was archived at or after a Unix timestamp"""
+        row = self.fetchone("SELECT archived_at FROM archived WHERE url = ?", (url,))
+        return row is not None and row[0] >= timestamp
+
+    def add(self, url):
+        self.write(
+            "INSERT OR REPLACE INTO archived (url, archived_at) VALUES (?, ?)",
+            (url, time.time()),
+        )
+
+
+class RobotsStore(SQLiteStore):
+    """
+    SQLite store of robots.txt bodies by netloc, with the time they were
+    fetched and their HTTP validators so stale copies can be revalidated.
+    """
+
+    schema = [
+        "CREATE TABLE IF NOT EXISTS robots ("
+        "netloc TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, "
+        "last_modified TEXT, fetched_at REAL NOT NULL)"
+    ]
+
+    def get(self, netloc):
+        """Returns the stored robots.txt for a netloc, or None"""
+        row = self.fetchone(
+            "SELECT body, etag, last_modified, fetched_at FROM robots "
+            "WHERE netloc = ?",
+            (netloc,),
+        )
+        if row is None:
+            return None
+        return {
+            "body": zlib.decompress(row[0]),
+            "etag": row[1],
+            "last_modified": row[2],
+            "fetched_at": row[3],
+        }
+
+    def set(self, netloc, body, etag, last_modified, fetched_at):
+        self.write(
+            "INSERT OR REPLACE INTO robots "
+            "(netloc, body, etag, last_modified, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (netloc, zlib.compress(body), etag, last_modified, fetched_at),
+        )
+
+
+class TokenCache:
+    """
+    Caches API tokens with their expiry time in memory, shared by spiders
+    running in the same process. Tokens are never written to the local state
+    directory, which is saved to the shared CI cache.
+    """
+
+    # Shared by every spider in the process, keyed by token key
+    tokens = {}
+
+    def get(self, key):
+        """Returns the cached token for a key if it hasn't expired"""
+        entry = self.tokens.get(key)
+        if entry and entry["expires"] > datetime.now(timezone.utc):
+            return entry["token"]
+        return None
+
+    def set(self, key, token, expires):
+        """Caches a token until a timezone-aware datetime"""
+        if expires.tzinfo is None:
+            raise ValueError("Token expiry must be timezone-aware")
+        self.tokens[key] = {"token": token, "expires": expires}
+
+    def clear(self, key):
+        self.tokens.pop(key, None)
+
+
+class SharedState:
+    """
+    In-memory state shared by the crawlers running in one process. The
+    crawlall command creates one for its CrawlerProcess and sets it on each
+    crawler it starts, so it's freed with the process rather than kept in
+    module globals. Entries are removed once they've been used.
+    """
+
+    def __init__(self):
+        # Deferreds of requests waiting on a response another crawler is
+        # downloading, keyed by URL
+        self.response_waiters = {}
+        # Event links parsed from shared calendar listings, keyed by listing
+        # URL and then by cid
+        self.calendar_links = {}
+
+
+def get_shared_state(crawler):
+    """
+    Returns the SharedState of a crawler's process. Crawlers that weren't
+    started by crawlall get one of their own.
+    """
+    if getattr(crawler, "shared_state", None) is None:
+        crawler.shared_state = SharedState()
+    return crawler.shared_state
+
+
+class MeetingStore(SQLiteStore):
+    """
+    SQLite store of the meetings in each spider's feed output, keyed by the
+    spider name and meeting ID. Each row keeps the Open Civic Data ID, start,
+    status and item last written to the feed, and the run it was last seen in.
+    """
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS feed_meetings (
+            spider TEXT NOT NULL,
+            id TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            start TEXT NOT NULL,
+            status TEXT NOT NULL,
+            item TEXT NOT NULL,
+            run_id TEXT NOT NULL,
+            PRIMARY KEY (spider, id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS feed_meetings_start "
+        "ON feed_meetings (spider, start)",
+    ]
+
+    def get(self, spider_name, meeting_id):
+        """Returns the stored uid, start, status and run_id of a meeting, or None"""
+        row = self.fetchone(
+            "SELECT uid, start, status, run_id FROM feed_meetings "
+            "WHERE spider = ? AND id = ?",
+            (spider_name, meeting_id),
+        )
+        if row is None:
+            return None
+        return dict(zip(["uid", "start", "status", "run_id"], row))
+
+    def count(self, spider_name):
+        return self.fetchone(
+            "SELECT COUNT(*) FROM feed_meetings WHERE spider = ?", (spider_name,)
+        )[0]
+
+    def set(self, spider_name, meeting_id, uid, start, status, item, run_id):
+        self.write(
+            "INSERT OR REPLACE INTO feed_meetings "
+            "(spider, id, uid, start, status, item, run_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (spider_name, meeting_id, uid, start, status, json.dumps(item), run_id),
+        )
+
+    def iter_upcoming(self, spider_name, start, exclude_run_id):
+        """
+        Yields the ID and stored item of meetings starting at or after an ISO
+        datetime string that weren't seen in the given run
+        """
+        rows = self.conn.execute(
+            "SELECT id, item FROM feed_meetings "
+            "WHERE spider = ? AND start >= ? AND run_id != ? ORDER BY start",
+            (spider_name, start, exclude_run_id),
+        ).fetchall()
+        for meeting_id, item in rows:
+            yield meeting_id, json.loads(item)
+
+    def prune(self, spider_name, start, exclude_run_id):
+        """
+        Removes meetings starting before an ISO datetime string that weren't
+        seen in the given run, since they'll never be in the feed again
+        """
+        self.write(
+            "DELETE FROM feed_meetings WHERE spider = ? AND start < ? AND run_id != ?",
+            (spider_name, start, exclude_run_id),
+        )
+
+
+class HostStatsCache:
+    """
+    Caches values learned for each host, like AutoThrottle download delays and
+    latency histograms, in memory for spiders running in the same process and
+    in a JSON file so the next run can start from them.
+    """
+
+    # Shared by every spider in the process, keyed by file path then host
+    memory = {}
+
+    def __init__(self, path):
+        self.path = path
+        if path not in self.memory:
+            self.memory[path] = self._read()
+        self.hosts = self.memory[path]
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, host, max_age):
+        """Returns the cached values for a host if updated within max_age seconds"""
+        entry = self.hosts.get(host)
+        if entry and entry["updated"] >= time.time() - max_age:
+            return entry
+        return None
+
+    def update(self, values):
+        """Caches values (e.g. delay and latency percentiles) by host"""
+        updated = time.time()
+        for host, host_values in values.items():
+            self.hosts[host] = {**host_values, "updated": updated}
+        with open(self.path, "w") as f:
+            json.dump(self.hosts, f, indent=2, sort_keys=True)
+
+
+class CircuitStore(SQLiteStore):
+    """
+    SQLite store of the hosts with an open circuit, so separate processes
+    crawling at the same time (or starting soon after) skip a host that's
+    down. It's read each time a process first sees a host, rather than cached.
+    """
+
+    schema = [
+        "CREATE TABLE IF NOT EXISTS circuits ("
+        "host TEXT PRIMARY KEY, retry_at REAL NOT NULL)"
+    ]
+
+    def __init__(self, path):
+        circuits = self._read_json(path)
+        super().__init__(path)
+        for host, retry_at in circuits.items():
+            self.set(host, retry_at)
+
+    @staticmethod
+    def _read_json(path):
+        """
+        Reads and removes a JSON file of circuits written by earlier versions
+        at the same path, so it can be replaced with the SQLite database
+        """
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return {}
+        if not content or content.startswith(b"SQLite format 3\x00"):
+            return {}
+        try:
+            circuits = json.loads(content)
+        except ValueError:
+            circuits = {}
+        os.remove(path)
+        return circuits if isinstance(circuits, dict) else {}
+
+    def get(self, host):
+        """Returns the Unix timestamp a host can be retried at, or None"""
+        row = self.fetchone("SELECT retry_at FROM circuits WHERE host = ?", (host,))
+        return None if row is None else row[0]
+
+    def set(self, host, retry_at):
+        """Records when a host can be retried, removing it if retry_at is None"""
+        if retry_at is None:
+            self.write("DELETE FROM circuits WHERE host = ?", (host,))
+        else:
+            self.write(
+                "INSERT OR REPLACE INTO circuits (host, retry_at) VALUES (?, ?)",
+                (host, retry_at),
+            )
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+BENCHMARK_BASELINE_PATH = os.path.join(
+    os.path.dirname(__file__), "benchmark_baseline.json"
+)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("parser benchmarks")
+    group.addoption(
+        "--parser-benchmark",
+        action="store_true",
+        help="run the parser benchmarks and compare them to the stored baseline",
+    )
+    group.addoption(
+        "--parser-benchmark-save",
+        action="store_true",
+        help="run the parser benchmarks and store the results as the new baseline",
+    )
+    group.addoption(
+        "--parser-benchmark-tolerance",
+        type=float,
+        default=0.4,
+        help="fraction a benchmark can fall behind the baseline (default: 0.4)",
+    )
+    group.addoption(
+        "--parser-benchmark-output",
+        default=os.path.join(".scrapy", "benchmark.json"),
+        help="path the benchmark results are written to",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: parser benchmark, only run with --parser-benchmark"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("parser_benchmark") or config.getoption(
+        "parser_benchmark_save"
+    ):
+        return
+    skip = pytest.mark.skip(reason="parser benchmarks run with --parser-benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def benchmark_baseline(request):
+    """Stored results keyed by benchmark ID, or None when saving a new baseline"""
+    if request.config.getoption("parser_benchmark_save"):
+        return None
+    try:
+        with open(BENCHMARK_BASELINE_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    """Collects results by benchmark ID and writes them out after the session"""
+    results = {}
+    yield results
+    if not results:
+        return
+    output_path = request.config.getoption("parser_benchmark_output")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    paths = [output_path]
+    if request.config.getoption("parser_benchmark_save"):
+        paths.append(BENCHMARK_BASELINE_PATH)
+    for path in paths:
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+from city_scrapers.commands.archivefeeds import get_feed_urls, iter_feed_lines
+from tests.test_wayback import ROOT_DIR, StubHandler
+
+OCD_ITEM = {
+    "_type": "event",
+    "name": "Board Meeting",
+    "links": [{"note": "Agenda", "url": "https://example.com/agenda.pdf"}],
+    "sources": [{"url": "https://example.com/calendar", "note": ""}],
+}
+MEETING_ITEM = {
+    "title": "Committee Meeting",
+    "source": "https://example.com/calendar",
+    "links": [
+        {"title": "Minutes", "href": "https://example.com/minutes.pdf"},
+        {"title": "Agenda", "href": "https://example.com/agenda.pdf"},
+    ],
+}
+
+
+def write_feed(path, items):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(json.dumps(item) for item in items) + "\n")
+
+
+def test_get_feed_urls():
+    lines = [json.dumps(OCD_ITEM), "", json.dumps(MEETING_ITEM)]
+    assert get_feed_urls(lines) == [
+        "https://example.com/calendar",
+        "https://example.com/agenda.pdf",
+        "https://example.com/minutes.pdf",
+    ]
+
+
+def test_iter_feed_lines_uses_latest_feed_per_spider(tmp_path):
+    write_feed(tmp_path / "2024/03/01/0601/wicks_boe.json", [MEETING_ITEM])
+    write_feed(tmp_path / "2024/03/02/0601/wicks_boe.json", [OCD_ITEM])
+    write_feed(tmp_path / "2024/03/01/0601/wicks_win.json", [OCD_ITEM])
+    (tmp_path / "2024/03/02/0601/notes.txt").write_text("ignored")
+    lines = list(iter_feed_lines(str(tmp_path)))
+    assert [json.loads(line) for line in lines] == [OCD_ITEM, OCD_ITEM]
+
+
+def test_archives_feed_without_crawling(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    feed_path = tmp_path / "latest.json"
+    write_feed(
+        feed_path,
+        [
+            {**MEETING_ITEM, "source": f"{base_url}/calendar"},
+            {**OCD_ITEM, "sources": [{"url": f"{base_url}/calendar"}]},
+        ],
+    )
+    StubHandler.requested = []
+    StubHandler.saved = []
+    try:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "scrapy",
+                "archivefeeds",
+                "--path",
+                str(feed_path),
+                "-s",
+                f"CITY_SCRAPERS_WAYBACK_ENDPOINT={base_url}/save/",
+                "-s",
+                f"CITY_SCRAPERS_WAYBACK_INDEX_PATH={tmp_path / 'archived.db'}",
+                "-s",
+                "CITY_SCRAPERS_WAYBACK_BATCH_INTERVAL=0",
+            ],
+            cwd=ROOT_DIR,
+            env={**os.environ, "PYTHONPATH": ROOT_DIR},
+            check=True,
+            capture_output=True,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    # Only the Wayback endpoint was requested, never the calendar page itself
+    assert all(path.startswith("/save/") for path in StubHandler.requested)
+    assert sorted(StubHandler.saved) == [
+        f"{base_url}/calendar",
+        "https://example.com/agenda.pdf",
+        "https://example.com/minutes.pdf",
+    ]
@@ -0,0 +1,292 @@
+"""
+Parser throughput benchmarks, replaying the recorded fixtures in tests/files
+through the spider callbacks that parse them. Skipped unless pytest is run
+with --parser-benchmark, which compares each result to the stored baseline in
+tests/benchmark_baseline.json, or --parser-benchmark-save, which replaces it:
+
+    pytest tests/test_benchmarks.py --parser-benchmark
+
+A change that's meant to make a parser faster or slower should refresh the
+baseline with --parser-benchmark-save in the same commit, so the next
+regression is measured against it.
+
+Throughput is measured in CPU time (time.process_time) since freezegun, which
+pins the date each fixture was recorded on, also freezes the wall clocks. Peak
+memory is measured with tracemalloc, so it covers Python allocations only.
+"""
+
+import time
+import tracemalloc
+from datetime import datetime
+from os.path import dirname, join
+
+import pytest
+from dateutil.parser import parse
+from freezegun import freeze_time
+from scrapy import Request
+from scrapy.http import HtmlResponse, Response, TextResponse
+
+from city_scrapers.dates import parse_date
+from city_scrapers.spiders.wicks_boe import WicksBoeSpider
+from city_scrapers.spiders.wicks_city import WicksCityAPCSpider
+from city_scrapers.spiders.wicks_goddard_boe import WicksGoddardBoeSpider
+from city_scrapers.spiders.wicks_sedgwick_jcab import WicksSedgwickJcabSpider
+from city_scrapers.spiders.wicks_wampo_tabs import WampoECSpider, WicksWampoICTSSpider
+from city_scrapers.spiders.wicks_wampo_tac import WicksWampoTacSpider
+from city_scrapers.spiders.wicks_wampo_tpb import WicksWampoTPBSpider
+from city_scrapers.spiders.wicks_win import WicksWinSpider
+
+pytestmark = pytest.mark.benchmark
+
+# Minimum CPU seconds for each timed repeat, and the number of repeats. The
+# fastest repeat is reported.
+MIN_REPEAT_SECONDS = 0.1
+REPEATS = 7
+
+# Fixtures without a benchmark: wampo_ec.html is an older copy of
+# wicks_wampo_ec.html, and wicks_boe.html is the calendar page the events API
+# is found from rather than a page any callback parses.
+BENCHMARKS = [
+    # (spider class, callback, fixture, response class, URL, meta, frozen time)
+    (
+        WampoECSpider,
+        "parse",
+        "wicks_wampo_ec.html",
+        HtmlResponse,
+        "https://www.wampo.org/executive-committee",
+        {},
+        datetime(2024, 3, 15, 13, 37),
+    ),
+    (
+        WicksWampoICTSSpider,
+        "parse",
+        "wicks_wampo_icts.html",
+        HtmlResponse,
+        "https://www.wampo.org/ict-safe",
+        {},
+        datetime(2024, 3, 15, 14, 55),
+    ),
+    (
+        WicksWampoTacSpider,
+        "parse",
+        "wicks_wampo_tac.html",
+        HtmlResponse,
+        "https://www.wampo.org/technical-advisory-committee",
+        {},
+        datetime(2024, 3, 19, 11, 52),
+    ),
+    (
+        WicksWampoTPBSpider,
+        "parse",
+        "wicks_wampo_tpb.html",
+        HtmlResponse,
+        "https://www.wampo.org/transportation-policy-body",
+        {},
+        datetime(2024, 3, 19, 11, 39),
+    ),
+    (
+        WicksGoddardBoeSpider,
+        "parse",
+        "wicks_goddard_boe.json",
+        TextResponse,
+        "https://go.boarddocs.com/ks/usd265/Board.nsf/Public",
+        {},
+        datetime(2024, 2, 22),
+    ),
+    (
+        WicksGoddardBoeSpider,
+        "_parse_detail",
+        "wicks_goddard_boe_detail.html",
+        HtmlResponse,
+        "https://go.boarddocs.com/ks/usd265/Board.nsf/Public",
+        {"start_date": datetime(2024, 2, 19), "meeting_id": "CT23380490B4"},
+        datetime(2024, 2, 22),
+    ),
+    (
+        WicksCityAPCSpider,
+        "parse",
+        "wicks_city_apc.html",
+        HtmlResponse,
+        "https://www.wichita.gov/calendar.aspx?Keywords=&startDate=01/01/2024&enddate=04/30/2024&CID=68&showPastEvents=true",  # noqa
+        {},
+        datetime(2024, 2, 13),
+    ),
+    (
+        WicksCityAPCSpider,
+        "_parse_detail",
+        "wicks_city_apc_detail.html",
+        HtmlResponse,
+        "https://www.wichita.gov/Calendar.aspx?EID=1592&month=2&year=2024&day=13&calType=0",  # noqa
+        {"event_id": "1592"},
+        datetime(2024, 2, 13),
+    ),
+    (
+        WicksCityAPCSpider,
+        "_parse_ical",
+        "wicks_city_apc.ics",
+        Response,
+        "https://www.wichita.gov/common/modules/iCalendar/iCalendar.aspx?feed=calendar&catID=68",  # noqa
+        {},
+        datetime(2024, 2, 13),
+    ),
+    (
+        WicksWinSpider,
+        "parse",
+        "wicks_win.ics",
+        TextResponse,
+        "https://winwichita.org/events/list/?ical=1",
+        {},
+        datetime(2024, 3, 9, 8, 22),
+    ),
+    (
+        WicksBoeSpider,
+        "parse",
+        "wicks_boe.json",
+        TextResponse,
+        "https://awsapieast1-prod21.schoolwires.com/REST/api/v4/CalendarEvents/GetEvents/13328?StartDate=2024-01-22&EndDate=2024-08-19&ModuleInstanceFilter=&CategoryFilter=&IsDBStreamAndShowAll=true",  # noqa
+        {},
+        datetime(2024, 2, 20),
+    ),
+    (
+        WicksSedgwickJcabSpider,
+        "parse",
+        "wicks_sedgwick_jcab.html",
+        HtmlResponse,
+        "https://www.sedgwickcounty.org/corrections/corrections-advisory-boards/",
+        {},
+        datetime(2024, 4, 3),
+    ),
+]
+
+# Date strings in the formats the spiders parse, repeated the way recurring
+# meetings repeat dates and times within a run
+DATE_STRINGS = [
+    "01/09/2024",
+    "11/12/2024",
+    "November 12, 2024",
+    "June\xa013,\xa02024 10:00 AM",
+    "June\xa013,\xa02024 11:30 AM",
+    "2024-01-22T18:00:00",
+    "2024-01-22T23:59:59",
+    "2024-03-19 11:52:00",
+] * 25
+
+
+def run_callback(callback, body, response_cls, url, meta):
+    """Parses a fresh response, so no cached selector is reused, and returns
+    the number of items and requests yielded"""
+    kwargs = {"encoding": "utf-8"} if issubclass(response_cls, TextResponse) else {}
+    response = response_cls(
+        url=url, body=body, request=Request(url, meta=dict(meta)), **kwargs
+    )
+    return sum(1 for _ in callback(response))
+
+
+def measure_date_parsing(func):
+    """Returns the fastest CPU seconds to parse every string in DATE_STRINGS"""
+    timings = []
+    for _ in range(REPEATS):
+        started = time.process_time()
+        for text in DATE_STRINGS:
+            func(text)
+        timings.append(time.process_time() - started)
+    return min(timings)
+
+
+def test_date_parsing_benchmark(benchmark_results):
+    dateutil_seconds = measure_date_parsing(parse)
+    seconds = measure_date_parsing(parse_date)
+    result = {
+        "strings": len(DATE_STRINGS),
+        "seconds": round(seconds, 6),
+        "dateutil_seconds": round(dateutil_seconds, 6),
+        "speedup": round(dateutil_seconds / seconds, 1),
+    }
+    benchmark_results["dates.parse_date"] = result
+    print(f"dates.parse_date: {result['speedup']}x faster than dateutil")
+    assert seconds < dateutil_seconds
+
+
+def measure(callback, body, response_cls, url, meta):
+    """Returns the fastest CPU seconds per parse and the item count"""
+    number = 1
+    while True:
+        started = time.process_time()
+        for _ in range(number):
+            items = run_callback(callback, body, response_cls, url, meta)
+        elapsed = time.process_time() - started
+        if elapsed >= MIN_REPEAT_SECONDS:
+            break
+        number *= 2
+    timings = [elapsed / number]
+    for _ in range(REPEATS - 1):
+        started = time.process_time()
+        for _ in range(number):
+            run_callback(callback, body, response_cls, url, meta)
+        timings.append((time.process_time() - started) / number)
+    return min(timings), items
+
+
+def measure_peak_memory(callback, body, response_cls, url, meta):
+    tracemalloc.start()
+    try:
+        run_callback(callback, body, response_cls, url, meta)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize(
+    "spider_cls,callback_name,fixture,response_cls,url,meta,frozen",
+    BENCHMARKS,
+    ids=[f"{case[0].name}.{case[1]}" for case in BENCHMARKS],
+)
+def test_parser_benchmark(
+    request,
+    benchmark_results,
+    benchmark_baseline,
+    spider_cls,
+    callback_name,
+    fixture,
+    response_cls,
+    url,
+    meta,
+    frozen,
+):
+    with open(join(dirname(__file__), "files", fixture), "rb") as f:
+        body = f.read()
+    callback = getattr(spider_cls(), callback_name)
+    with freeze_time(frozen):
+        seconds, items = measure(callback, body, response_cls, url, meta)
+        peak_memory = measure_peak_memory(callback, body, response_cls, url, meta)
+
+    benchmark_id = f"{spider_cls.name}.{callback_name}"
+    result = {
+        "fixture": fixture,
+        "bytes": len(body),
+        "items": items,
+        "seconds": round(seconds, 6),
+        "items_per_sec": round(items / seconds, 1),
+        "mb_per_sec": round(len(body) / seconds / 1e6, 2),
+        "peak_memory_bytes": peak_memory,
+    }
+    benchmark_results[benchmark_id] = result
+    print(
+        f"{benchmark_id}: {result['items_per_sec']} items/s, "
+        f"{result['mb_per_sec']} MB/s, {peak_memory / 1e6:.1f} MB peak"
+    )
+
+    if not benchmark_baseline or benchmark_id not in benchmark_baseline:
+        return
+    baseline = benchmark_baseline[benchmark_id]
+    tolerance = request.config.getoption("parser_benchmark_tolerance")
+    assert result["mb_per_sec"] >= baseline["mb_per_sec"] * (1 - tolerance), (
+        f"{benchmark_id} throughput regressed from {baseline['mb_per_sec']} "
+        f"to {result['mb_per_sec']} MB/s"
+    )
+    assert result["peak_memory_bytes"] <= baseline["peak_memory_bytes"] * (
+        1 + tolerance
+    ), (
+        f"{benchmark_id} peak memory grew from {baseline['peak_memory_bytes']} "
+        f"to {peak_memory} bytes"
+    )
@@ -1,7 +1,10 @@
+import json
 from datetime import datetime, timedelta
+from os.path import dirname, join
 from unittest.mock import MagicMock
 
 import pytest
+from freezegun import freeze_time
 
 from city_scrapers.mixins.boarddocs import BoardDocsMixin
 
@@ -102,3 +105,52 @@ class TestBoardDocsMixin:
         assert (
             result[0]["unique"] == "future_meeting"
         ), "The unique identifier of the future meeting does not match."
+
+    def test_iter_recent_meetings_matches_clean_meetings(self, mixin):
+        # The streaming parser should keep the same meetings as decoding the
+        # full list and filtering it
+        with open(
+            join(dirname(__file__), "files", "wicks_goddard_boe.json"), "rb"
+        ) as f:
+            body = f.read()
+        with freeze_time("2024-02-20"):
+            streamed = list(mixin._iter_recent_meetings(body))
+            cleaned = mixin._get_clean_meetings(json.loads(body))
+        assert len(streamed) > 0
+        assert streamed == cleaned
+
+    def test_iter_recent_meetings_skips_empty_and_old(self, mixin):
+        recent = datetime.now().strftime("%Y%m%d")
+        body = json.dumps(
+            [
+                {},
+                {"numberdate": "20230101", "unique": "1"},
+                {"numberdate": recent, "unique": "2"},
+            ]
+        ).encode()
+        result = list(mixin._iter_recent_meetings(body))
+        assert [item["unique"] for item in result] == ["2"]
+        assert result[0]["start_date"] == datetime.now().date()
+
+    def test_iter_recent_meetings_braces_in_strings(self, mixin):
+        recent = datetime.now().strftime("%Y%m%d")
+        body = json.dumps(
+            [
+                {
+                    "unique": "A",
+                    "name": 'Budget {draft} "numberdate":"20991231"}',
+                    "numberdate": recent,
+                },
+                {"unique": "B", "name": "Old }{", "numberdate": "20230101"},
+                {
+                    "unique": "C",
+                    "name": "Ends in a backslash \\",
+                    "note": '{"numberdate":"20991231"}',
+                    "numberdate": "20230101",
+                },
+                {"unique": "D", "name": '"}', "numberdate": recent},
+            ]
+        ).encode()
+        result = list(mixin._iter_recent_meetings(body))
+        assert [item["unique"] for item in result] == ["A", "D"]
+        assert result[0]["name"] == 'Budget {draft} "numberdate":"20991231"}'
@@ -0,0 +1,87 @@
+import gzip
+import io
+import json
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+from city_scrapers.commands.combinefeeds import write_combined_feeds, write_sorted_feed
+from tests.test_wayback import ROOT_DIR
+
+
+def meeting(title, start):
+    return {"title": title, "start": start}
+
+
+def write_feed(path, items):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(json.dumps(item) for item in items) + "\n")
+
+
+def test_merges_sorted_feeds(tmp_path):
+    future = (datetime.now() + timedelta(days=7)).isoformat()[:19]
+    paths = []
+    for name, meetings in [
+        ("a", [meeting("A2", "2020-02-01T00:00:00"), meeting("A1", future)]),
+        ("b", [meeting("B1", "2020-01-01T00:00:00")]),
+        ("c", []),
+    ]:
+        path = str(tmp_path / f"{name}.jsonl")
+        write_sorted_feed([json.dumps(item) for item in meetings], "start", path)
+        paths.append(path)
+    latest, upcoming = io.StringIO(), io.StringIO()
+    counts = write_combined_feeds(paths, "start", latest, upcoming)
+    assert counts == {"latest": 3, "upcoming": 1}
+    assert [json.loads(line)["title"] for line in latest.getvalue().split("\n")] == [
+        "B1",
+        "A2",
+        "A1",
+    ]
+    assert json.loads(upcoming.getvalue())["title"] == "A1"
+
+
+def test_combines_local_feeds_and_reuses_unchanged(tmp_path):
+    feed_dir = tmp_path / "feeds"
+    write_feed(
+        feed_dir / "2024/03/01/0601/wicks_boe.json",
+        [meeting("Old", "2024-01-01T00:00:00")],
+    )
+    write_feed(
+        feed_dir / "2024/03/02/0601/wicks_boe.json",
+        [meeting("Board", "2024-03-05T00:00:00")],
+    )
+    with gzip.open(feed_dir / "2024/03/02/0601/wicks_win.json.gz", "wt") as f:
+        f.write(json.dumps(meeting("WIN", "2024-03-04T00:00:00")) + "\n")
+    command = [
+        sys.executable,
+        "-m",
+        "scrapy",
+        "combinefeeds",
+        "--path",
+        str(feed_dir),
+        "-s",
+        f"CITY_SCRAPERS_COMBINE_CACHE_DIR={tmp_path / 'combine'}",
+    ]
+    result = subprocess.run(
+        command, cwd=ROOT_DIR, check=True, capture_output=True, text=True
+    )
+    assert "2 of 2 spider feeds changed" in result.stdout
+    latest = (feed_dir / "latest.json").read_text().split("\n")
+    assert [json.loads(line)["title"] for line in latest] == ["WIN", "Board"]
+    assert (feed_dir / "upcoming.json").read_text() == ""
+
+    result = subprocess.run(
+        command, cwd=ROOT_DIR, check=True, capture_output=True, text=True
+    )
+    assert "0 of 2 spider feeds changed" in result.stdout
+    assert (feed_dir / "latest.json").read_text().split("\n") == latest
+
+    # The same output under a newer dated prefix isn't a change either
+    write_feed(
+        feed_dir / "2024/03/03/0601/wicks_boe.json",
+        [meeting("Board", "2024-03-05T00:00:00")],
+    )
+    result = subprocess.run(
+        command, cwd=ROOT_DIR, check=True, capture_output=True, text=True
+    )
+    assert "0 of 2 spider feeds changed" in result.stdout
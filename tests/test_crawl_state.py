@@ -0,0 +1,130 @@
+import json
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from city_scrapers_core.constants import BOARD, CANCELLED, PASSED, TENTATIVE
+from city_scrapers_core.items import Meeting
+from scrapy import Request
+from scrapy.http import TextResponse
+from scrapy.settings import Settings
+
+from city_scrapers.mixins.boarddocs import BoardDocsMixin
+from city_scrapers.state import CrawlStateStore, deserialize_meeting, serialize_meeting
+
+
+def make_meeting(start):
+    return Meeting(
+        title="Regular Board Meeting",
+        description="",
+        classification=BOARD,
+        start=start,
+        end=None,
+        all_day=False,
+        time_notes="",
+        location={"name": "TBD", "address": ""},
+        links=[],
+        source="https://go.boarddocs.com/ks/test_slug/Board.nsf/Public",
+        status=PASSED,
+        id="test_spider/x",
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CrawlStateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def spider(store):
+    class TestSpider(BoardDocsMixin):
+        name = "test_spider"
+        boarddocs_slug = "test_slug"
+        boarddocs_committee_id = "test_committee_id"
+        timezone = "America/Chicago"
+
+    spider = TestSpider()
+    spider.settings = Settings({"CITY_SCRAPERS_STATE_MUTABLE_DAYS": 14})
+    spider.crawler = MagicMock()
+    spider.crawl_state = store
+    return spider
+
+
+def meetings_list_response(*numberdates):
+    data = [{"numberdate": d, "unique": f"meeting_{d}"} for d in numberdates]
+    return TextResponse(
+        "https://go.boarddocs.com/ks/test_slug/Board.nsf/BD-GetMeetingsList",
+        body=json.dumps(data).encode(),
+        encoding="utf-8",
+    )
+
+
+def test_serialize_meeting_roundtrip():
+    meeting = make_meeting(datetime(2024, 1, 8, 18, 30))
+    restored = deserialize_meeting(serialize_meeting(meeting))
+    assert dict(restored) == dict(meeting)
+
+
+def test_store_tracks_content_changes(store):
+    meeting = make_meeting(datetime(2024, 1, 8, 18, 30))
+    assert store.set("test_spider", "1", b"<html>a</html>", meeting) is True
+    assert store.set("test_spider", "1", b"<html>a</html>", meeting) is False
+    assert store.set("test_spider", "1", b"<html>b</html>", meeting) is True
+    assert store.get("other_spider", "1") is None
+    row = store.get("test_spider", "1")
+    assert deserialize_meeting(row["item"])["start"] == meeting["start"]
+
+
+def test_cached_meeting_outside_mutable_window(spider, store):
+    old_date = date.today() - timedelta(days=30)
+    meeting = make_meeting(datetime.combine(old_date, datetime.min.time()))
+    store.set("test_spider", f"meeting_{old_date:%Y%m%d}", b"", meeting)
+
+    results = list(spider.parse(meetings_list_response(f"{old_date:%Y%m%d}")))
+    assert len(results) == 1
+    assert isinstance(results[0], Meeting)
+    assert results[0]["start"] == meeting["start"]
+
+
+def test_cached_meeting_status_is_updated(spider, store):
+    old_date = date.today() - timedelta(days=30)
+    meeting = make_meeting(datetime.combine(old_date, datetime.min.time()))
+    meeting["status"] = TENTATIVE
+    store.set("test_spider", f"meeting_{old_date:%Y%m%d}", b"", meeting)
+    cancelled_date = old_date - timedelta(days=7)
+    cancelled = make_meeting(datetime.combine(cancelled_date, datetime.min.time()))
+    cancelled["status"] = CANCELLED
+    store.set("test_spider", f"meeting_{cancelled_date:%Y%m%d}", b"", cancelled)
+
+    results = list(
+        spider.parse(
+            meetings_list_response(f"{old_date:%Y%m%d}", f"{cancelled_date:%Y%m%d}")
+        )
+    )
+    assert [result["status"] for result in results] == [PASSED, CANCELLED]
+    assert results[0]["id"] == spider._get_id(results[0])
+
+
+def test_recent_meeting_is_requested(spider, store):
+    recent_date = date.today() - timedelta(days=3)
+    meeting = make_meeting(datetime.combine(recent_date, datetime.min.time()))
+    store.set("test_spider", f"meeting_{recent_date:%Y%m%d}", b"", meeting)
+
+    results = list(spider.parse(meetings_list_response(f"{recent_date:%Y%m%d}")))
+    assert len(results) == 1
+    assert isinstance(results[0], Request)
+
+
+def test_uncached_meeting_is_requested(spider):
+    old_date = date.today() - timedelta(days=30)
+    results = list(spider.parse(meetings_list_response(f"{old_date:%Y%m%d}")))
+    assert isinstance(results[0], Request)
+
+
+def test_no_store_requests_everything(spider):
+    spider.crawl_state = None
+    old_date = date.today() - timedelta(days=30)
+    results = list(spider.parse(meetings_list_response(f"{old_date:%Y%m%d}")))
+    assert isinstance(results[0], Request)
@@ -0,0 +1,78 @@
+import logging
+from unittest.mock import MagicMock
+
+from twisted.python.failure import Failure
+
+from city_scrapers.commands.crawlall import Command, SpiderErrorCounter
+
+
+def make_command():
+    command = Command()
+    command.pending = []
+    command.results = {
+        "test_spider": {
+            "errors": 0,
+            "items": 0,
+            "elapsed": 0.0,
+            "finish_reason": None,
+            "failed": False,
+        }
+    }
+    return command
+
+
+def make_crawler(stats):
+    crawler = MagicMock()
+    crawler.stats.get_stats.return_value = stats
+    return crawler
+
+
+def test_error_counter_only_counts_own_spider():
+    crawler = MagicMock()
+    counter = SpiderErrorCounter(crawler)
+    logger = logging.getLogger("test_crawlall")
+    logger.addHandler(counter)
+    logger.error("own error", extra={"spider": crawler.spider})
+    logger.error("other error", extra={"spider": object()})
+    logger.warning("own warning", extra={"spider": crawler.spider})
+    logger.removeHandler(counter)
+    assert counter.count == 1
+
+
+def test_crawl_done_success():
+    command = make_command()
+    crawler = make_crawler({"finish_reason": "finished", "item_scraped_count": 4})
+    command._crawl_done("test_spider", crawler, SpiderErrorCounter(crawler), 0, None)
+    result = command.results["test_spider"]
+    assert result["items"] == 4
+    assert result["failed"] is False
+
+
+def test_crawl_done_with_errors():
+    command = make_command()
+    crawler = make_crawler({"finish_reason": "finished"})
+    counter = SpiderErrorCounter(crawler)
+    counter.count = 2
+    command._crawl_done("test_spider", crawler, counter, 0, None)
+    assert command.results["test_spider"]["errors"] == 2
+    assert command.results["test_spider"]["failed"] is True
+
+
+def test_crawl_done_with_failure():
+    command = make_command()
+    crawler = make_crawler({})
+    failure = Failure(ValueError("broken spider"))
+    command._crawl_done("test_spider", crawler, SpiderErrorCounter(crawler), 0, failure)
+    result = command.results["test_spider"]
+    assert result["failed"] is True
+    assert result["finish_reason"] == "broken spider"
+
+
+def test_print_summary(capsys):
+    command = make_command()
+    command.results["test_spider"].update(failed=True, finish_reason="shutdown")
+    command.print_summary(1.5)
+    output = capsys.readouterr().out
+    assert "test_spider" in output
+    assert "FAILED (shutdown)" in output
+    assert "1 spiders, 1 failed, 0 items in 1.5s" in output
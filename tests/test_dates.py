@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+from dateutil.parser import parse
+from freezegun import freeze_time
+
+from city_scrapers.dates import parse_date
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "11/1/2024",
+        "01/09/2024",
+        "13/01/2024",
+        "November 12, 2024",
+        "Nov 12, 2024",
+        "June\xa013,\xa02024 10:00 AM",
+        "June 13, 2024 12:30 pm",
+        "June 13, 2024 12:05 AM",
+        "2024-01-22T18:00:00",
+        "2024-02-13",
+        "2024-03-19 11:52:00",
+        "2024-03-19T11:52:00-05:00",
+        " Monday, March 4, 2024 ",
+    ],
+)
+def test_matches_dateutil(text):
+    assert parse_date(text) == parse(text)
+
+
+@freeze_time("2024-03-15")
+def test_falls_back_to_dateutil():
+    assert parse_date("01//2024", fuzzy=True) == parse("01//2024", fuzzy=True)
+    assert parse_date("Board meeting 3/4/2024", fuzzy=True) == datetime(2024, 3, 4)
+    with pytest.raises(ValueError):
+        parse_date("02/30/2024")
+    with pytest.raises(ValueError):
+        parse_date("Smarch 1, 2024")
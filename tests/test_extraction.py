@@ -0,0 +1,65 @@
+import pytest
+from scrapy.http import HtmlResponse
+
+from city_scrapers.extraction import Field, FieldExtractor
+
+BODY = b"""
+<html><body>
+<h1>Outside root</h1>
+<div id="content">
+  <h1> Meeting title </h1>
+  <p class="note">First</p>
+  <p class="note">Second</p>
+  <ul>
+    <li><a href="/agenda.pdf">Agenda</a></li>
+    <li><a href="/minutes.pdf">Minutes</a></li>
+  </ul>
+</div>
+</body></html>
+"""
+
+
+@pytest.fixture
+def response():
+    return HtmlResponse(url="https://example.com", body=BODY)
+
+
+def test_extracts_fields_from_root(response):
+    extractor = FieldExtractor(
+        root_css="#content",
+        fields={
+            "title": Field(css="h1::text"),
+            "notes": Field(xpath=".//p[@class='note']/text()", many=True),
+            "missing": Field(css="h2::text", default=None),
+            "links": Field(
+                css="li a",
+                fields={
+                    "href": Field(css="::attr(href)"),
+                    "title": Field(css="::text"),
+                },
+            ),
+        },
+    )
+    assert extractor.extract(response) == {
+        "title": "Meeting title",
+        "notes": ["First", "Second"],
+        "missing": None,
+        "links": [
+            {"href": "/agenda.pdf", "title": "Agenda"},
+            {"href": "/minutes.pdf", "title": "Minutes"},
+        ],
+    }
+
+
+def test_falls_back_to_document_without_root(response):
+    extractor = FieldExtractor(
+        root_css="#other", fields={"title": Field(css="h1::text")}
+    )
+    assert extractor.extract(response) == {"title": "Outside root"}
+
+
+def test_field_requires_one_expression():
+    with pytest.raises(ValueError):
+        Field()
+    with pytest.raises(ValueError):
+        Field(css="h1", xpath="//h1")
@@ -0,0 +1,56 @@
+import gzip
+import json
+from argparse import Namespace
+
+from scrapy import Spider
+from scrapy.exporters import JsonLinesItemExporter
+from scrapy.extensions.postprocessing import PostProcessingManager
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.commands.archivefeeds import iter_feed_lines
+from city_scrapers.commands.uploadfeeds import Command
+from city_scrapers.extensions import StagedFeedStorage
+
+FEED_URI = "azure://account:a/b+c==@container/2024/03/01/0601/wicks_boe.json.gz"
+ITEMS = [{"title": "Board Meeting"}, {"title": "Committee Meeting"}]
+
+
+def stage_feed(staging_dir):
+    crawler = get_crawler(Spider, {"CITY_SCRAPERS_FEED_STAGING_DIR": str(staging_dir)})
+    storage = StagedFeedStorage.from_crawler(crawler, FEED_URI)
+    # Compressed the way FEEDS postprocessing with Scrapy's GzipPlugin does
+    file = PostProcessingManager(
+        ["scrapy.extensions.postprocessing.GzipPlugin"],
+        storage.open(Spider("wicks_boe")),
+        {},
+    )
+    exporter = JsonLinesItemExporter(file)
+    exporter.start_exporting()
+    for item in ITEMS:
+        exporter.export_item(item)
+    exporter.finish_exporting()
+    file.close()
+    storage.store(file.file)
+    return storage.path
+
+
+def test_stages_compressed_feed(tmp_path):
+    path = stage_feed(tmp_path)
+    assert path == str(tmp_path / "2024/03/01/0601/wicks_boe.json.gz")
+    with gzip.open(path, "rt") as f:
+        assert [json.loads(line) for line in f] == ITEMS
+
+
+def test_upload_staged_feeds_to_directory(tmp_path):
+    staging_dir = tmp_path / "staging"
+    target_dir = tmp_path / "target"
+    stage_feed(staging_dir)
+
+    command = Command()
+    command.settings = Settings({"CITY_SCRAPERS_FEED_STAGING_DIR": str(staging_dir)})
+    command.run([], Namespace(target=str(target_dir)))
+
+    uploaded = target_dir / "2024/03/01/0601/wicks_boe.json.gz"
+    assert [json.loads(line) for line in iter_feed_lines(str(uploaded))] == ITEMS
+    assert not list(staging_dir.rglob("*.gz"))
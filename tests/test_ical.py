@@ -0,0 +1,128 @@
+from datetime import date, datetime
+
+from city_scrapers.ical import (
+    get_naive_start,
+    is_outside_window,
+    iter_event_lines,
+    iter_vevents,
+)
+
+CALENDAR = b"""BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VTIMEZONE\r
+TZID:America/Chicago\r
+BEGIN:DAYLIGHT\r
+DTSTART:20240310T020000\r
+RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=2SU\r
+END:DAYLIGHT\r
+END:VTIMEZONE\r
+BEGIN:VEVENT\r
+UID:old\r
+DTSTART;TZID=America/Chicago:20200108T180000\r
+SUMMARY:Old Meeting\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:board\r
+DTSTART;TZID=America/Chicago:20240301T180000\r
+DTEND;TZID=America/Chicago:20240301T193000\r
+RRULE:FREQ=WEEKLY;BYDAY=FR\r
+EXDATE;TZID=America/Chicago:20240315T180000\r
+SUMMARY:Board Meeting\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:board\r
+RECURRENCE-ID;TZID=America/Chicago:20240322T180000\r
+DTSTART;TZID=America/Chicago:20240322T170000\r
+DTEND;TZID=America/Chicago:20240322T183000\r
+SUMMARY:Board Meeting (Moved)\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:annual\r
+DTSTART;VALUE=DATE:20240320\r
+SUMMARY:Annual Meeting with a long title that has been folded onto a second \r
+ line\r
+BEGIN:VALARM\r
+ACTION:DISPLAY\r
+END:VALARM\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+def summarize(events):
+    return [(str(event["summary"]), get_naive_start(event)) for event in events]
+
+
+def test_yields_events_within_window():
+    events = summarize(iter_vevents(CALENDAR, date(2024, 3, 5), date(2024, 3, 30)))
+    assert events == [
+        ("Board Meeting (Moved)", datetime(2024, 3, 22, 17)),
+        (
+            "Annual Meeting with a long title that has been folded onto a second "
+            "line",
+            datetime(2024, 3, 20),
+        ),
+        # Expanded on local time across the daylight saving time change, with the
+        # excluded and moved occurrences left out
+        ("Board Meeting", datetime(2024, 3, 8, 18)),
+        ("Board Meeting", datetime(2024, 3, 29, 18)),
+    ]
+
+
+def test_occurrences_keep_duration():
+    events = list(iter_vevents(CALENDAR, date(2024, 3, 1), date(2024, 3, 2)))
+    assert len(events) == 1
+    assert events[0]["dtend"].dt.replace(tzinfo=None) == datetime(2024, 3, 1, 19, 30)
+    assert "rrule" not in events[0]
+
+
+def test_yields_every_event_without_window():
+    events = summarize(iter_vevents(CALENDAR))
+    assert [summary for summary, _ in events] == [
+        "Old Meeting",
+        "Board Meeting",
+        "Board Meeting (Moved)",
+        "Annual Meeting with a long title that has been folded onto a second line",
+    ]
+
+
+def test_prefilters_raw_start():
+    window = (date(2024, 3, 5), date(2024, 3, 30))
+    outside = [
+        is_outside_window(lines, *window) for lines in iter_event_lines(CALENDAR)
+    ]
+    # The recurring event and its override are always parsed, even though
+    # the rule starts before the window
+    assert outside == [True, False, False, False]
+    assert is_outside_window(
+        [b"BEGIN:VEVENT", b"DTSTART;TZID=America/Chicago:20240302T180000"], *window
+    )
+
+
+UNTIL_CALENDAR = b"""BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+UID:committee\r
+DTSTART;TZID=America/Chicago:20240402T180000\r
+RRULE:FREQ=WEEKLY;UNTIL=20240423T230000Z\r
+SUMMARY:Committee Meeting\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:committee\r
+RECURRENCE-ID;TZID=America/Chicago:20240409T180000\r
+DTSTART;TZID=America/Chicago:20240601T180000\r
+SUMMARY:Committee Meeting (Moved)\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+def test_expands_rule_with_utc_until():
+    events = summarize(iter_vevents(UNTIL_CALENDAR, date(2024, 4, 1), date(2024, 5, 1)))
+    # UNTIL is 6pm Chicago time on the 23rd, so that occurrence is included,
+    # and the occurrence moved out of the window is left out
+    assert events == [
+        ("Committee Meeting", datetime(2024, 4, 2, 18)),
+        ("Committee Meeting", datetime(2024, 4, 16, 18)),
+        ("Committee Meeting", datetime(2024, 4, 23, 18)),
+    ]
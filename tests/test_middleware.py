@@ -0,0 +1,503 @@
+import json
+from os.path import dirname, join
+from unittest.mock import MagicMock
+
+import pytest
+from city_scrapers_core.utils import file_response
+from freezegun import freeze_time
+from scrapy import Spider, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import HtmlResponse, Request, Response
+from scrapy.utils.test import get_crawler
+from twisted.internet import error
+
+from city_scrapers.extensions import CallbackTimingExtension
+from city_scrapers.middleware import (
+    AdaptiveTimeoutMiddleware,
+    CallbackTimingMiddleware,
+    CircuitBreakerMiddleware,
+    CircuitOpenError,
+    ConditionalGetMiddleware,
+    DuplicateMeetingMiddleware,
+    HostBucket,
+    HostCircuit,
+    HostThrottleMiddleware,
+    LatencyHistogram,
+    ResponsePruningMiddleware,
+    SharedResponseMiddleware,
+    strip_tags,
+)
+from city_scrapers.spiders.wicks_wampo_tac import WicksWampoTacSpider
+from city_scrapers.state import CircuitStore, HostStatsCache, SharedState
+
+URL = "https://www.wichita.gov/calendar.aspx?CID=67,68"
+
+
+class TestSharedResponseMiddleware:
+    @pytest.fixture
+    def middleware(self):
+        return SharedResponseMiddleware(SharedState())
+
+    def shared_request(self):
+        return Request(URL, meta={"shared_response": True})
+
+    def test_ignores_unflagged_requests(self, middleware):
+        assert middleware.process_request(Request(URL), MagicMock()) is None
+        assert middleware.waiters == {}
+
+    def test_waiters_receive_owner_response(self, middleware):
+        spider = MagicMock()
+        owner = self.shared_request()
+        assert middleware.process_request(owner, spider) is None
+        waiter = middleware.process_request(self.shared_request(), spider)
+        results = []
+        waiter.addCallback(results.append)
+
+        response = HtmlResponse(URL, body=b"<html></html>", request=owner)
+        assert middleware.process_response(owner, response, spider) is response
+        assert results[0].body == response.body
+        # Nothing is kept once every waiting request is served
+        assert middleware.waiters == {}
+
+        later = self.shared_request()
+        assert middleware.process_request(later, spider) is None
+        assert later.meta["shared_response_owner"]
+
+    def test_waiters_download_on_owner_failure(self, middleware):
+        spider = MagicMock()
+        owner = self.shared_request()
+        middleware.process_request(owner, spider)
+        waiter = middleware.process_request(self.shared_request(), spider)
+        results = []
+        waiter.addCallback(results.append)
+
+        middleware.process_exception(owner, TimeoutError(), spider)
+        assert results == [None]
+        assert URL not in middleware.waiters
+
+    def test_crawlers_share_process_state(self):
+        shared_state = SharedState()
+        crawlers = [get_crawler(Spider), get_crawler(Spider)]
+        for crawler in crawlers:
+            crawler.shared_state = shared_state
+        first, second = [
+            SharedResponseMiddleware.from_crawler(crawler) for crawler in crawlers
+        ]
+        assert first.waiters is second.waiters
+        # Crawlers started on their own don't share anything
+        assert SharedResponseMiddleware.from_crawler(get_crawler(Spider)).waiters == {}
+
+
+class TestConditionalGetMiddleware:
+    url = "https://www.wampo.org/executive-committee"
+
+    @pytest.fixture
+    def crawler(self, tmp_path):
+        return get_crawler(
+            settings_dict={
+                "CITY_SCRAPERS_CONDITIONAL_GET_ENABLED": True,
+                "CITY_SCRAPERS_CONDITIONAL_GET_PATH": str(tmp_path / "validators.db"),
+            }
+        )
+
+    @pytest.fixture
+    def middleware(self, crawler):
+        middleware = ConditionalGetMiddleware.from_crawler(crawler)
+        yield middleware
+        middleware.store.close()
+
+    def test_not_modified_returns_stored_response(self, crawler, middleware):
+        spider = MagicMock()
+        request = Request(self.url)
+        assert middleware.process_request(request, spider) is None
+        assert b"If-None-Match" not in request.headers
+
+        body = b"<html><body>Meetings</body></html>"
+        response = HtmlResponse(
+            self.url,
+            body=body,
+            headers={"ETag": '"abc"', "Content-Type": "text/html"},
+            request=request,
+        )
+        assert middleware.process_response(request, response, spider) is response
+
+        next_request = Request(self.url)
+        middleware.process_request(next_request, spider)
+        assert next_request.headers["If-None-Match"] == b'"abc"'
+
+        not_modified = Response(self.url, status=304, request=next_request)
+        result = middleware.process_response(next_request, not_modified, spider)
+        assert isinstance(result, HtmlResponse)
+        assert result.status == 200
+        assert result.body == body
+        assert "not_modified" in result.flags
+        assert crawler.stats.get_value("conditional_get/body_bytes_reused") == len(body)
+
+    def test_ignores_post_and_responses_without_validators(self, middleware):
+        spider = MagicMock()
+        post = Request(self.url, method="POST")
+        response = HtmlResponse(self.url, body=b"", headers={"ETag": '"abc"'})
+        middleware.process_response(post, response, spider)
+        request = Request(self.url)
+        middleware.process_response(request, HtmlResponse(self.url, body=b""), spider)
+        assert middleware.store.get(self.url) is None
+
+
+def test_strip_tags():
+    body = (
+        b"<html><head><STYLE>p {}</style><scripts>kept</scripts></head>"
+        b'<body><script type="text/javascript">var a = "<p>";</script>'
+        b"<p>Text</p><script>\n</SCRIPT></body></html>"
+    )
+    assert strip_tags(body, ("script", "style")) == (
+        b"<html><head><scripts>kept</scripts></head><body><p>Text</p></body></html>"
+    )
+
+
+class TestResponsePruningMiddleware:
+    @pytest.fixture
+    def response(self):
+        return file_response(
+            join(dirname(__file__), "files", "wicks_wampo_tac.html"),
+            url="https://www.wampo.org/technical-advisory-committee",
+        )
+
+    def test_ignores_spiders_without_tags(self, response):
+        crawler = get_crawler()
+        middleware = ResponsePruningMiddleware.from_crawler(crawler)
+        spider = MagicMock(prune_response_tags=None)
+        assert middleware.process_response(None, response, spider) is response
+
+    def test_pruned_response_parses_the_same(self, response):
+        crawler = get_crawler(
+            WicksWampoTacSpider,
+            {"CITY_SCRAPERS_PRUNE_MEASURE_UNPRUNED": True},
+        )
+        crawler.stats.open_spider(None)
+        spider = WicksWampoTacSpider.from_crawler(crawler)
+        middleware = ResponsePruningMiddleware.from_crawler(crawler)
+
+        pruned = middleware.process_response(None, response, spider)
+        assert len(pruned.body) < len(response.body) / 2
+        assert b"<script" not in pruned.body
+        with freeze_time("2024-03-19 11:52:00"):
+            assert list(spider.parse(pruned)) == list(spider.parse(response))
+
+        stats = crawler.stats.get_stats()
+        assert stats["response_pruning/responses"] == 1
+        assert stats["response_pruning/bytes_before"] == len(response.body)
+        assert stats["response_pruning/bytes_after"] == len(pruned.body)
+        for key in ["prune_seconds", "parse_seconds", "unpruned_parse_seconds"]:
+            assert stats[f"response_pruning/{key}"] > 0
+
+
+class TestCallbackTiming:
+    @pytest.fixture
+    def crawler(self, tmp_path):
+        crawler = get_crawler(
+            Spider,
+            {
+                "CITY_SCRAPERS_CALLBACK_TIMING_ENABLED": True,
+                "CITY_SCRAPERS_CALLBACK_TIMING_DIR": str(tmp_path),
+            },
+        )
+        crawler.stats.open_spider(None)
+        return crawler
+
+    def test_disabled_by_default(self):
+        with pytest.raises(NotConfigured):
+            CallbackTimingMiddleware.from_crawler(get_crawler())
+        with pytest.raises(NotConfigured):
+            CallbackTimingExtension.from_crawler(get_crawler())
+
+    def test_records_callback_stats_and_report(self, crawler, tmp_path):
+        spider = Spider("timed")
+        middleware = CallbackTimingMiddleware.from_crawler(crawler)
+
+        def parse_detail(response):
+            yield {"title": "Meeting"}
+            yield Request("https://example.com/next")
+            yield {"title": "Other meeting"}
+
+        request = Request("https://example.com", callback=parse_detail)
+        response = HtmlResponse(request.url, body=b"<html></html>", request=request)
+        output = list(
+            middleware.process_spider_output(response, parse_detail(response), spider)
+        )
+        assert len(output) == 3
+
+        stats = crawler.stats.get_stats()
+        assert stats["callback_timing/parse_detail/responses"] == 1
+        assert stats["callback_timing/parse_detail/response_bytes"] == 13
+        assert stats["callback_timing/parse_detail/items"] == 2
+        assert stats["callback_timing/parse_detail/requests"] == 1
+        assert stats["callback_timing/parse_detail/wall_seconds"] >= 0
+
+        extension = CallbackTimingExtension.from_crawler(crawler)
+        extension.spider_closed(spider, "finished")
+        with open(tmp_path / "timed.json") as f:
+            report = json.load(f)
+        assert report["spider"] == "timed"
+        assert report["callbacks"]["parse_detail"]["items"] == 2
+
+
+def test_merges_duplicate_meetings_in_callback_output():
+    crawler = get_crawler(WicksWampoTacSpider)
+    spider = WicksWampoTacSpider.from_crawler(crawler)
+    crawler.stats.open_spider(spider)
+    middleware = DuplicateMeetingMiddleware.from_crawler(crawler)
+    response = file_response(
+        join(dirname(__file__), "files", "wicks_wampo_tac.html"), url=URL
+    )
+    meetings = list(spider.parse(response))
+    duplicate = meetings[0].copy()
+    duplicate["links"] = [{"href": "https://example.com/minutes.pdf", "title": "M"}]
+    request = Request("https://example.com/next")
+
+    output = list(
+        middleware.process_spider_output(
+            response, [meetings[0], request, duplicate, *meetings[1:]], spider
+        )
+    )
+    assert output[0] is request
+    assert output[1:] == meetings
+    assert output[1]["links"][-1]["href"] == "https://example.com/minutes.pdf"
+    assert crawler.stats.get_value("duplicates/merged") == 1
+
+
+class TestHostThrottle:
+    @pytest.fixture
+    def clock(self):
+        clock = MagicMock(return_value=100.0)
+        yield clock
+
+    def test_bucket_spaces_requests_after_burst(self, clock):
+        bucket = HostBucket(2.0, 2.0, 0.2, 3.0, clock=clock)
+        assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+        clock.return_value = 102.0
+        assert bucket.reserve() == 0.0
+
+    def test_bucket_backs_off_and_recovers(self, clock):
+        bucket = HostBucket(2.0, 1.0, 0.2, 3.0, clock=clock)
+        assert bucket.record(429, 0.1, retry_after=10)
+        assert bucket.rate == 1.0
+        assert bucket.reserve() == 10.0
+        assert not bucket.record(200, 0.1)
+        assert bucket.rate == 1.2
+        # Much slower than the average so far
+        assert bucket.record(200, 1.0)
+        assert bucket.rate == pytest.approx(0.9)
+
+    @pytest.fixture
+    def crawlers(self):
+        HostThrottleMiddleware.buckets = {}
+        settings = {
+            "CITY_SCRAPERS_HOST_THROTTLE_ENABLED": True,
+            "CITY_SCRAPERS_HOST_THROTTLE_RATE": 1.0,
+            "CITY_SCRAPERS_HOST_THROTTLE_BURST": 1.0,
+            "CITY_SCRAPERS_HOST_THROTTLE_GROUPS": {"wichita.gov": "www.wichita.gov"},
+        }
+        crawlers = [get_crawler(Spider, settings) for _ in range(2)]
+        for crawler in crawlers:
+            crawler.stats.open_spider(None)
+        yield crawlers
+        HostThrottleMiddleware.buckets = {}
+
+    def test_not_configured_by_default(self):
+        with pytest.raises(NotConfigured):
+            HostThrottleMiddleware.from_crawler(get_crawler())
+
+    def test_shares_bucket_between_crawlers(self, crawlers):
+        first, second = [
+            HostThrottleMiddleware.from_crawler(crawler) for crawler in crawlers
+        ]
+        assert first.process_request(Request(URL), None) is None
+        delayed = second.process_request(Request("https://wichita.gov/"), None)
+        delayed.cancel()
+        delayed.addErrback(lambda failure: None)
+        assert crawlers[1].stats.get_value("host_throttle/delayed") == 1
+        other_host = Request("https://go.boarddocs.com/ks/usd259/Board.nsf")
+        assert second.process_request(other_host, None) is None
+
+    def test_backs_off_on_rate_limit(self, crawlers):
+        middleware = HostThrottleMiddleware.from_crawler(crawlers[0])
+        request = Request(URL)
+        response = Response(URL, status=503, headers={"Retry-After": "30"})
+        assert middleware.process_response(request, response, None) is response
+        assert middleware.get_bucket(request).rate == 0.5
+        assert crawlers[0].stats.get_value("host_throttle/backoffs") == 1
+
+
+class TestCircuitBreaker:
+    @pytest.fixture
+    def clock(self):
+        clock = MagicMock(return_value=100.0)
+        yield clock
+
+    def test_circuit_opens_and_probes(self, clock):
+        circuit = HostCircuit(2, 60.0, clock=clock)
+        assert not circuit.record_failure()
+        assert circuit.allow() == "closed"
+        assert circuit.record_failure()
+        assert circuit.allow() is None
+        clock.return_value = 160.0
+        assert circuit.allow() == "probe"
+        # Only one probe per cooldown
+        assert circuit.allow() is None
+        # A late failure from an earlier request doesn't restart the cooldown
+        assert not circuit.record_failure()
+        assert circuit.retry_at == 220.0
+        assert not circuit.record_failure(probe=True)
+        clock.return_value = 161.0
+        assert circuit.retry_at == 220.0
+        clock.return_value = 220.0
+        assert circuit.allow() == "probe"
+        assert circuit.record_success()
+        assert circuit.allow() == "closed"
+        assert circuit.failures == 0
+
+    @pytest.fixture
+    def crawlers(self, tmp_path):
+        CircuitBreakerMiddleware.circuits = {}
+        settings = {
+            "CITY_SCRAPERS_CIRCUIT_BREAKER_ENABLED": True,
+            "CITY_SCRAPERS_CIRCUIT_BREAKER_THRESHOLD": 2,
+            "CITY_SCRAPERS_CIRCUIT_BREAKER_PATH": str(tmp_path / "circuits.db"),
+        }
+        crawlers = [get_crawler(Spider, settings) for _ in range(2)]
+        for crawler in crawlers:
+            crawler.stats.open_spider(None)
+        yield crawlers
+        CircuitBreakerMiddleware.circuits = {}
+
+    def test_not_configured_by_default(self):
+        with pytest.raises(NotConfigured):
+            CircuitBreakerMiddleware.from_crawler(get_crawler())
+
+    def test_fails_fast_for_every_crawler(self, crawlers, tmp_path):
+        first, second = [
+            CircuitBreakerMiddleware.from_crawler(crawler) for crawler in crawlers
+        ]
+        spider = Spider("wicks_city_apc")
+        request = Request(URL)
+        assert first.process_request(request, spider) is None
+        first.process_exception(request, TimeoutError(), spider)
+        response = Response(URL, status=503)
+        assert first.process_response(request, response, spider) is response
+        assert crawlers[0].stats.get_value("circuit_breaker/opened") == 1
+
+        with pytest.raises(CircuitOpenError):
+            second.process_request(Request(URL), spider)
+        assert crawlers[1].stats.get_value("circuit_breaker/rejected") == 1
+        other_host = Request("https://go.boarddocs.com/ks/usd259/Board.nsf")
+        assert second.process_request(other_host, spider) is None
+        # Requests refused by other middlewares aren't failures
+        second.process_exception(other_host, IgnoreRequest(), spider)
+        second.process_exception(other_host, IgnoreRequest(), spider)
+        assert second.process_request(other_host, spider) is None
+
+        # A new process sees the open circuit in the store
+        assert CircuitStore(str(tmp_path / "circuits.db")).get("www.wichita.gov")
+        CircuitBreakerMiddleware.circuits = {}
+        with pytest.raises(CircuitOpenError):
+            first.process_request(Request(URL), spider)
+
+    def test_probe_closes_circuit(self, crawlers, tmp_path):
+        middleware = CircuitBreakerMiddleware.from_crawler(crawlers[0])
+        spider = Spider("wicks_city_apc")
+        for _ in range(2):
+            middleware.process_exception(Request(URL), TimeoutError(), spider)
+        middleware.circuits["www.wichita.gov"].retry_at = 0.0
+        probe = Request(URL)
+        assert middleware.process_request(probe, spider) is None
+        assert probe.meta["circuit_probe"]
+        middleware.process_response(probe, Response(URL), spider)
+        assert middleware.process_request(Request(URL), spider) is None
+        assert crawlers[0].stats.get_value("circuit_breaker/closed") == 1
+        assert (
+            CircuitStore(str(tmp_path / "circuits.db")).get("www.wichita.gov") is None
+        )
+
+    def test_store_migrates_json(self, tmp_path):
+        path = tmp_path / "circuits.json"
+        path.write_text(json.dumps({"www.wichita.gov": 1700000000.0}))
+        store = CircuitStore(str(path))
+        assert store.get("www.wichita.gov") == 1700000000.0
+        assert path.read_bytes().startswith(b"SQLite format 3")
+        store.close()
+        assert CircuitStore(str(path)).get("www.wichita.gov") == 1700000000.0
+
+
+class TestAdaptiveTimeout:
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram()
+        for latency in [0.1] * 98 + [1.5, 3.0]:
+            histogram.add(latency)
+        assert histogram.percentile(50) == 0.25
+        assert histogram.percentile(99) == 2.0
+        histogram.add(500.0)
+        assert histogram.percentile(100) is None
+        histogram.merge(LatencyHistogram([0] * 11 + [99]), 100)
+        assert histogram.total == pytest.approx(100)
+        assert histogram.percentile(60) is None
+
+    @pytest.fixture
+    def crawler(self, tmp_path):
+        HostStatsCache.memory = {}
+        crawler = get_crawler(
+            Spider,
+            {
+                "CITY_SCRAPERS_ADAPTIVE_TIMEOUT_ENABLED": True,
+                "CITY_SCRAPERS_ADAPTIVE_TIMEOUT_PATH": str(tmp_path / "latency.json"),
+                "CITY_SCRAPERS_ADAPTIVE_TIMEOUT_MIN_SAMPLES": 5,
+            },
+        )
+        crawler.stats.open_spider(None)
+        yield crawler
+        HostStatsCache.memory = {}
+
+    def test_not_configured_by_default(self):
+        with pytest.raises(NotConfigured):
+            AdaptiveTimeoutMiddleware.from_crawler(get_crawler())
+
+    def test_sets_timeouts_from_earlier_runs(self, crawler, tmp_path):
+        spider = Spider("wicks_city_apc")
+        middleware = AdaptiveTimeoutMiddleware.from_crawler(crawler)
+        request = Request(URL)
+        middleware.process_request(request, spider)
+        assert "download_timeout" not in request.meta
+        for latency in [1.5] * 4 + [3.0]:
+            response = Response(URL, request=request)
+            request.meta["download_latency"] = latency
+            middleware.process_response(request, response, spider)
+        crawler.signals.send_catch_log(signals.spider_closed, spider=spider)
+        with open(tmp_path / "latency.json") as f:
+            assert json.load(f)["www.wichita.gov"]["latency_p99"] == 4.0
+
+        middleware = AdaptiveTimeoutMiddleware.from_crawler(crawler)
+        request = Request(URL)
+        middleware.process_request(request, spider)
+        assert request.meta["download_timeout"] == 12.0
+        # Explicit timeouts are kept
+        request = Request(URL, meta={"download_timeout": 60})
+        middleware.process_request(request, spider)
+        assert request.meta["download_timeout"] == 60
+        spider.download_timeout = 30
+        request = Request(URL)
+        middleware.process_request(request, spider)
+        assert "download_timeout" not in request.meta
+
+    def test_timeouts_raise_the_timeout(self, crawler, tmp_path):
+        spider = Spider("wicks_city_apc")
+        middleware = AdaptiveTimeoutMiddleware.from_crawler(crawler)
+        for _ in range(5):
+            request = Request(URL, meta={"download_timeout": 180.0})
+            middleware.process_exception(request, TimeoutError(), spider)
+        assert crawler.stats.get_value("adaptive_timeout/timeouts") is None
+        for _ in range(5):
+            request = Request(URL, meta={"download_timeout": 180.0})
+            middleware.process_exception(request, error.TimeoutError(), spider)
+        middleware.spider_closed(spider)
+        assert crawler.stats.get_value("adaptive_timeout/timeouts") == 5
+        middleware = AdaptiveTimeoutMiddleware.from_crawler(crawler)
+        assert middleware.get_timeout("www.wichita.gov") == 180.0
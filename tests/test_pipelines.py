@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from city_scrapers_core.constants import CANCELLED, TENTATIVE
+from city_scrapers_core.items import Meeting
+from city_scrapers_core.pipelines import OpenCivicDataPipeline
+from scrapy.exceptions import DontCloseSpider, DropItem
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.pipelines import DuplicateMeetingPipeline, MeetingStoreDiffPipeline
+from city_scrapers.spiders.wicks_wampo_tac import WicksWampoTacSpider
+
+NEXT_WEEK = datetime.now().replace(microsecond=0) + timedelta(days=7)
+LAST_WEEK = datetime.now().replace(microsecond=0) - timedelta(days=7)
+
+
+def meeting(meeting_id, start, status=TENTATIVE):
+    return Meeting(
+        id=meeting_id,
+        title="Meeting",
+        description="",
+        classification="Board",
+        status=status,
+        start=start,
+        end=start + timedelta(hours=1),
+        all_day=False,
+        time_notes="",
+        location={"name": "", "address": ""},
+        links=[],
+        source="https://example.com",
+    )
+
+
+def run_crawl(tmp_path, meetings):
+    """Runs meetings through the pipeline as a crawl would, returning the output"""
+    crawler = get_crawler(
+        WicksWampoTacSpider,
+        {
+            "ITEM_PIPELINES": {
+                "city_scrapers.pipelines.MeetingStoreDiffPipeline": 200,
+                "city_scrapers_core.pipelines.OpenCivicDataPipeline": 400,
+            },
+            "CITY_SCRAPERS_DIFF_STORE_PATH": str(tmp_path / "meetings.db"),
+        },
+    )
+    spider = crawler.spider = WicksWampoTacSpider.from_crawler(crawler)
+    crawler.stats.open_spider(spider)
+    crawler.engine = MagicMock()
+    pipeline = MeetingStoreDiffPipeline.from_crawler(crawler)
+    ocd = OpenCivicDataPipeline()
+    output = []
+
+    def scrape(item):
+        try:
+            item = ocd.process_item(pipeline.process_item(item, spider), spider)
+        except DropItem:
+            return
+        pipeline.item_scraped(item, spider)
+        output.append(item)
+
+    for item in meetings:
+        scrape(item)
+    with pytest.raises(DontCloseSpider):
+        pipeline.spider_idle(spider)
+    for call in crawler.engine.scraper._process_spidermw_output.call_args_list:
+        scrape(call[0][0])
+    pipeline.spider_closed(spider)
+    return output, crawler.stats.get_stats()
+
+
+def test_diffs_against_store(tmp_path):
+    first, stats = run_crawl(
+        tmp_path,
+        [
+            meeting("upcoming", NEXT_WEEK),
+            meeting("removed", NEXT_WEEK),
+            meeting("past", LAST_WEEK),
+            meeting("past", LAST_WEEK),
+        ],
+    )
+    assert len(first) == 3
+    assert stats["diff/new"] == 3
+    uids = {item["extras"]["cityscrapers/id"]: item["_id"] for item in first}
+
+    second, stats = run_crawl(
+        tmp_path, [meeting("upcoming", NEXT_WEEK, status=CANCELLED)]
+    )
+    assert stats["diff/status_changed"] == 1
+    assert stats["diff/disappeared"] == 1
+    assert [
+        (item["extras"]["cityscrapers/id"], item["_id"], item["status"])
+        for item in second
+    ] == [
+        ("upcoming", uids["upcoming"], CANCELLED),
+        ("removed", uids["removed"], CANCELLED),
+    ]
+
+    # Past meetings that disappeared are pruned, cancelled ones are kept
+    third, stats = run_crawl(tmp_path, [])
+    assert stats["diff/disappeared"] == 2
+    assert "past" not in [item["extras"]["cityscrapers/id"] for item in third]
+
+
+def test_requires_ocd_pipeline(tmp_path):
+    crawler = get_crawler(WicksWampoTacSpider)
+    crawler.spider = WicksWampoTacSpider.from_crawler(crawler)
+    with pytest.raises(ValueError):
+        MeetingStoreDiffPipeline.from_crawler(crawler)
+
+
+def test_drops_duplicate_meetings():
+    crawler = get_crawler(WicksWampoTacSpider)
+    pipeline = DuplicateMeetingPipeline.from_crawler(crawler)
+    spider = WicksWampoTacSpider.from_crawler(crawler)
+    crawler.stats.open_spider(spider)
+    first = meeting("first", NEXT_WEEK)
+    moved = meeting("first", NEXT_WEEK + timedelta(hours=1))
+    duplicate = meeting("first", NEXT_WEEK)
+    duplicate["source"] = "https://example.com/other"
+    assert pipeline.process_item(first, spider) is first
+    assert pipeline.process_item(moved, spider) is moved
+    with pytest.raises(DropItem):
+        pipeline.process_item(duplicate, spider)
+    processed = {"_id": "ocd-event/1", "status": CANCELLED}
+    assert pipeline.process_item(processed, spider) is processed
+    assert crawler.stats.get_value("duplicates/dropped") == 1
+    # Keys aren't shared with other spiders or kept after the spider closes
+    other = DuplicateMeetingPipeline.from_crawler(get_crawler(WicksWampoTacSpider))
+    assert other.process_item(duplicate, spider) is duplicate
+    pipeline.close_spider(spider)
+    assert pipeline.process_item(duplicate, spider) is duplicate
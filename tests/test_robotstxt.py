@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tests.test_wayback import ROOT_DIR
+
+# Runs two spiders requesting the same host in one process, like crawlall
+SCRIPT = """
+import json
+import sys
+
+from scrapy import Request, Spider
+from scrapy.crawler import CrawlerProcess
+
+
+class StubSpider(Spider):
+    name = "stub"
+
+    def start_requests(self):
+        for path in ["/page", "/private"]:
+            yield Request("{base_url}" + path)
+
+    def parse(self, response):
+        pass
+
+
+class OtherStubSpider(StubSpider):
+    name = "other_stub"
+
+
+process = CrawlerProcess(
+    {{
+        "ROBOTSTXT_OBEY": True,
+        "DOWNLOADER_MIDDLEWARES": {{
+            "scrapy.downloadermiddlewares.robotstxt.RobotsTxtMiddleware": None,
+            "city_scrapers.middleware.CachedRobotsTxtMiddleware": 543,
+        }},
+        "CITY_SCRAPERS_ROBOTSTXT_CACHE_ENABLED": True,
+        "CITY_SCRAPERS_ROBOTSTXT_CACHE_PATH": sys.argv[1],
+        "CITY_SCRAPERS_ROBOTSTXT_CACHE_TTL": float(sys.argv[2]),
+        "LOG_ENABLED": False,
+    }}
+)
+crawlers = [process.create_crawler(cls) for cls in [StubSpider, OtherStubSpider]]
+for crawler in crawlers:
+    process.crawl(crawler)
+process.start()
+print(json.dumps(
+    sum(crawler.stats.get_value("robotstxt/forbidden", 0) for crawler in crawlers)
+))
+"""
+
+
+class RobotsHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        if self.path != "/robots.txt":
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"<html></html>")
+            return
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(b"User-agent: *\nDisallow: /private\n")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_shares_and_revalidates_robots_txt(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RobotsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    (tmp_path / "crawl.py").write_text(SCRIPT.format(base_url=base_url))
+    path = str(tmp_path / "robots.db")
+    env = {**os.environ, "PYTHONPATH": ROOT_DIR}
+
+    def crawl(ttl):
+        result = subprocess.run(
+            [sys.executable, "crawl.py", path, str(ttl)],
+            cwd=tmp_path,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return int(result.stdout.strip().splitlines()[-1])
+
+    RobotsHandler.requests = []
+    try:
+        # Fetched once for both spiders
+        assert crawl(3600) == 2
+        assert RobotsHandler.requests == [None]
+        # Not requested again within the TTL
+        assert crawl(3600) == 2
+        assert RobotsHandler.requests == [None]
+        # Revalidated once it's expired
+        assert crawl(0) == 2
+        assert RobotsHandler.requests == [None, '"v1"']
+    finally:
+        server.shutdown()
+        RobotsHandler.requests = []
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT etag FROM robots").fetchall() == [('"v1"',)]
+    conn.close()
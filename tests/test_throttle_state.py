@@ -0,0 +1,88 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from scrapy import Spider
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request, Response
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.extensions import ThrottleStateExtension, get_percentile
+from city_scrapers.state import HostStatsCache
+
+HOST = "www.wichita.gov"
+
+
+def get_extension(path, **settings):
+    crawler = get_crawler(
+        Spider,
+        {
+            "AUTOTHROTTLE_ENABLED": True,
+            "AUTOTHROTTLE_MAX_DELAY": 30.0,
+            "CITY_SCRAPERS_THROTTLE_STATE_ENABLED": True,
+            "CITY_SCRAPERS_THROTTLE_STATE_PATH": str(path),
+            **settings,
+        },
+    )
+    crawler.engine = MagicMock()
+    crawler.engine.downloader.per_slot_settings = {}
+    crawler.engine.downloader.slots = {}
+    return ThrottleStateExtension.from_crawler(crawler)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    HostStatsCache.memory = {}
+    yield
+    HostStatsCache.memory = {}
+
+
+def test_get_percentile():
+    values = [0.1 * number for number in range(1, 101)]
+    assert get_percentile(values, 50) == pytest.approx(5.0)
+    assert get_percentile(values, 99) == pytest.approx(9.9)
+    assert get_percentile([0.3], 90) == 0.3
+
+
+def test_not_configured_by_default():
+    with pytest.raises(NotConfigured):
+        ThrottleStateExtension.from_crawler(get_crawler(Spider))
+
+
+def test_saves_and_restores_host_delays(tmp_path):
+    path = tmp_path / "throttle.json"
+    extension = get_extension(path)
+    spider = Spider("wicks_city_apc")
+    extension.spider_opened(spider)
+    extension.crawler.engine.downloader.slots[HOST] = MagicMock(delay=0.4)
+    for latency in [0.2, 0.4, 0.6]:
+        request = Request(
+            f"https://{HOST}/Calendar.aspx",
+            meta={"download_slot": HOST, "download_latency": latency},
+        )
+        extension.response_downloaded(Response(request.url), request, spider)
+    extension.spider_closed(spider)
+
+    with open(path) as f:
+        saved = json.load(f)
+    assert saved[HOST]["delay"] == 0.4
+    assert saved[HOST]["latency_p50"] == 0.4
+    assert saved[HOST]["latency_p99"] == 0.6
+    assert saved[HOST]["samples"] == 3
+
+    # The next run starts the host at the saved delay, read from the file
+    HostStatsCache.memory = {}
+    extension = get_extension(path, DOWNLOAD_SLOTS={"go.boarddocs.com": {"delay": 5}})
+    extension.spider_opened(spider)
+    assert extension.crawler.engine.downloader.per_slot_settings == {
+        HOST: {"delay": 0.4}
+    }
+
+
+def test_ignores_stale_hosts(tmp_path):
+    path = tmp_path / "throttle.json"
+    with open(path, "w") as f:
+        json.dump({HOST: {"delay": 0.4, "updated": 0}}, f)
+    extension = get_extension(path)
+    extension.spider_opened(Spider("wicks_city_apc"))
+    assert extension.crawler.engine.downloader.per_slot_settings == {}
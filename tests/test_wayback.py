@@ -0,0 +1,174 @@
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import pytest
+from city_scrapers_core.items import Meeting
+from scrapy.exceptions import DontCloseSpider
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+
+from city_scrapers.middleware import CityScrapersWaybackMiddleware
+from city_scrapers.state import ArchiveIndex
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPIDER = """
+from city_scrapers_core.items import Meeting
+from scrapy import Spider
+
+
+class StubSpider(Spider):
+    name = "stub"
+    start_urls = ["{base_url}/calendar"]
+
+    def parse(self, response):
+        for number in range(3):
+            yield Meeting(
+                title=f"Meeting {{number}}",
+                source=response.url,
+                links=[
+                    {{"href": "{base_url}/agenda.pdf", "title": "Agenda"}},
+                    {{"href": f"{base_url}/minutes-{{number}}.pdf"}},
+                ],
+            )
+"""
+
+
+def meeting(*hrefs):
+    return Meeting(
+        title="Meeting",
+        source="https://example.com/calendar",
+        links=[{"href": href, "title": "Link"} for href in hrefs],
+    )
+
+
+@pytest.fixture
+def middleware(tmp_path):
+    CityScrapersWaybackMiddleware.queued = set()
+    crawler = get_crawler(
+        settings_dict={
+            "CITY_SCRAPERS_WAYBACK_INDEX_PATH": str(tmp_path / "archived.db"),
+            "CITY_SCRAPERS_WAYBACK_BATCH_SIZE": 2,
+            "CITY_SCRAPERS_WAYBACK_BATCH_INTERVAL": 0,
+        }
+    )
+    crawler.stats.open_spider(None)
+    crawler.engine = MagicMock()
+    yield CityScrapersWaybackMiddleware.from_crawler(crawler)
+    CityScrapersWaybackMiddleware.queued = set()
+
+
+def test_queues_links_with_fewer_than_three(middleware):
+    request = Request("https://example.com/calendar")
+    response = HtmlResponse(request.url, body=b"", request=request)
+    items = [meeting("https://example.com/agenda.pdf")]
+    assert list(middleware.process_spider_output(response, items, None)) == items
+    assert middleware.pending == [
+        "https://example.com/calendar",
+        "https://example.com/agenda.pdf",
+    ]
+
+
+def test_dedupes_and_skips_recently_archived(middleware, tmp_path):
+    index = ArchiveIndex(str(tmp_path / "archived.db"))
+    index.add("https://example.com/archived.pdf")
+    index.close()
+    for url in [
+        "https://example.com/agenda.pdf",
+        "https://example.com/agenda.pdf",
+        "https://example.com/archived.pdf",
+        "https://web.archive.org/web/https://example.com",
+        None,
+    ]:
+        middleware.enqueue(url)
+    assert middleware.pending == ["https://example.com/agenda.pdf"]
+
+
+def test_submits_batches_when_idle(middleware):
+    for number in range(3):
+        middleware.enqueue(f"https://example.com/{number}.pdf")
+    with pytest.raises(DontCloseSpider):
+        middleware.spider_idle(None)
+    assert middleware.crawler.engine.crawl.call_count == 2
+    with pytest.raises(DontCloseSpider):
+        middleware.spider_idle(None)
+    assert middleware.crawler.engine.crawl.call_count == 3
+    submitted = middleware.crawler.engine.crawl.call_args[0][0]
+    assert submitted.url == "https://web.archive.org/save/https://example.com/2.pdf"
+    # Nothing left, so the spider can close
+    middleware.spider_idle(None)
+
+
+def test_records_archived_urls(middleware):
+    url = "https://example.com/agenda.pdf"
+    request = middleware.wayback_request(url)
+    middleware.handle_wayback(HtmlResponse(request.url, status=200, request=request))
+    assert middleware.index.archived_since(url, 0)
+
+    url = "https://example.com/minutes.pdf"
+    request = middleware.wayback_request(url)
+    middleware.handle_wayback(HtmlResponse(request.url, status=429, request=request))
+    assert not middleware.index.archived_since(url, 0)
+    assert middleware.pending == [url]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requested = []
+    saved = []
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        if self.path.startswith("/save/"):
+            self.saved.append(self.path[len("/save/") :])
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(b"<html></html>")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_submits_to_stub_endpoint(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    (tmp_path / "stub_spider.py").write_text(SPIDER.format(base_url=base_url))
+    command = [
+        sys.executable,
+        "-m",
+        "scrapy",
+        "runspider",
+        "stub_spider.py",
+        "-s",
+        "SPIDER_MIDDLEWARES="
+        '{"city_scrapers.middleware.CityScrapersWaybackMiddleware": 500}',
+        "-s",
+        f"CITY_SCRAPERS_WAYBACK_ENDPOINT={base_url}/save/",
+        "-s",
+        f"CITY_SCRAPERS_WAYBACK_INDEX_PATH={tmp_path / 'archived.db'}",
+        "-s",
+        "CITY_SCRAPERS_WAYBACK_BATCH_SIZE=2",
+        "-s",
+        "CITY_SCRAPERS_WAYBACK_BATCH_INTERVAL=0",
+    ]
+    env = {**os.environ, "PYTHONPATH": ROOT_DIR}
+    StubHandler.saved = []
+    try:
+        subprocess.run(command, cwd=tmp_path, env=env, check=True, capture_output=True)
+        assert sorted(StubHandler.saved) == sorted(
+            [f"{base_url}/calendar", f"{base_url}/agenda.pdf"]
+            + [f"{base_url}/minutes-{number}.pdf" for number in range(3)]
+        )
+
+        # Everything was archived on the first run, so nothing is sent again
+        StubHandler.saved = []
+        subprocess.run(command, cwd=tmp_path, env=env, check=True, capture_output=True)
+        assert StubHandler.saved == []
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,72 @@
+from os.path import dirname, join
+from unittest.mock import MagicMock
+
+import pytest
+from city_scrapers_core.utils import file_response
+from scrapy.http import Request
+
+from city_scrapers.mixins.wichita_city import WichitaCityMixin, WichitaCityMixinMeta
+from city_scrapers.spiders.wicks_city import WicksCityWCCMSpider
+from city_scrapers.state import SharedState
+
+LISTING_URL = "https://www.wichita.gov/calendar.aspx?Keywords=&startDate=01/01/2024&enddate=04/30/2024&CID=67,68&showPastEvents=true"  # noqa
+
+
+class TestWichitaCityMixin:
+    @pytest.fixture
+    def mixin(self):
+        class TestSpider(WichitaCityMixin):
+            name = "test_spider"
+            agency = "Test Agency"
+            cid = "68"
+
+        spider = TestSpider()
+        spider.crawler = MagicMock(shared_state=SharedState())
+        return spider
+
+    @pytest.fixture
+    def shared_response(self):
+        response = file_response(
+            join(dirname(__file__), "files", "wicks_city_apc.html"),
+            url=LISTING_URL,
+        )
+        return response.replace(
+            request=Request(LISTING_URL, meta={"shared_calendar": True})
+        )
+
+    def test_cid_registered(self, mixin):
+        assert "68" in WichitaCityMixinMeta.cids
+        assert WicksCityWCCMSpider.cid in WichitaCityMixinMeta.cids
+
+    def test_get_cid_batch(self, mixin):
+        batch = mixin._get_cid_batch()
+        assert "68" in batch
+        assert len(batch) <= mixin.cid_batch_size
+        assert batch == sorted(batch, key=int)
+
+    def test_cid_batches_cover_all_cids(self, mixin):
+        batches = set()
+        for cid in WichitaCityMixinMeta.cids:
+            mixin.cid = cid
+            batches.add(tuple(mixin._get_cid_batch()))
+        assert sorted(cid for batch in batches for cid in batch) == sorted(
+            WichitaCityMixinMeta.cids
+        )
+
+    def test_parse_shared_calendar(self, mixin, shared_response):
+        requests = list(mixin.parse(shared_response))
+        assert len(requests) == 10
+        assert requests[0].url.startswith("https://www.wichita.gov/Calendar.aspx?EID=")
+
+    def test_parse_shared_calendar_other_cid(self, mixin, shared_response):
+        mixin.cid = "67"
+        assert list(mixin.parse(shared_response)) == []
+
+    def test_shared_calendar_links_removed_once_taken(self, mixin, shared_response):
+        calendar_links = mixin.crawler.shared_state.calendar_links
+        mixin.cid = "67"
+        list(mixin.parse(shared_response))
+        assert list(calendar_links[LISTING_URL]) == ["68"]
+        mixin.cid = "68"
+        assert len(list(mixin.parse(shared_response))) == 10
+        assert calendar_links == {}
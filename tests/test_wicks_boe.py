@@ -1,12 +1,14 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from os.path import dirname, join
 
 import pytest
 from city_scrapers_core.constants import BOARD, PASSED
 from city_scrapers_core.utils import file_response
 from freezegun import freeze_time
+from scrapy.http import TextResponse
 
 from city_scrapers.spiders.wicks_boe import WicksBoeSpider
+from city_scrapers.state import TokenCache
 
 test_response = file_response(
     join(dirname(__file__), "files", "wicks_boe.json"),
@@ -74,3 +76,62 @@ def test_classification():
 @pytest.mark.parametrize("item", parsed_items)
 def test_all_day(item):
     assert item["all_day"] is False
+
+
+@pytest.fixture
+def token_spider():
+    TokenCache.tokens = {}
+    yield WicksBoeSpider()
+    TokenCache.tokens = {}
+
+
+def test_start_requests_fetches_token(token_spider):
+    requests = list(token_spider.start_requests())
+    assert len(requests) == 1
+    assert requests[0].url == WicksBoeSpider.token_url
+
+
+def test_token_is_cached(token_spider):
+    token_response = TextResponse(
+        WicksBoeSpider.token_url, body=b'{"Token": "abc123"}', encoding="utf-8"
+    )
+    events_request = next(token_spider._parse_token(token_response))
+    assert events_request.headers["Authorization"] == b"Bearer abc123"
+
+    # Reused by other spiders in the process without requesting a new token
+    requests = list(WicksBoeSpider().start_requests())
+    assert requests[0].headers["Authorization"] == b"Bearer abc123"
+
+
+def test_token_expiry_is_utc(token_spider):
+    token_response = TextResponse(
+        WicksBoeSpider.token_url,
+        body=b'{"Token": "abc123", "Expiration": "2024-02-20T18:00:00"}',
+        encoding="utf-8",
+    )
+    next(token_spider._parse_token(token_response))
+    with freeze_time("2024-02-20T17:59:00+00:00"):
+        assert token_spider.token_cache.get(WicksBoeSpider.token_url) == "abc123"
+    with freeze_time("2024-02-20T18:01:00+00:00"):
+        assert token_spider.token_cache.get(WicksBoeSpider.token_url) is None
+
+
+def test_unauthorized_refreshes_token_once(token_spider):
+    token_spider.token_cache.set(
+        WicksBoeSpider.token_url,
+        "expired",
+        datetime.now(timezone.utc) + timedelta(minutes=1),
+    )
+    events_request = next(token_spider.start_requests())
+    unauthorized = TextResponse(
+        events_request.url, status=401, body=b"", request=events_request
+    )
+    retry = list(token_spider.parse(unauthorized))
+    assert retry[0].url == WicksBoeSpider.token_url
+    assert token_spider.token_cache.get(WicksBoeSpider.token_url) is None
+
+    retried_request = token_spider._events_request("new", retried=True)
+    unauthorized = TextResponse(
+        retried_request.url, status=401, body=b"", request=retried_request
+    )
+    assert list(token_spider.parse(unauthorized)) == []
@@ -0,0 +1,134 @@
+from datetime import datetime
+from os.path import dirname, join
+
+import pytest
+from city_scrapers_core.constants import CANCELLED, COMMITTEE, PASSED, TENTATIVE
+from city_scrapers_core.items import Meeting
+from city_scrapers_core.utils import file_response
+from freezegun import freeze_time
+from scrapy import Request
+
+from city_scrapers.spiders.wicks_city import WicksCityAPCSpider
+
+test_response = file_response(
+    join(dirname(__file__), "files", "wicks_city_apc.ics"),
+    mode="rb",
+    url="https://www.wichita.gov/common/modules/iCalendar/iCalendar.aspx?feed=calendar&catID=68",  # noqa: E501
+)
+test_detail_response = file_response(
+    join(dirname(__file__), "files", "wicks_city_apc_detail.html"),
+    url="https://www.wichita.gov/Calendar.aspx?EID=1592",
+)
+spider = WicksCityAPCSpider()
+
+freezer = freeze_time("2024-02-13")
+freezer.start()
+
+parsed_results = [result for result in spider._parse_ical(test_response)]
+parsed_items = [result for result in parsed_results if isinstance(result, Meeting)]
+detail_requests = [result for result in parsed_results if isinstance(result, Request)]
+parsed_item = parsed_items[0]
+
+detail_meeting = parsed_items[-1].copy()
+detail_item = next(spider._parse_ical_detail(test_detail_response, detail_meeting))
+
+# CivicPlus feeds can also give times in UTC rather than with a TZID
+utc_response = test_response.replace(body=b"""BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+UID:1700-calendar@wichita.gov\r
+DTSTART:20240208T160000Z\r
+DTEND:20240208T173000Z\r
+SUMMARY:Advance Plans Committee Meeting\r
+END:VEVENT\r
+END:VCALENDAR\r
+""")
+utc_item = next(spider._parse_ical(utc_response))
+
+freezer.stop()
+
+
+def test_count():
+    assert len(parsed_results) == 10
+    assert len(parsed_items) == 5
+
+
+def test_detail_requests():
+    assert [request.url for request in detail_requests] == [
+        "https://www.wichita.gov/Calendar.aspx?EID=1140",
+        "https://www.wichita.gov/Calendar.aspx?EID=1514",
+        "https://www.wichita.gov/Calendar.aspx?EID=1692",
+        "https://www.wichita.gov/Calendar.aspx?EID=1515",
+        "https://www.wichita.gov/Calendar.aspx?EID=1571",
+    ]
+    assert detail_requests[3].cb_kwargs["meeting"]["status"] == CANCELLED
+
+
+def test_title():
+    assert parsed_item["title"] == "Advance Plans Committee Meeting"
+
+
+def test_description():
+    expected_start = "Meeting Options to Participate The Advance Plans Committee meetings are open to the publi"  # noqa: E501
+    assert parsed_item["description"][:89] == expected_start
+
+
+def test_classification():
+    assert parsed_item["classification"] == COMMITTEE
+
+
+def test_start():
+    assert parsed_item["start"] == datetime(2024, 1, 11, 10, 0)
+
+
+def test_end():
+    assert parsed_item["end"] == datetime(2024, 1, 11, 11, 30)
+
+
+def test_id():
+    assert (
+        parsed_item["id"]
+        == "wicks_city_apc/202401111000/x/advance_plans_committee_meeting"
+    )
+
+
+def test_status():
+    assert parsed_item["status"] == PASSED
+    assert parsed_items[-1]["status"] == TENTATIVE
+
+
+def test_location():
+    assert parsed_item["location"] == {
+        "name": "2nd Floor Large Conference Room",
+        "address": "271 W. 3rd St., Wichita, KS 67202",
+    }
+
+
+def test_source():
+    assert parsed_item["source"] == "https://www.wichita.gov/Calendar.aspx?EID=1139"
+
+
+def test_links():
+    assert parsed_item["links"] == WicksCityAPCSpider.links
+
+
+def test_detail_links():
+    expected_links = WicksCityAPCSpider.links.copy()
+    expected_links.append(
+        {
+            "href": "https://www.youtube.com/@Wichita-SedgwickCountyPlanning",
+            "title": "Wichita-Sedgwick County Planning Youtube channel",
+        }
+    )
+    assert detail_item["links"] == expected_links
+    assert detail_item["start"] == datetime(2024, 7, 11, 10, 0)
+
+
+def test_utc_start_end():
+    assert utc_item["start"] == datetime(2024, 2, 8, 10, 0)
+    assert utc_item["end"] == datetime(2024, 2, 8, 11, 30)
+
+
+@pytest.mark.parametrize("item", parsed_items)
+def test_all_day(item):
+    assert item["all_day"] is False
@@ -0,0 +1,132 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import dirname, join
+from urllib.parse import parse_qs, urlparse
+
+from city_scrapers_core.utils import file_response
+from freezegun import freeze_time
+from scrapy import Request
+from scrapy.http import TextResponse
+
+from city_scrapers.spiders.wicks_win import WicksWinSpider
+from tests.test_wayback import ROOT_DIR
+
+FILES_DIR = join(dirname(__file__), "files")
+API_URL = "https://winwichita.org/wp-json/tribe/events/v1/events"
+
+spider = WicksWinSpider()
+
+
+def api_response(page):
+    with open(join(FILES_DIR, f"wicks_win_events_{page}.json"), "rb") as f:
+        body = f.read()
+    url = f"{API_URL}?page={page}"
+    return TextResponse(
+        url, body=body, encoding="utf-8", request=Request(url, meta={"page": page})
+    )
+
+
+freezer = freeze_time(datetime(2024, 3, 9, 8, 22))
+freezer.start()
+
+ical_items = list(
+    spider.parse(
+        file_response(
+            join(FILES_DIR, "wicks_win.ics"),
+            url="https://winwichita.org/events/list/?ical=1",
+        )
+    )
+)
+first_page = list(spider._parse_events_api(api_response(1)))
+second_page = list(spider._parse_events_api(api_response(2)))
+api_request = spider._events_api_request(1)
+
+freezer.stop()
+
+api_items = [item for item in first_page + second_page if not isinstance(item, Request)]
+page_requests = [item for item in first_page + second_page if isinstance(item, Request)]
+
+
+def test_request_window():
+    query = parse_qs(urlparse(api_request.url).query)
+    assert query["start_date"] == ["2024-02-08"]
+    assert query["end_date"] == ["2025-03-09"]
+    assert query["page"] == ["1"]
+
+
+def test_requests_remaining_pages_from_first():
+    assert [request.meta["page"] for request in page_requests] == [2]
+
+
+def test_matches_ical():
+    assert len(api_items) == 14
+    assert [dict(item) for item in api_items] == [dict(item) for item in ical_items]
+
+
+class EventsAPIHandler(BaseHTTPRequestHandler):
+    requested = []
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        parsed = urlparse(self.path)
+        if parsed.path != "/wp-json/tribe/events/v1/events":
+            self.send_response(404)
+            self.end_headers()
+            return
+        page = parse_qs(parsed.query)["page"][0]
+        with open(join(FILES_DIR, f"wicks_win_events_{page}.json"), "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_crawls_local_events_api(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EventsAPIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    EventsAPIHandler.requested = []
+    try:
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "scrapy",
+                "crawl",
+                "wicks_win",
+                "-a",
+                f"base_url={base_url}",
+                "-a",
+                "past_days=3650",
+                "-s",
+                "CITY_SCRAPERS_WIN_EVENTS_API=true",
+                "-O",
+                str(tmp_path / "output.jl"),
+            ],
+            cwd=ROOT_DIR,
+            env={**os.environ, "PYTHONPATH": ROOT_DIR},
+            check=True,
+            capture_output=True,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    # The fixture was recorded in 2024, so the window reaches back to include it
+    with open(tmp_path / "output.jl") as f:
+        titles = [json.loads(line)["title"] for line in f]
+    assert len(titles) == 14
+    pages = sorted(
+        parse_qs(urlparse(path).query)["page"][0]
+        for path in EventsAPIHandler.requested
+        if path.startswith("/wp-json/")
+    )
+    assert pages == ["1", "2"]